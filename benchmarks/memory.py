@@ -0,0 +1,63 @@
+"""Measure the per-object memory footprint of pycall's core classes.
+
+Each class is compared against an otherwise identical copy that stores its
+attributes in a per-instance `__dict__` (which is how pycall stored them before
+`__slots__` were introduced).
+
+Usage::
+
+    $ python benchmarks/memory.py [count]
+"""
+
+
+from __future__ import print_function
+
+import gc
+import sys
+import tracemalloc
+
+from pycall import Application, Call, CallFile, Context
+
+
+def unslotted(cls):
+    """Build a copy of `cls` that stores attributes in a `__dict__`."""
+    skip = set(cls.__slots__) | set(['__slots__', '__dict__', '__weakref__'])
+    ns = dict((k, v) for k, v in vars(cls).items() if k not in skip)
+    return type('Dict' + cls.__name__, (object,), ns)
+
+
+def measure(factory, count):
+    """Return the average number of bytes allocated per object."""
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    objs = [factory() for _ in range(count)]
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    # Don't count the list holding the objects.
+    return (after - before - sys.getsizeof(objs)) / float(len(objs))
+
+
+def cases():
+    call = Call('SIP/flowroute/18002223333')
+    action = Application('Playback', 'hello-world')
+
+    yield Call, lambda cls: cls('SIP/flowroute/18002223333',
+            callerid='5555555555', account='campaign', wait_time=30)
+    yield Application, lambda cls: cls('Playback', 'hello-world')
+    yield Context, lambda cls: cls('survey', 's', '1')
+    yield CallFile, lambda cls: cls(call, action, spool_dir='/tmp')
+
+
+def main(count=100000):
+    print('%-12s %10s %10s %8s' % ('class', 'dict', 'slots', 'saved'))
+    for cls, build in cases():
+        plain = unslotted(cls)
+        before = measure(lambda: build(plain), count)
+        after = measure(lambda: build(cls), count)
+        print('%-12s %9.1fB %9.1fB %7.0f%%' % (cls.__name__, before, after,
+                100 * (before - after) / before))
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:2]])
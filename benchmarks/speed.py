@@ -0,0 +1,202 @@
+"""Time pycall's render, write and spool paths.
+
+Spooling is timed against both a tmpfs spooling directory (``/dev/shm``, where
+available) and a disk-backed one, so filesystem costs can be told apart from
+pycall's own. Results are printed as a table, and can be saved as JSON and
+compared against an earlier run to catch regressions.
+
+Usage::
+
+    $ python benchmarks/speed.py [--number N] [--repeat R] [--output FILE]
+        [--compare BASELINE] [--threshold RATIO] [--disk-dir DIR]
+"""
+
+
+from __future__ import print_function
+
+import json
+import platform
+import sys
+from argparse import ArgumentParser
+from datetime import datetime, timedelta
+from os import getuid, listdir, remove
+from os.path import isdir, join
+from pwd import getpwnam
+from shutil import rmtree
+from tempfile import mkdtemp
+from timeit import default_timer
+
+from pycall import Application, Call, CallFile
+
+
+def variables(count):
+    return dict(('var%d' % i, 'value %d' % i) for i in range(count))
+
+
+def other_user():
+    """Get a user other than the current one to spool call files as, or None
+    if call files can't be given away (only root can).
+
+    Call files already owned by their `user` aren't chowned, so spooling as
+    the current user wouldn't time the chown.
+    """
+    if getuid() != 0:
+        return None
+    try:
+        return getpwnam('nobody').pw_name
+    except KeyError:
+        return None
+
+
+def cases(dirs):
+    """Yield ``(name, factory, spool_dir)`` for each benchmark.
+
+    Each factory returns the function to time. Benchmarks that write call
+    files give the directory they write to, which is emptied between runs.
+    Their temporary files are written on the same filesystem, so each spool
+    is a rename rather than a copy.
+    """
+    action = Application('Playback', 'hello-world')
+    call = Call('SIP/flowroute/18002223333', callerid='5555555555',
+            wait_time=30, max_retries=2)
+    heavy = Call('SIP/flowroute/18002223333', callerid='5555555555',
+            variables=variables(50), wait_time=30, max_retries=2)
+    user = other_user()
+    later = datetime.now() + timedelta(hours=1)
+
+    yield 'call.render', lambda: call.render, None
+    yield 'call.render.variables', lambda: heavy.render, None
+    yield 'call.is_valid', lambda: call.is_valid, None
+    yield 'call.is_valid.new', lambda: lambda: Call('SIP/flowroute/1000',
+            callerid='5555555555', wait_time=30).is_valid(), None
+
+    for name, c in (('callfile.contents', call),
+            ('callfile.contents.variables', heavy)):
+        cf = CallFile(c, action, spool_dir=(dirs.get('tmpfs') or
+                dirs['disk'])[0])
+        yield name.replace('contents', 'buildfile'), lambda cf=cf: \
+                cf.buildfile, None
+        yield name, lambda cf=cf: lambda: cf.contents, None
+
+    for fs in ('tmpfs', 'disk'):
+        if fs not in dirs:
+            continue
+        spool_dir, tempdir = dirs[fs]
+        yield 'writefile.' + fs, lambda d=spool_dir: lambda: CallFile(call,
+                action, tempdir=d, spool_dir=d).writefile(), spool_dir
+        yield 'spool.' + fs, lambda d=spool_dir, t=tempdir: lambda: CallFile(
+                call, action, spool_dir=d, tempdir=t).spool(), spool_dir
+        yield 'spool.variables.' + fs, lambda d=spool_dir, t=tempdir: \
+                lambda: CallFile(heavy, action, spool_dir=d,
+                tempdir=t).spool(), spool_dir
+        if user is not None:
+            yield 'spool.user.' + fs, lambda d=spool_dir, t=tempdir: \
+                    lambda: CallFile(call, action, spool_dir=d, tempdir=t,
+                    user=user).spool(), spool_dir
+        yield 'spool.future.' + fs, lambda d=spool_dir, t=tempdir: \
+                lambda: CallFile(call, action, spool_dir=d,
+                tempdir=t).spool(later), spool_dir
+
+
+def empty(path):
+    for name in listdir(path):
+        remove(join(path, name))
+
+
+def time(func, number, repeat, spool_dir):
+    """Return the per-call time (in seconds) of each of `repeat` runs."""
+    times = []
+    for _ in range(repeat):
+        start = default_timer()
+        for _ in range(number):
+            func()
+        times.append((default_timer() - start) / number)
+        if spool_dir is not None:
+            empty(spool_dir)
+    return times
+
+
+def run(number, repeat, disk_dir):
+    # A spooling directory and a temporary directory on each filesystem.
+    dirs = {'disk': (mkdtemp(dir=disk_dir), mkdtemp(dir=disk_dir))}
+    if isdir('/dev/shm'):
+        dirs['tmpfs'] = (mkdtemp(dir='/dev/shm'), mkdtemp(dir='/dev/shm'))
+    results = {}
+    try:
+        for name, factory, spool_dir in cases(dirs):
+            times = sorted(time(factory(), number, repeat, spool_dir))
+            results[name] = {
+                'number': number,
+                'repeat': repeat,
+                'min': times[0],
+                'median': times[len(times) // 2],
+            }
+    finally:
+        for paths in dirs.values():
+            for path in paths:
+                rmtree(path)
+
+    return {
+        'python': platform.python_version(),
+        'implementation': platform.python_implementation(),
+        'platform': platform.platform(),
+        'results': results,
+    }
+
+
+def compare(report, baseline, threshold):
+    """Print each benchmark's change against a baseline report.
+
+    :returns: The names of the benchmarks that got more than `threshold`
+        times slower.
+    """
+    slower = []
+    print('\n%-32s %12s %12s %8s' % ('benchmark', 'baseline', 'now', 'ratio'))
+    for name, result in sorted(report['results'].items()):
+        if name not in baseline['results']:
+            continue
+        before = baseline['results'][name]['min']
+        ratio = result['min'] / before
+        flag = ''
+        if ratio > threshold:
+            slower.append(name)
+            flag = ' slower'
+        print('%-32s %10.2fus %10.2fus %7.2fx%s' % (name, before * 1e6,
+                result['min'] * 1e6, ratio, flag))
+    return slower
+
+
+def main(argv=None):
+    parser = ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--number', type=int, default=2000,
+            help='calls per run')
+    parser.add_argument('--repeat', type=int, default=5, help='runs per case')
+    parser.add_argument('--output', help='save results to this JSON file')
+    parser.add_argument('--compare', help='compare against this JSON file')
+    parser.add_argument('--threshold', type=float, default=1.25,
+            help='slowdown ratio that counts as a regression')
+    parser.add_argument('--disk-dir', default='/var/tmp',
+            help='disk-backed directory to spool to')
+    args = parser.parse_args(argv)
+
+    report = run(args.number, args.repeat, args.disk_dir)
+
+    print('%-32s %12s %12s' % ('benchmark', 'min', 'median'))
+    for name, result in sorted(report['results'].items()):
+        print('%-32s %10.2fus %10.2fus' % (name, result['min'] * 1e6,
+                result['median'] * 1e6))
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if compare(report, baseline, args.threshold):
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
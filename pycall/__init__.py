@@ -3,6 +3,23 @@
 
 from __future__ import absolute_import
 from .call import Call
-from .errors import PycallError, InvalidTimeError, NoSpoolPermissionError, NoUserError, NoUserPermissionError, UnknownError, ValidationError
+from .errors import PycallError, CrossDeviceError, InvalidTimeError, NoSpoolPermissionError, NoUserError, NoUserPermissionError, SpoolWriteError, UnknownError, ValidationError
 from .actions import Action, Application, Context
-from .callfile import CallFile
+from .callfile import CallFile, SpoolResult
+from .template import CallFileTemplate
+from .scheduler import SpoolScheduler
+from .throttle import ThrottledSpooler, TokenBucket
+from .parallel import ParallelReport, callfile_from_spec, spool_parallel
+from .parser import iter_callfiles
+from .archive import ArchiveIndex, IndexEntry, IndexUpdate
+from .tracker import Change, SpoolTracker
+from .dedup import IdempotentSpooler, SeenSet
+from .users import UserCache, user_cache
+from .target import SpoolTarget
+from .importer import CampaignImporter, ImportReport, read_rows
+from .metrics import MetricsSink, PrometheusSink, set_sink
+from .journal import Reconciliation, SpoolJournal
+from .validation import FieldError, Validator
+from .sharding import ConsistentHash, LeastQueued, RoundRobin, ShardedSpooler
+from .stream import iter_chunks, write_files, write_stream, write_tar
+from .priority import Lane, LaneStats, PrioritySpooler
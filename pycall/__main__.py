@@ -0,0 +1,98 @@
+"""Command line interface: ``python -m pycall import campaign.csv ...``."""
+
+
+from __future__ import print_function
+
+import sys
+from argparse import ArgumentParser
+
+from .actions import Application, Context
+from .errors import PycallError
+from .importer import CampaignImporter
+
+
+FIELDS = ('channel', 'callerid', 'wait_time', 'retry_time', 'max_retries',
+        'account')
+
+
+def parse_args(argv=None):
+    parser = ArgumentParser(prog='python -m pycall',
+            description='Spool Asterisk call files.')
+    commands = parser.add_subparsers(dest='command')
+    commands.required = True
+
+    p = commands.add_parser('import',
+            help='spool a call for every row of a CSV or JSON Lines file')
+    p.add_argument('path', help='the campaign file')
+    p.add_argument('--format', choices=('csv', 'jsonl'),
+            help='the campaign file format (guessed from its extension)')
+    for field in FIELDS:
+        p.add_argument('--' + field.replace('_', '-'), dest=field,
+                required=field == 'channel', metavar='FORMAT',
+                help='format string for the call %s, eg: {column}' % field)
+    p.add_argument('--var', action='append', default=[],
+            metavar='NAME=FORMAT', help='format string for a call variable')
+    p.add_argument('--application', help='application to run')
+    p.add_argument('--data', default='', help='application data')
+    p.add_argument('--context', help='dialplan context to connect to')
+    p.add_argument('--extension', help='dialplan extension')
+    p.add_argument('--priority', default='1', help='dialplan priority')
+    p.add_argument('--spool-dir', help='the spooling directory')
+    p.add_argument('--user', help='user to spool call files as')
+    p.add_argument('--archive', action='store_true',
+            help='have Asterisk archive call files')
+    p.add_argument('--checkpoint', metavar='PATH',
+            help='file to save progress to, and resume from')
+    p.add_argument('--chunk-size', type=int, metavar='ROWS',
+            help='number of rows to spool at a time')
+    p.add_argument('--quiet', action='store_true',
+            help="don't report progress")
+
+    args = parser.parse_args(argv)
+    if bool(args.application) == bool(args.context):
+        parser.error('exactly one of --application or --context is required')
+    if args.context and not args.extension:
+        parser.error('--context requires --extension')
+    try:
+        args.var = dict(v.split('=', 1) for v in args.var)
+    except ValueError:
+        parser.error('--var must be NAME=FORMAT')
+    return args
+
+
+def report(r):
+    print('%d rows, %d spooled, %d failed, %.1fs (%.0f calls/s)' % (r.rows,
+            r.spooled, len(r.failed), r.elapsed, r.rate), file=sys.stderr)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    if args.application:
+        action = Application(args.application, args.data)
+    else:
+        action = Context(args.context, args.extension, args.priority)
+
+    defaults = dict((k, getattr(args, k)) for k in ('spool_dir', 'user')
+            if getattr(args, k) is not None)
+    fields = dict((k, getattr(args, k)) for k in FIELDS
+            if getattr(args, k) is not None)
+
+    try:
+        importer = CampaignImporter(action, fields, args.var,
+                checkpoint=args.checkpoint, chunksize=args.chunk_size,
+                archive=args.archive or None, **defaults)
+        r = importer.run_file(args.path, args.format,
+                progress=None if args.quiet else report)
+    except (IOError, ValueError, PycallError) as e:
+        print('error: %s' % (str(e) or e.__class__.__name__), file=sys.stderr)
+        return 2
+
+    for n, e in r.failed:
+        print('row %d: %s' % (n, e.__class__.__name__), file=sys.stderr)
+    report(r)
+    return 1 if r.failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
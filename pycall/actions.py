@@ -3,12 +3,28 @@
 
 class Action(object):
     """A generic Asterisk action."""
-    pass
+
+    __slots__ = ('_errors',)
+
+    def __getstate__(self):
+        # Pickle protocols 0 and 1 (Python 2's default) can't save slots on
+        # their own. The cached validation result isn't worth saving.
+        state = dict(getattr(self, '__dict__', ()))
+        state.update((k, getattr(self, k)) for k in type(self).__slots__
+                if hasattr(self, k))
+        return state
+
+    def __setstate__(self, state):
+        self._errors = None
+        for k, v in state.items():
+            setattr(self, k, v)
 
 
 class Application(Action):
     """Stores and manipulates Asterisk applications and data."""
 
+    __slots__ = ('application', 'data')
+
     def __init__(self, application, data):
         """Create a new `Application` object.
 
@@ -17,6 +33,7 @@ class Application(Action):
         """
         self.application = application
         self.data = data
+        self._errors = None
 
     def render(self):
         """Render this action as call file directives.
@@ -29,6 +46,8 @@ class Application(Action):
 class Context(Action):
     """Stores and manipulates Asterisk contexts, extensions, and priorities."""
 
+    __slots__ = ('context', 'extension', 'priority')
+
     def __init__(self, context, extension, priority):
         """Create a new `Context` object.
 
@@ -39,6 +58,7 @@ class Context(Action):
         self.context = context
         self.extension = extension
         self.priority = priority
+        self._errors = None
 
     def render(self):
         """Render this action as call file directives.
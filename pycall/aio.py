@@ -0,0 +1,146 @@
+"""asyncio support for spooling call files without blocking the event loop.
+
+This module requires Python 3.6 or later, so it isn't imported by the `pycall`
+package itself: import it as `pycall.aio`.
+"""
+
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+from .callfile import SpoolResult
+from .errors import PycallError
+
+try:
+    _running_loop = asyncio.get_running_loop
+except AttributeError:
+    # Python 3.6, where get_event_loop returns the running loop in a
+    # coroutine.
+    _running_loop = asyncio.get_event_loop
+
+
+async def spool_async(callfile, time=None, executor=None):
+    """Spool a call file with Asterisk, without blocking the event loop.
+
+    The filesystem work is done by `executor` (or the event loop's default
+    executor).
+
+    :param obj callfile: A `pycall.CallFile` instance.
+    :param datetime time: The date and time to spool this call file (see
+        :meth:`~pycall.CallFile.spool`).
+    :param obj executor: A `concurrent.futures.Executor` to spool in.
+    """
+    loop = _running_loop()
+    await loop.run_in_executor(executor, callfile.spool, time)
+
+
+class AsyncSpooler(object):
+    """Spools call files from asyncio code, using a bounded pool of threads.
+
+    At most `max_concurrency` spools are in progress at once, no matter how
+    many coroutines are waiting on :meth:`spool`.
+    """
+
+    #: The default number of threads to spool call files with.
+    DEFAULT_MAX_WORKERS = 8
+
+    def __init__(self, max_workers=None, max_concurrency=None):
+        """Create a new `AsyncSpooler` object.
+
+        :param int max_workers: Number of threads to spool call files with.
+        :param int max_concurrency: Maximum number of spools in progress at
+            once. Defaults to `max_workers`.
+        :rtype: `AsyncSpooler` object.
+        """
+        self.max_workers = max_workers or self.DEFAULT_MAX_WORKERS
+        self.max_concurrency = max_concurrency or self.max_workers
+        self._executor = ThreadPoolExecutor(self.max_workers)
+        self._semaphore = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """Shut down the spooler's threads once pending spools finish."""
+        self._executor.shutdown(wait=False)
+
+    async def spool(self, callfile, time=None):
+        """Spool a call file with Asterisk.
+
+        :param obj callfile: A `pycall.CallFile` instance.
+        :param datetime time: The date and time to spool this call file (see
+            :meth:`~pycall.CallFile.spool`).
+        :returns: The outcome of the spool. `PycallError` exceptions are
+            reported in the result rather than raised.
+        :rtype: `SpoolResult` object.
+        """
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async with self._semaphore:
+            try:
+                await spool_async(callfile, time, self._executor)
+            except PycallError as e:
+                return SpoolResult(callfile, e)
+        return SpoolResult(callfile, None)
+
+    async def spool_many(self, callfiles, time=None):
+        """Spool a batch of call files with Asterisk.
+
+        Only `max_concurrency` call files are handed to the thread pool at a
+        time, so even a very large batch doesn't flood the event loop with
+        pending tasks.
+
+        :param iterable callfiles: `CallFile` objects to spool.
+        :param datetime time: The date and time to spool these call files
+            (see :meth:`~pycall.CallFile.spool`).
+        :returns: One result per call file, in the order given.
+        :rtype: List of `SpoolResult` objects.
+        """
+        callfiles = list(callfiles)
+        results = [None] * len(callfiles)
+        pending = iter(range(len(callfiles)))
+
+        async def worker():
+            for i in pending:
+                results[i] = await self.spool(callfiles[i], time)
+
+        await asyncio.gather(*[worker()
+                for _ in range(min(self.max_concurrency, len(callfiles)))])
+        return results
+
+
+async def watch(tracker, interval=1.0):
+    """Iterate over a `pycall.tracker.SpoolTracker`'s state changes.
+
+    Iteration ends once every tracked call file has reached its final state.
+    When the tracker uses inotify, its events are read as soon as they arrive;
+    otherwise the tracker is polled every `interval` seconds.
+
+    :param obj tracker: A `pycall.tracker.SpoolTracker` instance.
+    :param float interval: How often (in seconds) to poll, without inotify.
+    :rtype: Async generator of `pycall.tracker.Change` objects.
+    """
+    loop = _running_loop()
+    fd = tracker.fileno()
+    ready = asyncio.Event()
+    if fd is not None:
+        loop.add_reader(fd, ready.set)
+
+    try:
+        while len(tracker):
+            for change in tracker.poll():
+                yield change
+            if not len(tracker):
+                break
+            if fd is None:
+                await asyncio.sleep(interval)
+            else:
+                await ready.wait()
+                ready.clear()
+    finally:
+        if fd is not None:
+            loop.remove_reader(fd)
@@ -0,0 +1,225 @@
+"""An incrementally updated index of Asterisk's archived call files."""
+
+
+import sqlite3
+from collections import namedtuple
+from errno import ENOENT
+from os import error, listdir, stat
+from os.path import join
+from time import mktime
+
+try:
+    from os import scandir
+except ImportError:
+    scandir = None
+
+from .errors import ValidationError
+from .parser import parse_file
+
+
+class IndexEntry(namedtuple('IndexEntry', ['filename', 'mtime', 'size',
+        'status', 'channel', 'account'])):
+    """An archived call file, as recorded in an `ArchiveIndex`."""
+
+    __slots__ = ()
+
+
+class IndexUpdate(namedtuple('IndexUpdate', ['parsed', 'removed',
+        'failed'])):
+    """The outcome of an :meth:`ArchiveIndex.update`.
+
+    `parsed` is the number of new or changed call files parsed, `removed` the
+    number of call files no longer in the archive, and `failed` the number of
+    call files that couldn't be parsed.
+    """
+
+    __slots__ = ()
+
+
+def _timestamp(value):
+    return mktime(value.timetuple()) if hasattr(value, 'timetuple') else value
+
+
+class ArchiveIndex(object):
+    """A persistent SQLite index of the call files in Asterisk's archive
+    directory.
+
+    Each call file is recorded with its modification time, size, status,
+    channel and account. :meth:`update` only re-parses call files that are new,
+    or whose modification time or size changed since the last update, so
+    keeping the index current is cheap even with millions of archived calls.
+    """
+
+    #: The default archive directory (should be OK for most systems).
+    DEFAULT_ARCHIVE_DIR = '/var/spool/asterisk/outgoing_done'
+
+    #: How many parsed call files :meth:`update` writes to the index at a
+    #: time.
+    BATCH_SIZE = 1000
+
+    _SCHEMA = (
+        'CREATE TABLE IF NOT EXISTS callfiles (filename TEXT PRIMARY KEY, '
+            'mtime REAL, size INTEGER, status TEXT, channel TEXT, '
+            'account TEXT)',
+        'CREATE INDEX IF NOT EXISTS callfiles_account '
+            'ON callfiles (account, mtime)',
+        'CREATE INDEX IF NOT EXISTS callfiles_status '
+            'ON callfiles (status, mtime)',
+    )
+
+    def __init__(self, path, archive_dir=None):
+        """Create a new `ArchiveIndex` object.
+
+        :param str path: Path of the index database. It is created if it
+            doesn't exist yet.
+        :param str archive_dir: Directory Asterisk archives call files to.
+        :rtype: `ArchiveIndex` object.
+        """
+        self.path = path
+        self.archive_dir = archive_dir or self.DEFAULT_ARCHIVE_DIR
+        self.db = sqlite3.connect(path)
+        with self.db:
+            for statement in self._SCHEMA:
+                self.db.execute(statement)
+
+    def close(self):
+        """Close the index database."""
+        self.db.close()
+
+    def __len__(self):
+        """Return the number of call files in the index."""
+        return self.db.execute('SELECT COUNT(*) FROM callfiles').fetchone()[0]
+
+    def _scan(self):
+        """Yield ``(filename, path, mtime, size)`` for each archived file.
+
+        Files removed while the directory is being scanned are skipped.
+        """
+        if scandir is not None:
+            for entry in scandir(self.archive_dir):
+                if entry.name[0] != '.' and entry.is_file():
+                    try:
+                        st = entry.stat()
+                    except error as e:
+                        if e.errno != ENOENT:
+                            raise
+                        continue
+                    yield entry.name, entry.path, st.st_mtime, st.st_size
+        else:
+            for name in listdir(self.archive_dir):
+                if name[0] != '.':
+                    path = join(self.archive_dir, name)
+                    try:
+                        st = stat(path)
+                    except error as e:
+                        if e.errno != ENOENT:
+                            raise
+                        continue
+                    yield name, path, st.st_mtime, st.st_size
+
+    def _write(self, rows, names):
+        """Write parsed call files to the index, and record scanned names."""
+        with self.db:
+            self.db.executemany('INSERT OR REPLACE INTO callfiles '
+                    'VALUES (?, ?, ?, ?, ?, ?)', rows)
+            self.db.executemany('INSERT OR IGNORE INTO scanned VALUES (?)',
+                    names)
+
+    def update(self):
+        """Bring the index up to date with the archive directory.
+
+        New and changed call files are parsed, and call files that have been
+        removed from the archive are dropped from the index. Call files that
+        can't be parsed are recorded without a status, so they aren't retried
+        until they change.
+
+        Each call file is looked up in the index as it's scanned, and parsed
+        call files (and the names seen, in a temporary table) are written
+        every `BATCH_SIZE` files, so memory use doesn't grow with the size of
+        the archive or of the index.
+
+        :rtype: `IndexUpdate` object.
+        """
+        self.db.execute('CREATE TEMP TABLE IF NOT EXISTS scanned '
+                '(filename TEXT PRIMARY KEY)')
+        with self.db:
+            self.db.execute('DELETE FROM scanned')
+        lookup = 'SELECT mtime, size FROM callfiles WHERE filename = ?'
+        rows = []
+        names = []
+        parsed = 0
+        failed = 0
+
+        for name, path, mtime, size in self._scan():
+            if self.db.execute(lookup, (name,)).fetchone() != (mtime, size):
+                try:
+                    cf = parse_file(path)
+                    rows.append((name, mtime, size, cf.status,
+                            cf.call.channel, cf.call.account))
+                    parsed += 1
+                except IOError as e:
+                    if e.errno == ENOENT:
+                        # Removed since it was scanned, so it's dropped from
+                        # the index below.
+                        continue
+                    rows.append((name, mtime, size, None, None, None))
+                    failed += 1
+                except (ValidationError, UnicodeDecodeError):
+                    rows.append((name, mtime, size, None, None, None))
+                    failed += 1
+            names.append((name,))
+            if len(names) >= self.BATCH_SIZE:
+                self._write(rows, names)
+                rows = []
+                names = []
+
+        self._write(rows, names)
+        with self.db:
+            removed = self.db.execute('DELETE FROM callfiles WHERE filename '
+                    'NOT IN (SELECT filename FROM scanned)').rowcount
+            self.db.execute('DELETE FROM scanned')
+
+        return IndexUpdate(parsed, removed, failed)
+
+    def query(self, status=None, account=None, channel=None, since=None,
+            until=None):
+        """Find archived call files.
+
+        All given criteria must match. For example, to find the calls for
+        account 'campaign' that failed in the last hour::
+
+            index.query(status='Failed', account='campaign',
+                    since=time() - 3600)
+
+        :param str status: The call's final status (eg: 'Completed',
+            'Expired' or 'Failed').
+        :param str account: The call's account code.
+        :param str channel: The call's channel.
+        :param since: Only include call files modified at or after this time
+            (a datetime, or a UNIX timestamp).
+        :param until: Only include call files modified before this time (a
+            datetime, or a UNIX timestamp).
+        :returns: Matching call files, oldest first.
+        :rtype: List of `IndexEntry` objects.
+        """
+        clauses = []
+        params = []
+
+        for column, value in (('status', status), ('account', account),
+                ('channel', channel)):
+            if value is not None:
+                clauses.append(column + ' = ?')
+                params.append(value)
+        if since is not None:
+            clauses.append('mtime >= ?')
+            params.append(_timestamp(since))
+        if until is not None:
+            clauses.append('mtime < ?')
+            params.append(_timestamp(until))
+
+        sql = 'SELECT * FROM callfiles'
+        if clauses:
+            sql += ' WHERE ' + ' AND '.join(clauses)
+        sql += ' ORDER BY mtime'
+
+        return [IndexEntry(*row) for row in self.db.execute(sql, params)]
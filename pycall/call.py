@@ -1,9 +1,15 @@
 """A simple wrapper for Asterisk calls."""
 
 
+from .validation import validator
+
+
 class Call(object):
     """Stores and manipulates Asterisk calls."""
 
+    __slots__ = ('channel', 'callerid', 'variables', 'account', 'wait_time',
+            'retry_time', 'max_retries', '_errors')
+
     def __init__(self, channel, callerid=None, variables=None, account=None,
             wait_time=None, retry_time=None, max_retries=None):
         """Create a new `Call` object.
@@ -25,22 +31,30 @@ class Call(object):
         self.wait_time = wait_time
         self.retry_time = retry_time
         self.max_retries = max_retries
+        self._errors = None
+
+    def __getstate__(self):
+        # Pickle protocols 0 and 1 (Python 2's default) can't save slots on
+        # their own. The cached validation result isn't worth saving.
+        state = dict(getattr(self, '__dict__', ()))
+        state.update((k, getattr(self, k)) for k in Call.__slots__
+                if k != '_errors')
+        return state
+
+    def __setstate__(self, state):
+        self.__init__(None)
+        for k, v in state.items():
+            setattr(self, k, v)
 
     def is_valid(self):
         """Check to see if the `Call` attributes are valid.
 
+        See :class:`pycall.validation.Validator` for the checks made.
+
         :returns: True if all attributes are valid, False otherwise.
         :rtype: Boolean.
         """
-        if self.variables and not isinstance(self.variables, dict):
-            return False
-        if self.wait_time != None and type(self.wait_time) != int:
-            return False
-        if self.retry_time != None and type(self.retry_time) != int:
-            return False
-        if self.max_retries != None and type(self.max_retries) != int:
-            return False
-        return True
+        return not validator.call_errors(self)
 
     def render(self):
         """Render this call as call file directives.
@@ -2,29 +2,129 @@
 
 
 from __future__ import with_statement
+from collections import namedtuple
+from hashlib import sha1
+from itertools import count
+from random import getrandbits
 from shutil import move
 from time import mktime
-from pwd import getpwnam
-from tempfile import mkstemp
-from os import chown, error, utime
+from tempfile import gettempdir
+from os import O_CREAT, O_EXCL, O_RDONLY, O_WRONLY, close, error, fchown, \
+    fstat, fsync, getpid, rename, utime, write
+from errno import EACCES, EEXIST, ENOENT, EPERM, EXDEV
 import os
 
 from path import Path
 
-from .call import Call
-from .actions import Action, Context
-from .errors import InvalidTimeError, NoSpoolPermissionError, NoUserError, \
-    NoUserPermissionError, ValidationError
+from .errors import CrossDeviceError, InvalidTimeError, \
+    NoSpoolPermissionError, NoUserPermissionError, PycallError, \
+    SpoolWriteError, ValidationError
+from . import metrics
+from .users import user_cache
+from .validation import spool_dir_exists, validator
+
+
+_counter = count()
+_pid = getpid()
+
+
+def _reset_pid():
+    global _pid
+    _pid = getpid()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_pid)
+
+try:
+    from os import fdatasync
+except ImportError:
+    fdatasync = fsync
+
+_utime_fd = utime in getattr(os, 'supports_fd', ())
+
+# Temporary files are always new files (never an existing file, or the
+# target of a symlink planted in a shared temporary directory).
+_TEMP_FLAGS = O_WRONLY | O_CREAT | O_EXCL | getattr(os, 'O_NOFOLLOW', 0)
+
+# The most temporary names tried before giving up.
+_TEMP_ATTEMPTS = 100
+
+
+def _write_error(e):
+    """Get the `PycallError` to raise for an `OSError` raised while writing a
+    call file.
+    """
+    if e.errno in (EACCES, EPERM):
+        return NoSpoolPermissionError(str(e))
+    return SpoolWriteError(str(e))
+
+
+def _unique_name():
+    """Generate a unique call file name without touching the filesystem.
+
+    :rtype: String.
+    """
+    return '%d-%d-%08x.call' % (_pid, next(_counter), getrandbits(32))
+
+
+def _create_temp(directory):
+    """Create a new hidden file in a directory, with a random name.
+
+    The file is created exclusively, and never through a symlink, so nothing
+    planted in the directory can be written through.
+
+    :returns: The new file's path, and a file descriptor open on it.
+    :rtype: Tuple.
+    """
+    for _ in range(_TEMP_ATTEMPTS):
+        path = Path(directory) / ('.' + _unique_name())
+        try:
+            return path, os.open(path, _TEMP_FLAGS, 0o600)
+        except error as e:
+            if e.errno != EEXIST:
+                raise
+    raise error(EEXIST, 'No usable temporary file name found', directory)
+
+
+class SpoolResult(namedtuple('SpoolResult', ['callfile', 'error'])):
+    """The outcome of spooling a single call file as part of a batch."""
+
+    __slots__ = ()
+
+    @property
+    def ok(self):
+        """True if the call file was spooled successfully."""
+        return self.error is None
 
 
 class CallFile(object):
     """Stores and manipulates Asterisk call files."""
 
+    __slots__ = ('call', 'action', 'archive', 'user', 'spool_dir', 'staging',
+            'sync', 'idempotency_key', 'status', 'history', '_filename',
+            '_tempdir')
+
     #: The default spooling directory (should be OK for most systems).
     DEFAULT_SPOOL_DIR = '/var/spool/asterisk/outgoing'
 
+    #: The name of the staging directory created next to the spooling
+    #: directory when `staging` is enabled.
+    STAGING_DIR_NAME = '.staging'
+
+    #: Durability policy: leave flushing to the operating system.
+    SYNC_NONE = 'none'
+
+    #: Durability policy: `fdatasync` the call file before spooling it.
+    SYNC_DATA = 'data'
+
+    #: Durability policy: `fsync` the call file before spooling it, and the
+    #: spooling directory after.
+    SYNC_FULL = 'full'
+
     def __init__(self, call, action, archive=None, filename=None, tempdir=None,
-            user=None, spool_dir=None):
+            user=None, spool_dir=None, staging=False, sync=None,
+            idempotency_key=None):
         """Create a new `CallFile` obeject.
 
         :param obj call: A `pycall.Call` instance.
@@ -34,8 +134,20 @@ class CallFile(object):
         :param str filename: Filename of the call file.
         :param str tempdir: Temporary directory to store the call file before
             spooling.
-        :param str user: Username to spool the call file as.
-        :param str spool_dir: Directory to spool the call file to.
+        :param user: User to spool the call file as: a username, a numeric
+            uid, or a ``(uid, gid)`` tuple. Usernames are looked up through
+            the shared :data:`pycall.users.user_cache`.
+        :param spool_dir: Directory to spool the call file to: a path, or a
+            `pycall.SpoolTarget` (which makes validation much cheaper).
+        :param bool staging: Write the call file to a staging directory next to
+            `spool_dir` (instead of the system temporary directory), and
+            publish it with a single atomic rename.
+        :param str sync: Durability policy to use when spooling: one of
+            `SYNC_NONE` (the default), `SYNC_DATA` or `SYNC_FULL`. Any other
+            value fails validation.
+        :param str idempotency_key: A key identifying this call. Call files
+            with the same key are considered duplicates (see
+            :meth:`identity`).
         :rtype: `CallFile` object.
         """
         self.call = call
@@ -43,16 +155,120 @@ class CallFile(object):
         self.archive = archive
         self.user = user
         self.spool_dir = spool_dir or self.DEFAULT_SPOOL_DIR
+        self.staging = staging
+        self.sync = sync or self.SYNC_NONE
+        self.idempotency_key = idempotency_key
+        self.status = None
+        self.history = None
+        self._filename = Path(filename) if filename else None
+        self._tempdir = Path(tempdir) if tempdir else None
+
+    def __getstate__(self):
+        # Pickle protocols 0 and 1 (Python 2's default) can't save slots on
+        # their own.
+        state = dict(getattr(self, '__dict__', ()))
+        state.update((k, getattr(self, k)) for k in CallFile.__slots__)
+        return state
+
+    def __setstate__(self, state):
+        # Call files pickled before `__slots__` lack the newer attributes.
+        self.__init__(None, None)
+        for k, v in state.items():
+            setattr(self, k, v)
+
+    @classmethod
+    def from_string(cls, text, **kwargs):
+        """Create a new `CallFile` object from call file contents.
+
+        See :func:`pycall.parser.parse`.
+
+        :param str text: Call file contents.
+        :param kwargs: Extra arguments for `CallFile` (eg: `spool_dir`).
+        :raises: `ValidationError` if the text isn't a valid call file.
+        :rtype: `CallFile` object.
+        """
+        from .parser import parse
+        return parse(text, **kwargs)
 
-        if filename and tempdir:
-            self.filename = Path(filename)
-            self.tempdir = Path(tempdir)
-        else:
-            tup = mkstemp(suffix='.call')
-            f = Path(tup[1])
-            self.filename = f.name
-            self.tempdir = f.parent
-            os.close(tup[0])
+    @classmethod
+    def from_path(cls, path, **kwargs):
+        """Create a new `CallFile` object from a call file on disk.
+
+        See :func:`pycall.parser.parse_file`.
+
+        :param str path: Path to the call file.
+        :param kwargs: Extra arguments for `CallFile` (eg: `spool_dir`).
+        :raises: `ValidationError` if the file isn't a valid call file.
+        :rtype: `CallFile` object.
+        """
+        from .parser import parse_file
+        return parse_file(path, **kwargs)
+
+    @property
+    def filename(self):
+        """Filename of the call file.
+
+        If no filename was given, one is generated the first time it is
+        needed: from the `idempotency_key` if there is one (so duplicates share
+        a name), or a unique one otherwise.
+
+        This is only the call file's final name: it is always written under a
+        new, random temporary name, and renamed to `filename` once complete.
+
+        :rtype: `Path` object.
+        """
+        if self._filename is None:
+            if self.idempotency_key is None:
+                self._filename = Path(_unique_name())
+            else:
+                self._filename = Path(self.identity() + '.call')
+        return self._filename
+
+    @filename.setter
+    def filename(self, value):
+        self._filename = Path(value) if value else None
+
+    @property
+    def tempdir(self):
+        """Temporary directory to store the call file in before spooling.
+
+        Defaults to the staging directory if `staging` is enabled, or the
+        system temporary directory otherwise.
+
+        :rtype: `Path` object.
+        """
+        if self._tempdir is not None:
+            return self._tempdir
+        if self.staging:
+            return self.staging_dir
+        return Path(gettempdir())
+
+    @tempdir.setter
+    def tempdir(self, value):
+        self._tempdir = Path(value) if value else None
+
+    @property
+    def staging_dir(self):
+        """The staging directory used when `staging` is enabled.
+
+        :rtype: `Path` object.
+        """
+        return Path(self.spool_dir).abspath().parent / self.STAGING_DIR_NAME
+
+    def identity(self):
+        """Get a stable identity for this call file.
+
+        This is a hash of the `idempotency_key` if there is one, or of the call
+        file's contents otherwise.
+
+        :raises: `ValidationError` if there is no `idempotency_key`, and this
+            call file can not be validated.
+        :rtype: String.
+        """
+        key = self.idempotency_key
+        if key is None:
+            key = self.contents
+        return sha1(key.encode('utf-8')).hexdigest()
 
     def __str__(self):
         """Render this call file object for developers.
@@ -69,31 +285,32 @@ class CallFile(object):
         :returns: True if all attributes are valid, False otherwise.
         :rtype: Boolean.
         """
-        if not isinstance(self.call, Call):
-            return False
-
-        if not (isinstance(self.action, Action) or
-                isinstance(self.action, Context)):
-            return False
-
-        if self.spool_dir and not Path(self.spool_dir).abspath().isdir():
-            return False
+        return not validator.errors(self)
 
-        if not self.call.is_valid():
-            return False
+    def errors(self):
+        """Explain what's wrong with this call file.
 
-        return True
+        :returns: Every problem found (see
+            :class:`pycall.validation.Validator`).
+        :rtype: List of `pycall.validation.FieldError` objects.
+        """
+        return validator.errors(self)
 
     def buildfile(self):
         """Build a call file in memory.
 
-        :raises: `ValidationError` if this call file can not be validated.
+        :raises: `ValidationError` (listing the problems found, see
+            :meth:`errors`) if this call file can not be validated.
         :returns: A list of call file directives as they will be written to the
             disk.
         :rtype: List of strings.
         """
-        if not self.is_valid():
-            raise ValidationError
+        return self._buildfile(check_spool_dir=True)
+
+    def _buildfile(self, check_spool_dir):
+        errors = validator.errors(self, check_spool_dir)
+        if errors:
+            raise ValidationError(*errors)
 
         cf = []
         cf += self.call.render()
@@ -115,8 +332,27 @@ class CallFile(object):
 
     def writefile(self):
         """Write a temporary call file to disk."""
-        with open(Path(self.tempdir) / Path(self.filename), 'w') as f:
-            f.write(self.contents)
+        self._stage(None, None, check_spool_dir=True, named=True)
+
+    def _open(self):
+        """Create a new temporary file in `tempdir`, with a random name.
+
+        :returns: The new file's path, and a file descriptor open on it.
+        :rtype: Tuple.
+        """
+        try:
+            return _create_temp(self.tempdir)
+        except error as e:
+            if not (e.errno == ENOENT and self.staging and
+                    self._tempdir is None):
+                raise
+
+        try:
+            os.makedirs(self.tempdir)
+        except error:
+            if not self.tempdir.isdir():
+                raise NoSpoolPermissionError
+        return _create_temp(self.tempdir)
 
     def spool(self, time=None):
         """Spool the call file with Asterisk.
@@ -128,30 +364,218 @@ class CallFile(object):
         :param datetime time: The date and time to spool this call file (eg:
             Asterisk will run this call file at the specified time).
         """
-        self.writefile()
+        sink = metrics.sink
+        if sink is None:
+            self._spool(time, self._owner(), check_spool_dir=True)
+            return
 
-        if self.user:
-            try:
-                pwd = getpwnam(self.user)
-                uid = pwd[2]
-                gid = pwd[3]
+        try:
+            self._spool_timed(sink, time, check_spool_dir=True)
+        except PycallError as e:
+            sink.error(e)
+            raise
+
+    @classmethod
+    def spool_many(cls, callfiles, time=None):
+        """Spool a batch of call files with Asterisk.
+
+        Each distinct spooling directory is validated only once for the whole
+        batch. A failure to spool one call file does not stop the rest of the
+        batch from being spooled.
+
+        :param iterable callfiles: `CallFile` objects to spool.
+        :param datetime time: The date and time to spool these call files
+            (see :meth:`spool`).
+        :returns: One result per call file, in the order given.
+        :rtype: List of `SpoolResult` objects.
+        """
+        spool_dirs = {}
+        results = []
+        sink = metrics.sink
 
-                try:
-                    chown(Path(self.tempdir) / Path(self.filename), uid, gid)
-                except error:
-                    raise NoUserPermissionError
-            except KeyError:
-                raise NoUserError
+        for cf in callfiles:
+            try:
+                if cf.spool_dir not in spool_dirs:
+                    spool_dirs[cf.spool_dir] = spool_dir_exists(cf.spool_dir)
+                if not spool_dirs[cf.spool_dir]:
+                    raise ValidationError
+
+                if sink is None:
+                    cf._spool(time, cf._owner(), check_spool_dir=False)
+                else:
+                    cf._spool_timed(sink, time, check_spool_dir=False)
+            except PycallError as e:
+                if sink is not None:
+                    sink.error(e)
+                results.append(SpoolResult(cf, e))
+            else:
+                results.append(SpoolResult(cf, None))
+
+        return results
+
+    def _owner(self):
+        """Get the uid and gid to spool this call file as.
+
+        :raises: `NoUserError` if `user` does not exist.
+        :returns: A ``(uid, gid)`` tuple, or None if no `user` was given.
+        :rtype: Tuple.
+        """
+        if self.user is None or self.user == '':
+            return None
+        return user_cache.resolve(self.user)
+
+    def _spool(self, time, owner, check_spool_dir):
+        self._publish(self._stage(time, owner, check_spool_dir))
+
+    def _spool_timed(self, sink, time, check_spool_dir):
+        """Spool the call file, sending each phase's timing to `sink`."""
+        timer = metrics.Timer(sink)
+        owner = self._owner()
+        timer.lap('owner')
+        self._publish(self._stage(time, owner, check_spool_dir, timer), timer)
+        timer.total()
+
+    def _stage(self, time, owner, check_spool_dir, timer=None, named=False):
+        """Write the call file to a new temporary file in `tempdir`, and set
+        its owner and time.
+
+        Everything is done through a single open file descriptor. The
+        temporary file's name is random (and hidden), so it can't be predicted
+        from the call file. If `named` is set, the finished call file is then
+        renamed to `filename` within `tempdir`. If a `metrics.Timer` is given,
+        each phase is timed with it.
+
+        :returns: The path of the written call file.
+        :rtype: `Path` object.
+        """
+        data = '\n'.join(self._buildfile(check_spool_dir))
+        if not isinstance(data, bytes):
+            data = data.encode('utf-8')
+        if timer:
+            timer.lap('render')
 
         if time:
             try:
                 time = mktime(time.timetuple())
-                utime(Path(self.tempdir) / Path(self.filename), (time, time))
-            except (error, AttributeError, OverflowError, ValueError):
+            except (AttributeError, OverflowError, ValueError):
                 raise InvalidTimeError
 
         try:
-            move(Path(self.tempdir) / Path(self.filename),
-                    Path(self.spool_dir) / Path(self.filename))
-        except IOError:
-            raise NoSpoolPermissionError
+            path, fd = self._open()
+        except error as e:
+            raise _write_error(e)
+
+        try:
+            view = memoryview(data)
+            while view:
+                view = view[write(fd, view):]
+            if timer:
+                timer.lap('write')
+
+            if owner:
+                st = fstat(fd)
+                if st.st_uid != owner[0] or owner[1] not in (-1, st.st_gid):
+                    try:
+                        fchown(fd, *owner)
+                    except error:
+                        raise NoUserPermissionError
+                if timer:
+                    timer.lap('chown')
+
+            if time:
+                try:
+                    utime(fd if _utime_fd else path, (time, time))
+                except (error, OverflowError):
+                    raise InvalidTimeError
+                if timer:
+                    timer.lap('utime')
+
+            if self.sync in (self.SYNC_DATA, self.SYNC_FULL):
+                self._sync(fd)
+                if timer:
+                    timer.lap('sync')
+        except error as e:
+            self._remove(path)
+            raise _write_error(e)
+        except Exception:
+            self._remove(path)
+            raise
+        finally:
+            close(fd)
+
+        if named:
+            dst = Path(self.tempdir) / Path(self.filename)
+            try:
+                rename(path, dst)
+            except error:
+                self._remove(path)
+                raise NoSpoolPermissionError
+            path = dst
+
+        return path
+
+    def _sync(self, fd):
+        """Flush a call file to disk, as the `sync` policy asks."""
+        if self.sync == self.SYNC_DATA:
+            fdatasync(fd)
+        else:
+            fsync(fd)
+
+    def _sync_copy(self, path):
+        """Flush a call file that was copied into the spooling directory."""
+        try:
+            fd = os.open(path, O_RDONLY)
+        except error as e:
+            if e.errno == ENOENT:
+                # Asterisk has already picked it up.
+                return
+            raise _write_error(e)
+        try:
+            self._sync(fd)
+        except error as e:
+            raise _write_error(e)
+        finally:
+            close(fd)
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+        except error:
+            pass
+
+    def _publish(self, src, timer=None):
+        """Move a staged call file into the spooling directory."""
+        dst = Path(self.spool_dir) / Path(self.filename)
+        if self.staging:
+            try:
+                rename(src, dst)
+            except error as e:
+                self._remove(src)
+                if e.errno == EXDEV:
+                    raise CrossDeviceError
+                raise NoSpoolPermissionError
+        else:
+            try:
+                move(src, dst)
+            except (IOError, error):
+                self._remove(src)
+                raise NoSpoolPermissionError
+
+            # `tempdir` is usually on another filesystem, in which case the
+            # call file was copied, and the synced temporary file is gone.
+            if self.sync in (self.SYNC_DATA, self.SYNC_FULL):
+                self._sync_copy(dst)
+
+        if self.sync == self.SYNC_FULL:
+            try:
+                fd = os.open(self.spool_dir, O_RDONLY)
+                try:
+                    fsync(fd)
+                finally:
+                    close(fd)
+            except error as e:
+                raise _write_error(e)
+
+        if timer:
+            timer.lap('move')
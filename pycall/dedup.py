@@ -0,0 +1,175 @@
+"""Skip duplicate call files instead of spooling them twice."""
+
+
+from collections import OrderedDict
+from os import fsync, rename
+from threading import Lock
+from time import time as now
+
+
+class SeenSet(object):
+    """A set of keys that forgets each key `ttl` seconds after it was added.
+
+    Lookups, additions and expiry are all O(1). If a `path` is given, the set
+    is persisted to an append-only log there, and reloaded when a new
+    `SeenSet` is created with the same path. The log is rewritten without its
+    expired entries once it grows to more than twice the live set's size.
+
+    Keys must not contain whitespace.
+    """
+
+    #: The default time (in seconds) a key is remembered for.
+    DEFAULT_TTL = 24 * 60 * 60
+
+    def __init__(self, path=None, ttl=None, clock=now):
+        """Create a new `SeenSet` object.
+
+        :param str path: Path of the log to persist the set to.
+        :param float ttl: How long (in seconds) a key is remembered for.
+        :param func clock: Returns the current UNIX time.
+        :rtype: `SeenSet` object.
+        """
+        self.path = path
+        self.ttl = self.DEFAULT_TTL if ttl is None else ttl
+        self.clock = clock
+        self._keys = OrderedDict()
+        self._log = None
+        self._logged = 0
+
+        if path is not None:
+            self._load()
+            self._log = open(path, 'a')
+
+    def _load(self):
+        t = self.clock()
+        try:
+            with open(self.path) as f:
+                for line in f:
+                    expires, _, key = line.rstrip('\n').partition(' ')
+                    try:
+                        expires = float(expires)
+                    except ValueError:
+                        # A partially written line, from a crash.
+                        continue
+                    self._logged += 1
+                    self._keys.pop(key, None)
+                    if expires > t:
+                        self._keys[key] = expires
+        except IOError:
+            pass
+
+    def _expire(self):
+        t = self.clock()
+        keys = self._keys
+        while keys:
+            key = next(iter(keys))
+            if keys[key] > t:
+                break
+            del keys[key]
+
+    def _append(self, expires, key):
+        if self._log is None:
+            return
+        self._log.write('%r %s\n' % (expires, key))
+        self._log.flush()
+        self._logged += 1
+        if self._logged > 2 * len(self._keys) + 1024:
+            self.compact()
+
+    def __contains__(self, key):
+        """Check whether a key has been seen within the last `ttl` seconds."""
+        self._expire()
+        return key in self._keys
+
+    def __len__(self):
+        """Return the number of keys remembered."""
+        self._expire()
+        return len(self._keys)
+
+    def add(self, key):
+        """Remember a key.
+
+        :returns: True if the key was new, False if it was already in the set.
+        :rtype: Boolean.
+        """
+        self._expire()
+        if key in self._keys:
+            return False
+        expires = self.clock() + self.ttl
+        self._keys[key] = expires
+        self._append(expires, key)
+        return True
+
+    def discard(self, key):
+        """Forget a key."""
+        if self._keys.pop(key, None) is not None:
+            self._append(0, key)
+
+    def compact(self):
+        """Rewrite the log, dropping expired and forgotten keys."""
+        if self._log is None:
+            return
+        self._expire()
+        tmp = self.path + '.tmp'
+        with open(tmp, 'w') as f:
+            for key, expires in self._keys.items():
+                f.write('%r %s\n' % (expires, key))
+            f.flush()
+            fsync(f.fileno())
+        rename(tmp, self.path)
+        self._log.close()
+        self._log = open(self.path, 'a')
+        self._logged = len(self._keys)
+
+    def close(self):
+        """Close the log."""
+        if self._log is not None:
+            self._log.close()
+            self._log = None
+
+
+class IdempotentSpooler(object):
+    """Spools each call only once.
+
+    Calls are identified by :meth:`pycall.CallFile.identity`: their
+    `idempotency_key`, or their contents. A call spooled again within the
+    `SeenSet`'s `ttl` is skipped. Call files without an explicit `filename`
+    are named after their identity, so even duplicates that slip past the
+    seen set (eg: after it expires) overwrite each other in the spooling
+    directory rather than adding another call.
+    """
+
+    def __init__(self, seen=None):
+        """Create a new `IdempotentSpooler` object.
+
+        :param obj seen: The `SeenSet` to record spooled calls in. Defaults to
+            a new in-memory `SeenSet`.
+        :rtype: `IdempotentSpooler` object.
+        """
+        self.seen = SeenSet() if seen is None else seen
+        self._lock = Lock()
+
+    def spool(self, callfile, time=None):
+        """Spool a call file, unless it's a duplicate.
+
+        :param obj callfile: A `pycall.CallFile` instance.
+        :param datetime time: The date and time to spool this call file (see
+            :meth:`~pycall.CallFile.spool`).
+        :returns: True if the call file was spooled, False if it was a
+            duplicate.
+        :rtype: Boolean.
+        """
+        key = callfile.identity()
+        with self._lock:
+            if not self.seen.add(key):
+                return False
+
+        if callfile._filename is None:
+            callfile.filename = key + '.call'
+        try:
+            callfile.spool(time)
+        except Exception:
+            with self._lock:
+                self.seen.discard(key)
+            raise
+        return True
@@ -12,6 +12,12 @@ class PycallError(Exception):
     pass
 
 
+class CrossDeviceError(PycallError):
+    """The staging directory is not on the same filesystem as the spooling
+    directory, so the call file can not be atomically renamed into place.
+    """
+
+
 class InvalidTimeError(PycallError):
     """You must specify a valid datetime object for the spool method's time
     parameter.
@@ -30,9 +36,22 @@ class NoUserPermissionError(PycallError):
     """You do not have permission to change the ownership of this call file."""
 
 
+class SpoolWriteError(PycallError):
+    """The call file could not be written (eg: its temporary directory is
+    missing, or the disk is full).
+    """
+
+
 class UnknownError(PycallError):
     """Something must have gone horribly wrong."""
 
 
 class ValidationError(PycallError):
     """CallFile could not be validated."""
+
+    @property
+    def errors(self):
+        """The `pycall.validation.FieldError` objects explaining why, if
+        known.
+        """
+        return list(self.args)
@@ -0,0 +1,279 @@
+"""Stream call campaigns from CSV or JSON Lines files into the spool."""
+
+
+import csv
+import io
+import json
+from collections import namedtuple
+from errno import ENOENT
+from itertools import islice
+from os import fsync, rename
+from os.path import abspath
+from string import Formatter
+
+try:
+    from time import monotonic
+except ImportError:
+    from time import time as monotonic
+
+from .call import Call
+from .callfile import CallFile
+from .errors import ValidationError
+from .validation import FieldError
+
+
+_INTEGERS = ('wait_time', 'retry_time', 'max_retries')
+
+
+def _columns(templates):
+    """Get the names of the columns a set of format strings refer to."""
+    columns = set()
+    for template in templates:
+        for _, name, _, _ in Formatter().parse(template):
+            if name:
+                columns.add(name.partition('.')[0].partition('[')[0])
+    return columns
+
+
+class ImportReport(namedtuple('ImportReport', ['rows', 'spooled', 'failed',
+        'elapsed'])):
+    """The progress of a campaign import.
+
+    `rows` is the number of rows read (including any skipped when resuming
+    from a checkpoint), `spooled` the number of call files spooled, `failed`
+    a list of ``(row, error)`` pairs for rows that couldn't be spooled (rows
+    are numbered from 1), and `elapsed` the time taken in seconds.
+    """
+
+    __slots__ = ()
+
+    @property
+    def rate(self):
+        """Call files spooled per second."""
+        return self.spooled / self.elapsed if self.elapsed else 0.0
+
+
+def read_rows(path, format=None):
+    """Lazily read rows from a CSV or JSON Lines file.
+
+    A row that can't be parsed doesn't stop the rest of the file from being
+    read: a `ValidationError` is yielded in its place, which
+    :class:`CampaignImporter` reports as a failed row.
+
+    :param str path: The file to read.
+    :param str format: 'csv' or 'jsonl'. Guessed from the file extension
+        (defaulting to CSV) if not given.
+    :rtype: Generator of dicts (or `ValidationError` objects).
+    """
+    if format is None:
+        format = 'jsonl' if path.endswith(('.jsonl', '.json')) else 'csv'
+
+    with io.open(path, newline='' if format == 'csv' else None,
+            encoding='utf-8') as f:
+        if format == 'csv':
+            reader = csv.DictReader(f)
+            while True:
+                try:
+                    row = next(reader)
+                except StopIteration:
+                    return
+                except csv.Error as e:
+                    row = ValidationError(FieldError('row', str(e)))
+                yield row
+        else:
+            for line in f:
+                if not line.strip():
+                    continue
+                try:
+                    row = json.loads(line)
+                except ValueError as e:
+                    row = ValidationError(FieldError('row',
+                            'invalid JSON: %s' % e))
+                yield row
+
+
+class CampaignImporter(object):
+    """Builds and spools a call file for each row of a campaign.
+
+    Rows are mapped to `Call` fields and variables with format strings, which
+    are filled in from the row's columns: for example, ``{'channel':
+    'SIP/flowroute/{phone}'}`` dials the `phone` column of each row, and
+    ``{'wait_time': '30'}`` waits 30 seconds for every call.
+
+    Rows are read, built and spooled (with
+    :meth:`~pycall.CallFile.spool_many`) in chunks, so memory use doesn't grow
+    with the size of the campaign. If a `checkpoint` file is given, progress
+    is saved to it after each chunk, and an interrupted import picks up where
+    it left off.
+
+    When the campaign has a `source`, each row's call file gets an
+    `idempotency_key` made from the source and the row number, and so a
+    deterministic name. Rows of an interrupted chunk that are spooled again
+    on resume replace their still-queued call files rather than being
+    dialled twice.
+    """
+
+    #: The default number of rows spooled at a time.
+    DEFAULT_CHUNKSIZE = 1000
+
+    def __init__(self, action, fields, variables=None, checkpoint=None,
+            chunksize=None, **defaults):
+        """Create a new `CampaignImporter` object.
+
+        :param obj action: Either a `pycall.actions.Application` instance
+            or a `pycall.actions.Context` instance, run for every call.
+        :param dict fields: Format strings for `Call` fields, by field name.
+            `channel` is required.
+        :param dict variables: Format strings for call variables, by variable
+            name.
+        :param str checkpoint: Path of a file to save progress to.
+        :param int chunksize: Number of rows spooled at a time.
+        :param defaults: `CallFile` arguments (eg: `spool_dir`, `user`) used
+            for every call.
+        :rtype: `CampaignImporter` object.
+        """
+        if 'channel' not in fields:
+            raise ValidationError
+        self.action = action
+        self.fields = fields
+        self.variables = variables or {}
+        self.checkpoint = checkpoint
+        self.chunksize = chunksize or self.DEFAULT_CHUNKSIZE
+        self.defaults = defaults
+
+    def build(self, row):
+        """Build the call file for a row.
+
+        :param dict row: The row's columns.
+        :raises: `ValidationError` if the row can't be turned into a valid
+            call file.
+        :rtype: `CallFile` object.
+        """
+        if isinstance(row, ValidationError):
+            raise row
+        if not isinstance(row, dict):
+            raise ValidationError(FieldError('row', 'must be an object'))
+        if None in row:
+            # csv.DictReader's key for columns beyond the header.
+            raise ValidationError(FieldError('row', 'too many columns'))
+        missing = [k for k, v in row.items() if v is None]
+        if missing:
+            # csv.DictReader's value for columns missing from a short row.
+            used = _columns(list(self.fields.values()) +
+                    list(self.variables.values()))
+            for column in sorted(missing):
+                if column in used:
+                    raise ValidationError(FieldError(column, 'missing'))
+
+        try:
+            kwargs = dict((k, v.format(**row)) for k, v in self.fields.items())
+            for field in _INTEGERS:
+                if field in kwargs:
+                    kwargs[field] = int(kwargs[field])
+            variables = dict((k, v.format(**row))
+                    for k, v in self.variables.items())
+        except (KeyError, IndexError, ValueError):
+            raise ValidationError
+
+        cf = CallFile(Call(variables=variables or None, **kwargs), self.action,
+                **self.defaults)
+        if not cf.call.is_valid():
+            raise ValidationError
+        return cf
+
+    def _load_checkpoint(self, path):
+        """Get the number of rows already done, from the checkpoint.
+
+        :raises: `ValueError` if the checkpoint is corrupt.
+        """
+        try:
+            with open(self.checkpoint) as f:
+                state = json.load(f)
+        except IOError as e:
+            if e.errno == ENOENT:
+                return 0
+            raise
+        except ValueError:
+            raise ValueError('corrupt checkpoint: %s' % self.checkpoint)
+
+        try:
+            row = state['row'] if state.get('path') == path else 0
+        except (AttributeError, KeyError):
+            row = None
+        if type(row) != int or row < 0:
+            raise ValueError('corrupt checkpoint: %s' % self.checkpoint)
+        return row
+
+    def _save_checkpoint(self, path, row):
+        tmp = self.checkpoint + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump({'path': path, 'row': row}, f)
+            f.flush()
+            fsync(f.fileno())
+        rename(tmp, self.checkpoint)
+
+    def run(self, rows, source=None, progress=None):
+        """Spool a call file for every row.
+
+        :param iterable rows: The campaign's rows, as dicts (see
+            :func:`read_rows`). `ValidationError` objects are counted as
+            failed rows.
+        :param str source: Identifies the campaign in the checkpoint (so a
+            checkpoint isn't resumed against a different campaign) and in its
+            call files' `idempotency_key`.
+        :param func progress: Called with an `ImportReport` after each chunk.
+        :raises: `ValueError` if the checkpoint is corrupt.
+        :rtype: `ImportReport` object.
+        """
+        start = monotonic()
+        done = self._load_checkpoint(source) if self.checkpoint else 0
+        rows = iter(rows)
+        for _ in islice(rows, done):
+            pass
+
+        spooled = 0
+        failed = []
+        while True:
+            chunk = list(islice(rows, self.chunksize))
+            if not chunk:
+                break
+
+            cfs = []
+            numbers = []
+            for n, row in enumerate(chunk, done + 1):
+                try:
+                    cf = self.build(row)
+                except ValidationError as e:
+                    failed.append((n, e))
+                    continue
+                if source is not None:
+                    cf.idempotency_key = '%s#%d' % (source, n)
+                cfs.append(cf)
+                numbers.append(n)
+
+            for n, result in zip(numbers, CallFile.spool_many(cfs)):
+                if result.ok:
+                    spooled += 1
+                else:
+                    failed.append((n, result.error))
+
+            done += len(chunk)
+            if self.checkpoint:
+                self._save_checkpoint(source, done)
+            if progress:
+                progress(ImportReport(done, spooled, failed,
+                        monotonic() - start))
+
+        return ImportReport(done, spooled, failed, monotonic() - start)
+
+    def run_file(self, path, format=None, progress=None):
+        """Spool a call file for every row of a CSV or JSON Lines file.
+
+        :param str path: The campaign file.
+        :param str format: 'csv' or 'jsonl' (see :func:`read_rows`).
+        :param func progress: Called with an `ImportReport` after each chunk.
+        :raises: `IOError` if the file can't be read, or `ValueError` if the
+            checkpoint is corrupt.
+        :rtype: `ImportReport` object.
+        """
+        return self.run(read_rows(path, format), abspath(path), progress)
@@ -0,0 +1,342 @@
+"""A write-ahead journal that makes spooling safe across crashes."""
+
+
+from collections import namedtuple
+from errno import EEXIST, EXDEV
+from os import O_RDONLY, close, error, fsync, listdir, makedirs, remove, \
+    rename
+from os.path import exists
+import os
+from threading import Condition
+
+from path import Path
+
+from .archive import ArchiveIndex
+from .callfile import CallFile, SpoolResult, _write_error
+from .errors import CrossDeviceError, NoSpoolPermissionError, PycallError
+
+
+class Reconciliation(namedtuple('Reconciliation', ['republished', 'queued',
+        'archived', 'finished', 'discarded', 'failed'])):
+    """What :meth:`SpoolJournal.reconcile` found after a crash.
+
+    Each field is a list of call file names. `republished` call files were
+    staged but not yet spooled, and have now been spooled. `queued` call
+    files are waiting in the spooling directory, `archived` ones are in the
+    archive directory, and `finished` ones were spooled and have already been
+    processed by Asterisk. `discarded` call files were staged but never
+    journaled (so their spool never succeeded), and have been removed.
+
+    `failed` is a list of ``(name, error)`` pairs, one for each staged call
+    file that couldn't be renamed into place. It's left staged and pending,
+    so the next :meth:`~SpoolJournal.reconcile` tries it again.
+    """
+
+    __slots__ = ()
+
+
+class SpoolJournal(object):
+    """Spools call files exactly once, even if the spooling process crashes
+    (but not across a power failure: see below).
+
+    Each call file is first written to a staging directory (which must be on
+    the same filesystem as the spooling directory). Its name is then appended
+    to the journal as an intent, the journal is fsynced, and the call file is
+    atomically renamed into the spooling directory. A completion record is
+    appended afterwards, without an fsync of its own.
+
+    The journal is fsynced once per batch rather than once per call file:
+    :meth:`spool_many` journals a whole batch at a time, and concurrent
+    :meth:`spool` calls share fsyncs (group commit).
+
+    After a crash, :meth:`reconcile` finishes every interrupted spool: a
+    journaled call file that is still staged hasn't been spooled yet, so it's
+    renamed into place; one that isn't has already been spooled. Staged call
+    files that were never journaled are removed, since their spool never
+    returned.
+
+    These guarantees hold for crashes of the spooling process, not of the
+    machine. Staged call files are only fsynced if the call file's `sync`
+    option asks for it, and the staging and spooling directories only with
+    `SYNC_FULL`, once the rename is done. After a power failure before then,
+    a staged call file may be lost, or a rename only partly persisted,
+    leaving the call file in both directories: :meth:`reconcile` then spools
+    it a second time.
+    """
+
+    #: Compact the journal once it has this many completed records.
+    COMPACT_THRESHOLD = 10000
+
+    def __init__(self, path, staging_dir, spool_dir=None, archive_dir=None):
+        """Create a new `SpoolJournal` object.
+
+        :param str path: The journal file. It is created if it doesn't exist.
+        :param str staging_dir: Directory to stage call files in. It is
+            created if it doesn't exist yet.
+        :param str spool_dir: The spooling directory.
+        :param str archive_dir: Directory Asterisk archives call files to.
+        :rtype: `SpoolJournal` object.
+        """
+        self.path = path
+        self.staging_dir = Path(staging_dir)
+        self.spool_dir = Path(spool_dir or CallFile.DEFAULT_SPOOL_DIR)
+        self.archive_dir = Path(archive_dir or
+                ArchiveIndex.DEFAULT_ARCHIVE_DIR)
+        self._pending = set()
+        self._completed = 0
+        self._written = 0
+        self._synced = 0
+        self._syncing = False
+        self._cond = Condition()
+
+        try:
+            makedirs(self.staging_dir)
+        except error as e:
+            if e.errno != EEXIST:
+                raise NoSpoolPermissionError
+
+        self._load()
+        self._log = open(path, 'a')
+
+    def _load(self):
+        try:
+            with open(self.path) as f:
+                for line in f:
+                    if not line.endswith('\n'):
+                        # A partially written record, from a crash.
+                        break
+                    op, _, name = line.rstrip('\n').partition(' ')
+                    if op == 'I':
+                        self._pending.add(name)
+                    elif op == 'D':
+                        self._pending.discard(name)
+                        self._completed += 1
+        except IOError:
+            pass
+
+    def pending(self):
+        """Get the names of the call files whose spool hasn't completed.
+
+        :rtype: Set of strings.
+        """
+        with self._cond:
+            return set(self._pending)
+
+    def _append(self, op, names):
+        """Append records to the journal.
+
+        :returns: The record count to pass to :meth:`_commit`.
+        """
+        with self._cond:
+            self._log.write(''.join('%s %s\n' % (op, n) for n in names))
+            self._written += len(names)
+            if op == 'I':
+                self._pending.update(names)
+            else:
+                self._pending.difference_update(names)
+                self._completed += len(names)
+            return self._written
+
+    def _commit(self, written):
+        """Wait until the journal is durable up to `written` records.
+
+        Only one thread fsyncs at a time, and each fsync covers every record
+        appended before it started, so concurrent callers share fsyncs.
+        """
+        with self._cond:
+            while self._synced < written:
+                if not self._syncing:
+                    self._syncing = True
+                    target = self._written
+                    self._log.flush()
+                    self._cond.release()
+                    try:
+                        fsync(self._log.fileno())
+                    finally:
+                        self._cond.acquire()
+                        self._syncing = False
+                        self._synced = max(self._synced, target)
+                        self._cond.notify_all()
+                else:
+                    self._cond.wait()
+
+    def _stage(self, callfile, time):
+        callfile.tempdir = self.staging_dir
+        callfile.spool_dir = self.spool_dir
+        callfile.staging = True
+        callfile._stage(time, callfile._owner(), check_spool_dir=True,
+                named=True)
+        return str(callfile.filename)
+
+    def _discard(self, name):
+        try:
+            remove(self.staging_dir / name)
+        except error:
+            pass
+
+    def _rename(self, name):
+        """Rename a journaled call file into the spooling directory."""
+        try:
+            rename(self.staging_dir / name, self.spool_dir / name)
+        except error as e:
+            if e.errno == EXDEV:
+                raise CrossDeviceError
+            raise NoSpoolPermissionError
+
+    def _publish(self, name):
+        """Rename a freshly journaled call file into the spooling directory.
+
+        If that fails, the call file is removed from the staging directory
+        and marked complete, so that it isn't spooled by :meth:`reconcile`
+        after the caller has been told it failed.
+        """
+        try:
+            self._rename(name)
+        except PycallError:
+            self._discard(name)
+            self._complete([name])
+            raise
+
+    def _sync_dirs(self):
+        """Fsync the staging and spooling directories, so renames between
+        them survive a power failure.
+        """
+        for path in (self.staging_dir, self.spool_dir):
+            try:
+                fd = os.open(path, O_RDONLY)
+                try:
+                    fsync(fd)
+                finally:
+                    close(fd)
+            except error as e:
+                raise _write_error(e)
+
+    def _complete(self, names):
+        self._append('D', names)
+        with self._cond:
+            self._log.flush()
+            if not self._pending and \
+                    self._completed >= self.COMPACT_THRESHOLD:
+                self._compact()
+
+    def spool(self, callfile, time=None):
+        """Spool a call file through the journal.
+
+        :param obj callfile: A `pycall.CallFile` instance. Its `tempdir`,
+            `spool_dir` and `staging` attributes are overridden by the
+            journal's.
+        :param datetime time: The date and time to spool this call file (see
+            :meth:`pycall.CallFile.spool`).
+        """
+        name = self._stage(callfile, time)
+        self._commit(self._append('I', [name]))
+        self._publish(name)
+        if callfile.sync == callfile.SYNC_FULL:
+            self._sync_dirs()
+        self._complete([name])
+
+    def spool_many(self, callfiles, time=None):
+        """Spool a batch of call files through the journal, with a single
+        journal fsync.
+
+        :param iterable callfiles: `CallFile` objects to spool (see
+            :meth:`spool`).
+        :param datetime time: The date and time to spool these call files.
+        :returns: One result per call file, in the order given.
+        :rtype: List of `SpoolResult` objects.
+        """
+        results = []
+        staged = []
+        for cf in callfiles:
+            try:
+                staged.append(self._stage(cf, time))
+            except PycallError as e:
+                results.append(SpoolResult(cf, e))
+            else:
+                results.append(SpoolResult(cf, None))
+
+        if staged:
+            self._commit(self._append('I', staged))
+
+        published = []
+        sync = False
+        names = iter(staged)
+        for i, result in enumerate(results):
+            if result.ok:
+                name = next(names)
+                try:
+                    self._publish(name)
+                except PycallError as e:
+                    results[i] = SpoolResult(result.callfile, e)
+                else:
+                    published.append(name)
+                    sync = sync or result.callfile.sync == CallFile.SYNC_FULL
+
+        if sync:
+            self._sync_dirs()
+        if published:
+            self._complete(published)
+        return results
+
+    def reconcile(self):
+        """Finish every spool that was interrupted by a crash.
+
+        :returns: Where each interrupted call file was found.
+        :rtype: `Reconciliation` object.
+        """
+        report = Reconciliation([], [], [], [], [], [])
+        pending = self.pending()
+        staged = set(n for n in listdir(self.staging_dir)
+                if not n.startswith('.'))
+
+        for name in sorted(pending):
+            if name in staged:
+                try:
+                    self._rename(name)
+                except PycallError as e:
+                    report.failed.append((name, e))
+                else:
+                    report.republished.append(name)
+            elif exists(self.spool_dir / name):
+                report.queued.append(name)
+            elif exists(self.archive_dir / name):
+                report.archived.append(name)
+            else:
+                report.finished.append(name)
+
+        for name in sorted(staged - pending):
+            remove(self.staging_dir / name)
+            report.discarded.append(name)
+
+        if report.republished:
+            self._sync_dirs()
+        done = pending.difference(name for name, _ in report.failed)
+        if done:
+            self._complete(sorted(done))
+        self.compact()
+        return report
+
+    def _compact(self):
+        tmp = self.path + '.tmp'
+        with open(tmp, 'w') as f:
+            f.write(''.join('I %s\n' % n for n in sorted(self._pending)))
+            f.flush()
+            fsync(f.fileno())
+        rename(tmp, self.path)
+        self._log.close()
+        self._log = open(self.path, 'a')
+        self._completed = 0
+
+    def compact(self):
+        """Rewrite the journal with only the pending intents."""
+        with self._cond:
+            self._compact()
+
+    def close(self):
+        """Flush and close the journal."""
+        with self._cond:
+            if self._log is not None:
+                self._log.flush()
+                fsync(self._log.fileno())
+                self._log.close()
+                self._log = None
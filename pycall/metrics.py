@@ -0,0 +1,154 @@
+"""Optional instrumentation of the spooling hot path."""
+
+
+from bisect import bisect_left
+from os import fsync, rename
+from threading import Lock
+
+try:
+    from time import perf_counter as clock
+except ImportError:
+    from time import time as clock
+
+
+#: The installed `MetricsSink`, or None if instrumentation is disabled.
+sink = None
+
+
+def set_sink(new):
+    """Install a metrics sink, which is sent measurements from every spool.
+
+    :param obj new: A `MetricsSink` instance, or None to disable
+        instrumentation.
+    :returns: The previously installed sink.
+    """
+    global sink
+    old, sink = sink, new
+    return old
+
+
+class MetricsSink(object):
+    """Receives measurements from :meth:`pycall.CallFile.spool`.
+
+    Spooling a call file is broken into phases: `owner` (looking up the
+    user), `render`, `write`, `chown`, `utime`, `sync` and `move`. Phases that
+    have nothing to do (eg: `utime` when spooling immediately) are skipped.
+    The whole spool is also timed as `spool`, and only for call files that
+    were spooled successfully.
+
+    Subclasses override the methods they're interested in. They're called from
+    whichever thread spools the call file.
+    """
+
+    def timing(self, phase, seconds):
+        """Record how long a phase of spooling took."""
+
+    def error(self, error):
+        """Record a `PycallError` raised while spooling."""
+
+
+class Timer(object):
+    """Times the consecutive phases of a spool."""
+
+    __slots__ = ('sink', 'start', 'last')
+
+    def __init__(self, sink):
+        self.sink = sink
+        self.start = self.last = clock()
+
+    def lap(self, phase):
+        """Record the time since the last lap as `phase`."""
+        t = clock()
+        self.sink.timing(phase, t - self.last)
+        self.last = t
+
+    def total(self):
+        """Record the time since the timer started as `spool`."""
+        self.sink.timing('spool', clock() - self.start)
+
+
+class PrometheusSink(MetricsSink):
+    """Collects spool metrics, and exports them in the Prometheus text format.
+
+    Phase timings are kept as histograms (`pycall_spool_phase_seconds`), and
+    errors as counters by error class (`pycall_spool_errors_total`). Nothing
+    is served over the network: :meth:`render` returns the metrics as text,
+    and :meth:`write` saves them to a file (eg: for node_exporter's textfile
+    collector).
+    """
+
+    #: The default histogram bucket upper bounds, in seconds.
+    DEFAULT_BUCKETS = (0.00001, 0.00005, 0.0001, 0.0005, 0.001, 0.005, 0.01,
+            0.05, 0.1, 0.5, 1.0)
+
+    def __init__(self, buckets=None):
+        """Create a new `PrometheusSink` object.
+
+        :param tuple buckets: Histogram bucket upper bounds, in seconds.
+        :rtype: `PrometheusSink` object.
+        """
+        self.buckets = tuple(sorted(buckets or self.DEFAULT_BUCKETS))
+        self._phases = {}
+        self._errors = {}
+        self._lock = Lock()
+
+    def timing(self, phase, seconds):
+        i = bisect_left(self.buckets, seconds)
+        with self._lock:
+            h = self._phases.get(phase)
+            if h is None:
+                h = self._phases[phase] = [[0] * (len(self.buckets) + 1), 0.0]
+            h[0][i] += 1
+            h[1] += seconds
+
+    def error(self, error):
+        name = error.__class__.__name__
+        with self._lock:
+            self._errors[name] = self._errors.get(name, 0) + 1
+
+    def render(self):
+        """Get the collected metrics in the Prometheus text format.
+
+        :rtype: String.
+        """
+        with self._lock:
+            phases = [(p, list(h[0]), h[1]) for p, h in self._phases.items()]
+            errors = list(self._errors.items())
+
+        bounds = ['%r' % b for b in self.buckets] + ['+Inf']
+        lines = [
+            '# HELP pycall_spool_phase_seconds Time spent in each phase of '
+                    'spooling a call file.',
+            '# TYPE pycall_spool_phase_seconds histogram',
+        ]
+        for phase, counts, total in sorted(phases):
+            n = 0
+            for le, count in zip(bounds, counts):
+                n += count
+                lines.append('pycall_spool_phase_seconds_bucket{phase="%s",'
+                        'le="%s"} %d' % (phase, le, n))
+            lines.append('pycall_spool_phase_seconds_sum{phase="%s"} %r' % (
+                    phase, total))
+            lines.append('pycall_spool_phase_seconds_count{phase="%s"} %d' % (
+                    phase, n))
+
+        lines.append('# HELP pycall_spool_errors_total Call files that failed '
+                'to spool, by error.')
+        lines.append('# TYPE pycall_spool_errors_total counter')
+        for name, count in sorted(errors):
+            lines.append('pycall_spool_errors_total{error="%s"} %d' % (name,
+                    count))
+
+        return '\n'.join(lines) + '\n'
+
+    def write(self, path):
+        """Atomically write the collected metrics to a file.
+
+        :param str path: The file to write.
+        """
+        tmp = path + '.tmp'
+        with open(tmp, 'w') as f:
+            f.write(self.render())
+            f.flush()
+            fsync(f.fileno())
+        rename(tmp, path)
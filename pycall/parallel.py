@@ -0,0 +1,153 @@
+"""Spool very large numbers of call files using a pool of processes."""
+
+
+from collections import deque, namedtuple
+from itertools import islice
+from multiprocessing import Pool, cpu_count
+
+from .call import Call
+from .actions import Application, Context
+from .callfile import CallFile
+from .errors import ValidationError
+
+
+#: The keys of a spec dict that are passed to `Call`.
+CALL_KEYS = ('channel', 'callerid', 'variables', 'account', 'wait_time',
+        'retry_time', 'max_retries')
+
+#: The keys of a spec dict (or of the defaults) that are passed to `CallFile`.
+CALLFILE_KEYS = ('archive', 'filename', 'tempdir', 'user', 'spool_dir',
+        'staging', 'sync')
+
+
+class ParallelReport(namedtuple('ParallelReport', ['spooled', 'failed'])):
+    """The outcome of a :func:`spool_parallel` run.
+
+    `spooled` is the number of call files spooled, and `failed` is a list of
+    ``(index, error)`` pairs, one for each spec that couldn't be spooled.
+    """
+
+    __slots__ = ()
+
+
+def callfile_from_spec(spec, defaults=None):
+    """Build a `CallFile` from a plain call spec.
+
+    A spec is either a dict, or a tuple. Dicts hold `Call` and `CallFile`
+    arguments by name (see `CALL_KEYS` and `CALLFILE_KEYS`), and either
+    `application` and `data`, or `context`, `extension` and `priority`.
+    Tuples are either ``(channel, application, data)``, or
+    ``(channel, context, extension, priority)``.
+
+    :param spec: The call spec.
+    :param dict defaults: `CallFile` arguments to use when the spec doesn't
+        give them.
+    :raises: `ValidationError` if the spec is malformed.
+    :rtype: `CallFile` object.
+    """
+    kwargs = dict(defaults or ())
+
+    try:
+        if isinstance(spec, dict):
+            call = Call(**dict((k, spec[k]) for k in CALL_KEYS if k in spec))
+            if 'application' in spec:
+                action = Application(spec['application'], spec['data'])
+            else:
+                action = Context(spec['context'], spec['extension'],
+                        spec['priority'])
+            kwargs.update((k, spec[k]) for k in CALLFILE_KEYS if k in spec)
+        elif len(spec) == 3:
+            call, action = Call(spec[0]), Application(spec[1], spec[2])
+        elif len(spec) == 4:
+            call, action = Call(spec[0]), Context(*spec[1:])
+        else:
+            raise ValidationError
+    except (KeyError, TypeError):
+        raise ValidationError
+
+    return CallFile(call, action, **kwargs)
+
+
+def _chunks(specs, size):
+    specs = iter(specs)
+    start = 0
+    while True:
+        chunk = list(islice(specs, size))
+        if not chunk:
+            return
+        yield start, chunk
+        start += len(chunk)
+
+
+def _spool_chunk(args):
+    """Spool one chunk of specs in a worker process.
+
+    Any error building or spooling a call file is reported as its failure,
+    so one bad spec doesn't lose the rest of the chunk's results.
+
+    :returns: The number of call files spooled, and a list of ``(index,
+        error)`` failures.
+    :rtype: Tuple.
+    """
+    start, specs, defaults, time = args
+    failed = []
+
+    for i, spec in enumerate(specs, start):
+        try:
+            callfile_from_spec(spec, defaults).spool(time)
+        except Exception as e:
+            failed.append((i, e))
+
+    return len(specs) - len(failed), failed
+
+
+def spool_parallel(specs, processes=None, chunksize=1000, time=None,
+        **defaults):
+    """Render and spool call files from plain specs, in parallel.
+
+    Specs are split into chunks of `chunksize`, and each chunk is rendered and
+    spooled by one of `processes` worker processes. Only the specs and the
+    failures cross process boundaries, and specs are read lazily: at most two
+    chunks per worker are in flight at a time.
+
+    :param iterable specs: Call specs (see :func:`callfile_from_spec`).
+    :param int processes: Number of worker processes. Defaults to the number
+        of CPUs.
+    :param int chunksize: Number of specs handed to a worker at a time.
+    :param datetime time: The date and time to spool the call files (see
+        :meth:`~pycall.CallFile.spool`).
+    :param defaults: `CallFile` arguments (eg: `spool_dir`, `user`) to use
+        when a spec doesn't give them.
+    :rtype: `ParallelReport` object.
+    """
+    processes = processes or cpu_count()
+    spooled = 0
+    failed = []
+    pending = deque()
+
+    def collect():
+        start, size, result = pending.popleft()
+        try:
+            count, errors = result.get()
+        except Exception as e:
+            # The chunk's results were lost (eg: an error couldn't be
+            # pickled), so report every spec in it.
+            count, errors = 0, [(i, e) for i in range(start, start + size)]
+        failed.extend(errors)
+        return count
+
+    pool = Pool(processes)
+    try:
+        for start, chunk in _chunks(specs, chunksize):
+            if len(pending) >= 2 * processes:
+                spooled += collect()
+            pending.append((start, len(chunk), pool.apply_async(_spool_chunk,
+                    ((start, chunk, defaults, time),))))
+        while pending:
+            spooled += collect()
+    finally:
+        pool.close()
+        pool.join()
+
+    failed.sort(key=lambda f: f[0])
+    return ParallelReport(spooled, failed)
@@ -0,0 +1,162 @@
+"""Read Asterisk call files back into pycall objects."""
+
+
+from os import listdir
+from os.path import basename, isfile, join
+
+try:
+    from os import scandir
+except ImportError:
+    scandir = None
+
+from .call import Call
+from .actions import Application, Context
+from .callfile import CallFile
+from .errors import ValidationError
+
+
+#: Call file directives that map onto `Call` attributes (Asterisk ignores the
+#: case of directives).
+CALL_DIRECTIVES = {
+    'channel': 'channel',
+    'callerid': 'callerid',
+    'account': 'account',
+    'waittime': 'wait_time',
+    'retrytime': 'retry_time',
+    'maxretries': 'max_retries',
+}
+
+#: Directives Asterisk appends to a call file as it processes it.
+HISTORY_DIRECTIVES = {
+    'startretry': 'StartRetry',
+    'endretry': 'EndRetry',
+}
+
+_INTEGERS = ('wait_time', 'retry_time', 'max_retries')
+_ACTIONS = ('application', 'data', 'context', 'extension', 'priority')
+_TRUE = ('yes', 'true', 'y', 't', '1', 'on')
+
+
+def parse(text, **kwargs):
+    """Parse the contents of a call file.
+
+    As well as the directives pycall writes, this understands the `Status`,
+    `StartRetry` and `EndRetry` directives Asterisk appends to call files. The
+    last `Status` is stored in the call file's `status` attribute, and the
+    retry directives in its `history` attribute, as a list of ``(directive,
+    value)`` pairs. Unknown directives are ignored.
+
+    :param str text: Call file contents.
+    :param kwargs: Extra arguments for `CallFile` (eg: `spool_dir`).
+    :raises: `ValidationError` if the text isn't a valid call file.
+    :rtype: `CallFile` object.
+    """
+    fields = {}
+    variables = {}
+    action = {}
+    archive = None
+    status = None
+    history = []
+
+    for line in text.splitlines():
+        line = line.strip()
+        if not line or line[0] in '#;':
+            continue
+
+        key, sep, value = line.partition(':')
+        if not sep:
+            raise ValidationError
+        key = key.strip().lower()
+        value = value.strip()
+
+        if key in CALL_DIRECTIVES:
+            fields[CALL_DIRECTIVES[key]] = value
+        elif key in ('set', 'setvar'):
+            name, _, value = value.partition('=')
+            variables[name] = value
+        elif key in _ACTIONS:
+            action[key] = value
+        elif key == 'archive':
+            archive = value.lower() in _TRUE or None
+        elif key == 'status':
+            status = value
+        elif key in HISTORY_DIRECTIVES:
+            history.append((HISTORY_DIRECTIVES[key], value))
+
+    if 'channel' not in fields:
+        raise ValidationError
+
+    try:
+        for field in _INTEGERS:
+            if field in fields:
+                fields[field] = int(fields[field])
+    except ValueError:
+        raise ValidationError
+
+    if 'application' in action:
+        a = Application(action['application'], action.get('data', ''))
+    elif 'context' in action:
+        a = Context(action['context'], action.get('extension', 's'),
+                action.get('priority', '1'))
+    else:
+        raise ValidationError
+
+    cf = CallFile(Call(variables=variables or None, **fields), a,
+            archive=archive, **kwargs)
+    cf.status = status
+    cf.history = history
+    return cf
+
+
+def parse_file(path, **kwargs):
+    """Parse a call file on disk.
+
+    The call file's name is kept as the `CallFile` object's `filename`, so
+    spooling it again reuses the name.
+
+    :param str path: Path to the call file.
+    :param kwargs: Extra arguments for `CallFile` (eg: `spool_dir`).
+    :raises: `ValidationError` if the file isn't a valid call file.
+    :rtype: `CallFile` object.
+    """
+    with open(path) as f:
+        text = f.read()
+    kwargs.setdefault('filename', basename(path))
+    return parse(text, **kwargs)
+
+
+def _files(directory):
+    if scandir is not None:
+        for entry in scandir(directory):
+            if entry.name[0] != '.' and entry.is_file():
+                yield entry.path
+    else:
+        for name in listdir(directory):
+            path = join(directory, name)
+            if name[0] != '.' and isfile(path):
+                yield path
+
+
+def iter_callfiles(directory, ignore_errors=False, **kwargs):
+    """Lazily parse every call file in a directory.
+
+    Call files are read and parsed one at a time, as the generator is
+    consumed, so even very large directories (eg: Asterisk's `outgoing_done`
+    archive) use very little memory.
+
+    :param str directory: Directory to read call files from.
+    :param bool ignore_errors: Skip call files that can't be read or parsed,
+        instead of raising an error.
+    :param kwargs: Extra arguments for `CallFile` (eg: `spool_dir`).
+    :raises: `ValidationError` or `IOError` if a call file can't be parsed or
+        read, unless `ignore_errors` is set.
+    :rtype: Generator of `CallFile` objects.
+    """
+    for path in _files(directory):
+        try:
+            cf = parse_file(path, **kwargs)
+        except (ValidationError, IOError, UnicodeDecodeError):
+            if ignore_errors:
+                continue
+            raise
+        yield cf
@@ -0,0 +1,261 @@
+"""Spool urgent call files ahead of bulk ones."""
+
+
+import logging
+from collections import deque, namedtuple
+from threading import Condition
+
+try:
+    from time import monotonic
+except ImportError:
+    from time import time as monotonic
+
+from path import Path
+
+from .callfile import CallFile
+from .throttle import TokenBucket
+
+
+_log = logging.getLogger(__name__)
+
+
+class LaneStats(namedtuple('LaneStats', ['queued', 'spooled', 'failed',
+        'mean_latency', 'max_latency'])):
+    """A lane's counters, and how long (in seconds) its call files waited
+    between being submitted and being spooled.
+    """
+
+    __slots__ = ()
+
+
+class Lane(object):
+    """A queue of call files with a share of the spooling throughput."""
+
+    def __init__(self, name, weight=1, rate=None, burst=None):
+        """Create a new `Lane` object.
+
+        :param str name: The lane's name.
+        :param int weight: The lane's share of dispatches, relative to the
+            other lanes' weights (0 for a background lane).
+        :param float rate: Maximum number of call files spooled per second
+            from this lane.
+        :param int burst: Maximum number of call files spooled in a burst when
+            `rate` is set (see `pycall.TokenBucket`).
+        :rtype: `Lane` object.
+        """
+        self.name = name
+        self.weight = weight
+        self.bucket = TokenBucket(rate, burst) if rate else None
+        self._queue = deque()
+        self._current = 0
+        self._spooled = 0
+        self._failed = 0
+        self._latency = 0.0
+        self._max_latency = 0.0
+
+    def __len__(self):
+        """Return the number of call files waiting in this lane."""
+        return len(self._queue)
+
+    def stats(self):
+        """Get this lane's counters and latencies.
+
+        :rtype: `LaneStats` object.
+        """
+        done = self._spooled + self._failed
+        return LaneStats(len(self._queue), self._spooled, self._failed,
+                self._latency / done if done else 0.0, self._max_latency)
+
+
+class PrioritySpooler(object):
+    """Spools call files from several lanes, by weighted fair share.
+
+    Each dispatch picks a lane with smooth weighted round-robin, so a lane
+    with weight 10 is picked ten times as often as a lane with weight 1 while
+    both have call files waiting, and an urgent call file never waits behind
+    more than a few bulk ones. Lanes with a `rate` are skipped while they're
+    over it.
+
+    A lane with weight 0 is only dispatched from when no other lane has
+    call files waiting. To stop low-weight lanes starving, any lane whose
+    oldest call file has waited `starvation_after` seconds is treated as if it
+    had the highest weight of the waiting lanes, until it catches up.
+    """
+
+    #: How long (in seconds) a call file can wait before its lane's weight is
+    #: raised.
+    DEFAULT_STARVATION_AFTER = 5.0
+
+    #: The longest (in seconds) :meth:`run` will sleep between dispatches.
+    POLL_INTERVAL = 1.0
+
+    def __init__(self, lanes, spool_dir=None, starvation_after=None,
+            on_error=None, clock=monotonic):
+        """Create a new `PrioritySpooler` object.
+
+        :param list lanes: `Lane` objects.
+        :param str spool_dir: Directory to spool call files to.
+        :param float starvation_after: How long (in seconds) a call file can
+            wait before its lane's weight is raised.
+        :param func on_error: Called with the call file and the exception
+            (usually a `PycallError`) when a call file can't be spooled. If
+            not given, failures are logged.
+        :param func clock: Returns the current time in seconds.
+        :rtype: `PrioritySpooler` object.
+        """
+        self.lanes = dict((lane.name, lane) for lane in lanes)
+        self._order = list(lanes)
+        self.spool_dir = Path(spool_dir or CallFile.DEFAULT_SPOOL_DIR)
+        self.starvation_after = self.DEFAULT_STARVATION_AFTER \
+                if starvation_after is None else starvation_after
+        self.on_error = on_error
+        self.clock = clock
+        self._cond = Condition()
+        self._running = False
+
+    def __len__(self):
+        """Return the number of call files waiting in every lane."""
+        with self._cond:
+            return sum(len(lane) for lane in self._order)
+
+    def submit(self, callfile, lane, time=None):
+        """Queue a call file to be spooled.
+
+        :param obj callfile: A `pycall.CallFile` instance. Its `spool_dir` is
+            overridden by the spooler's.
+        :param str lane: The name of the lane to queue it in.
+        :param datetime time: The date and time to spool this call file (see
+            :meth:`~pycall.CallFile.spool`).
+        :raises: `KeyError` if there's no such lane.
+        """
+        with self._cond:
+            self.lanes[lane]._queue.append((self.clock(), callfile, time))
+            self._cond.notify()
+
+    def _admit(self, lane):
+        return lane.bucket is None or lane.bucket.take()
+
+    def _next(self):
+        """Pick the lane to dispatch from next.
+
+        :returns: The lane, or None if no lane can be dispatched from.
+        :rtype: `Lane` object.
+        """
+        waiting = [lane for lane in self._order if lane._queue]
+        if not waiting:
+            return None
+
+        cutoff = self.clock() - self.starvation_after
+        top = max(lane.weight for lane in waiting)
+        weights = dict((lane, top if lane._queue[0][0] <= cutoff else
+                lane.weight) for lane in waiting)
+
+        while waiting:
+            total = 0
+            best = None
+            for lane in waiting:
+                lane._current += weights[lane]
+                total += weights[lane]
+                if best is None or lane._current > best._current:
+                    best = lane
+            best._current -= total
+            if self._admit(best):
+                return best
+            waiting.remove(best)
+
+        return None
+
+    def dispatch(self, limit=None):
+        """Spool queued call files, in weighted fair order, until no lane can
+        be dispatched from.
+
+        :param int limit: Maximum number of call files to spool.
+        :returns: The number of call files dispatched.
+        :rtype: Integer.
+        """
+        dispatched = 0
+        while limit is None or dispatched < limit:
+            with self._cond:
+                lane = self._next()
+                if lane is None:
+                    break
+                submitted, callfile, time = lane._queue.popleft()
+
+            callfile.spool_dir = self.spool_dir
+            try:
+                callfile.spool(time)
+            except Exception as e:
+                error = e
+            else:
+                error = None
+            latency = self.clock() - submitted
+
+            with self._cond:
+                if error is None:
+                    lane._spooled += 1
+                else:
+                    lane._failed += 1
+                lane._latency += latency
+                lane._max_latency = max(lane._max_latency, latency)
+            if error is not None:
+                self._report(callfile, error)
+            dispatched += 1
+
+        return dispatched
+
+    def _report(self, callfile, e):
+        if self.on_error is None:
+            _log.warning('Could not spool %s: %r', callfile.filename, e)
+            return
+        try:
+            self.on_error(callfile, e)
+        except Exception:
+            _log.exception('on_error failed for %s', callfile.filename)
+
+    def next_dispatch(self):
+        """Get how long (in seconds) until a waiting call file can be
+        dispatched.
+
+        :returns: 0 if one can be dispatched now, or None if no call files are
+            waiting.
+        :rtype: Float.
+        """
+        with self._cond:
+            waits = [0.0 if lane.bucket is None else lane.bucket.delay()
+                    for lane in self._order if lane._queue]
+        return min(waits) if waits else None
+
+    def stats(self):
+        """Get every lane's counters and latencies.
+
+        :returns: `LaneStats` objects, by lane name.
+        :rtype: Dict.
+        """
+        with self._cond:
+            return dict((name, lane.stats()) for name, lane in
+                    self.lanes.items())
+
+    def run(self):
+        """Dispatch call files as they're submitted, until :meth:`stop` is
+        called.
+
+        This blocks, so it's usually run in a thread of its own.
+        """
+        with self._cond:
+            self._running = True
+
+        while True:
+            self.dispatch()
+            with self._cond:
+                if not self._running:
+                    break
+                wait = self.next_dispatch()
+                if wait is None or wait > 0:
+                    self._cond.wait(min(wait or self.POLL_INTERVAL,
+                            self.POLL_INTERVAL))
+
+    def stop(self):
+        """Stop a running :meth:`run` loop."""
+        with self._cond:
+            self._running = False
+            self._cond.notify()
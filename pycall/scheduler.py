@@ -0,0 +1,198 @@
+"""Hold future-dated call files back until shortly before they're due."""
+
+
+import logging
+from errno import EEXIST, ENOENT, EXDEV
+from heapq import heappop, heappush
+from os import error, listdir, makedirs, rename, stat
+from os.path import exists
+from threading import Condition
+from time import mktime, time as now
+
+from path import Path
+
+from .callfile import CallFile
+from .errors import CrossDeviceError, InvalidTimeError, NoSpoolPermissionError
+
+
+_log = logging.getLogger(__name__)
+
+class SpoolScheduler(object):
+    """Stages future-dated call files, and releases them into the spooling
+    directory shortly before they're due.
+
+    Asterisk re-scans every call file in its spooling directory, so a large
+    scheduled campaign spooled all at once makes every scan slow. Instead, a
+    `SpoolScheduler` writes scheduled call files to a staging directory (which
+    must be on the same filesystem as the spooling directory), and keeps them
+    in a heap ordered by due time. :meth:`dispatch` atomically renames each
+    call file into place once it's within `lead_time` seconds of being due.
+
+    Each staged call file's modification time is its due time, so pending
+    calls are recovered from the staging directory after a restart.
+
+    A call file that can't be released is set aside and retried every
+    `RETRY_INTERVAL` seconds, without holding up the others. One that has
+    disappeared from the staging directory is dropped.
+    """
+
+    #: How long (in seconds) before its due time a call file is released.
+    DEFAULT_LEAD_TIME = 60
+
+    #: The longest (in seconds) :meth:`run` will sleep between dispatches.
+    POLL_INTERVAL = 1.0
+
+    #: How long (in seconds) to wait before retrying a call file that
+    #: couldn't be released.
+    RETRY_INTERVAL = 30
+
+    def __init__(self, staging_dir, spool_dir=None, lead_time=None,
+            on_error=None):
+        """Create a new `SpoolScheduler` object.
+
+        :param str staging_dir: Directory to hold scheduled call files in. It
+            is created if it doesn't exist yet.
+        :param str spool_dir: Directory to release call files to.
+        :param int lead_time: How long (in seconds) before its due time a call
+            file is released.
+        :param func on_error: Called with the call file's name and the
+            `PycallError` each time a call file can't be released. If not
+            given, the error is logged.
+        :rtype: `SpoolScheduler` object.
+        """
+        self.staging_dir = Path(staging_dir)
+        self.spool_dir = Path(spool_dir or CallFile.DEFAULT_SPOOL_DIR)
+        self.lead_time = self.DEFAULT_LEAD_TIME if lead_time is None \
+                else lead_time
+        self.on_error = on_error
+        self._heap = []
+        self._cond = Condition()
+        self._running = False
+
+        try:
+            makedirs(self.staging_dir)
+        except error as e:
+            if e.errno != EEXIST:
+                raise NoSpoolPermissionError
+
+        self.recover()
+
+    def __len__(self):
+        """Return the number of call files waiting to be released."""
+        return len(self._heap)
+
+    def recover(self):
+        """Reload pending call files from the staging directory."""
+        heap = []
+        for name in listdir(self.staging_dir):
+            if name.startswith('.'):
+                continue
+            try:
+                heap.append((stat(self.staging_dir / name).st_mtime, name))
+            except error:
+                pass
+
+        with self._cond:
+            self._heap = sorted(heap)
+            self._cond.notify()
+
+    def schedule(self, callfile, time):
+        """Schedule a call file to be spooled at a specific time.
+
+        The call file is written to the staging directory right away, and is
+        released to the spooling directory `lead_time` seconds before `time`.
+
+        :param obj callfile: A `pycall.CallFile` instance. Its `tempdir` and
+            `spool_dir` are overridden by the scheduler's.
+        :param datetime time: The date and time to spool this call file.
+        :raises: `InvalidTimeError` if `time` is not a valid datetime.
+        """
+        try:
+            due = mktime(time.timetuple())
+        except (AttributeError, OverflowError, ValueError):
+            raise InvalidTimeError
+
+        callfile.tempdir = self.staging_dir
+        callfile.spool_dir = self.spool_dir
+        path = callfile._stage(time, callfile._owner(), check_spool_dir=True,
+                named=True)
+
+        with self._cond:
+            heappush(self._heap, (due, path.name))
+            self._cond.notify()
+
+    def next_release(self):
+        """Get the time the next call file is due to be released.
+
+        :returns: A UNIX timestamp, or None if nothing is scheduled.
+        :rtype: Float.
+        """
+        with self._cond:
+            return self._heap[0][0] - self.lead_time if self._heap else None
+
+    def dispatch(self, timestamp=None):
+        """Release every call file that is within `lead_time` of being due.
+
+        A call file that can't be moved into the spooling directory (eg:
+        `CrossDeviceError`, if the staging directory isn't on the same
+        filesystem) is reported to `on_error`, and retried `RETRY_INTERVAL`
+        seconds later.
+
+        :param float timestamp: The current UNIX time (defaults to now).
+        :returns: The names of the released call files.
+        :rtype: List of strings.
+        """
+        cutoff = (now() if timestamp is None else timestamp) + self.lead_time
+        released = []
+        failed = []
+
+        with self._cond:
+            while self._heap and self._heap[0][0] <= cutoff:
+                name = heappop(self._heap)[1]
+                src = self.staging_dir / name
+                try:
+                    rename(src, self.spool_dir / name)
+                except error as e:
+                    if e.errno == ENOENT and not exists(src):
+                        continue
+                    failed.append((name, CrossDeviceError()
+                            if e.errno == EXDEV else NoSpoolPermissionError()))
+                else:
+                    released.append(name)
+
+            for name, _ in failed:
+                heappush(self._heap, (cutoff + self.RETRY_INTERVAL, name))
+
+        for name, e in failed:
+            self._report(name, e)
+        return released
+
+    def _report(self, name, e):
+        if self.on_error is None:
+            _log.warning('Could not release %s: %r', name, e)
+            return
+        try:
+            self.on_error(name, e)
+        except Exception:
+            _log.exception('on_error failed for %s', name)
+
+    def run(self):
+        """Dispatch call files as they come due, until :meth:`stop` is called.
+
+        This blocks, so it's usually run in a thread of its own.
+        """
+        with self._cond:
+            self._running = True
+            while self._running:
+                self.dispatch()
+                wait = self.POLL_INTERVAL
+                if self._heap:
+                    wait = min(wait, self._heap[0][0] - self.lead_time - now())
+                if wait > 0:
+                    self._cond.wait(wait)
+
+    def stop(self):
+        """Stop a running :meth:`run` loop."""
+        with self._cond:
+            self._running = False
+            self._cond.notify()
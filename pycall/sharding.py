@@ -0,0 +1,213 @@
+"""Spread call files across the spooling directories of several Asterisk
+servers.
+"""
+
+
+from bisect import bisect
+from hashlib import md5
+from itertools import count
+from os import error, listdir
+from threading import Lock
+
+try:
+    from time import monotonic
+except ImportError:
+    from time import time as monotonic
+
+from .errors import CrossDeviceError, NoSpoolPermissionError
+from .target import SpoolTarget
+
+
+class RoundRobin(object):
+    """Use each target in turn."""
+
+    def __init__(self):
+        self._counter = count()
+
+    def choose(self, callfile, targets):
+        return targets[next(self._counter) % len(targets)]
+
+
+class LeastQueued(object):
+    """Use the target with the fewest call files in its spooling directory.
+
+    Directory entry counts are cached for `poll_interval` seconds, and bumped
+    locally for each call file spooled in the meantime.
+    """
+
+    #: How often (in seconds) each spooling directory is re-counted.
+    DEFAULT_POLL_INTERVAL = 1.0
+
+    def __init__(self, poll_interval=None, clock=monotonic):
+        """Create a new `LeastQueued` object.
+
+        :param float poll_interval: How often (in seconds) each spooling
+            directory is re-counted.
+        :param func clock: Returns the current time in seconds.
+        :rtype: `LeastQueued` object.
+        """
+        self.poll_interval = self.DEFAULT_POLL_INTERVAL \
+                if poll_interval is None else poll_interval
+        self.clock = clock
+        self._counts = {}
+
+    def _count(self, target, t):
+        cached = self._counts.get(target.path)
+        if cached is None or cached[0] <= t:
+            try:
+                n = len(listdir(target.path))
+            except error:
+                n = float('inf')
+            cached = self._counts[target.path] = [t + self.poll_interval, n]
+        return cached
+
+    def choose(self, callfile, targets):
+        t = self.clock()
+        counts = [self._count(target, t) for target in targets]
+        i = min(range(len(targets)), key=lambda i: counts[i][1])
+        counts[i][1] += 1
+        return targets[i]
+
+
+class ConsistentHash(object):
+    """Use the target a call's key hashes to, so that calls with the same
+    channel (or account) always go to the same server.
+
+    Targets are placed on a hash ring `replicas` times each, so when a target
+    is taken out of rotation, only its own calls move to other targets.
+    """
+
+    #: The default number of points each target has on the ring.
+    DEFAULT_REPLICAS = 100
+
+    def __init__(self, key='channel', replicas=None):
+        """Create a new `ConsistentHash` object.
+
+        :param key: The `Call` attribute to hash (eg: 'channel' or
+            'account'), or a function taking a `CallFile` and returning a
+            string.
+        :param int replicas: Number of points each target has on the ring.
+        :rtype: `ConsistentHash` object.
+        """
+        self.key = key
+        self.replicas = replicas or self.DEFAULT_REPLICAS
+        self._rings = {}
+
+    @staticmethod
+    def _hash(value):
+        return int(md5(value.encode('utf-8')).hexdigest()[:16], 16)
+
+    def _ring(self, targets):
+        paths = tuple(t.path for t in targets)
+        ring = self._rings.get(paths)
+        if ring is None:
+            points = sorted((self._hash('%s#%d' % (p, i)), n)
+                    for n, p in enumerate(paths) for i in range(self.replicas))
+            ring = ([h for h, _ in points], [n for _, n in points])
+            if len(self._rings) > 64:
+                self._rings.clear()
+            self._rings[paths] = ring
+        return ring
+
+    def choose(self, callfile, targets):
+        if callable(self.key):
+            value = self.key(callfile)
+        else:
+            value = getattr(callfile.call, self.key)
+        hashes, indexes = self._ring(targets)
+        i = bisect(hashes, self._hash(u'%s' % (value,))) % len(hashes)
+        return targets[indexes[i]]
+
+
+class ShardedSpooler(object):
+    """Spools call files across several spooling directories.
+
+    Each call file is sent to the target picked by a policy:
+    :class:`RoundRobin` (the default), :class:`LeastQueued` or
+    :class:`ConsistentHash`. A policy is any object with a
+    ``choose(callfile, targets)`` method.
+
+    If spooling to a target raises `NoSpoolPermissionError` (eg: its NFS mount
+    went away), the target is taken out of rotation for `retry_after`
+    seconds, and the call file is spooled to another target instead.
+    """
+
+    #: How long (in seconds) an unhealthy target is left out of rotation.
+    DEFAULT_RETRY_AFTER = 30
+
+    def __init__(self, targets, policy=None, retry_after=None,
+            clock=monotonic):
+        """Create a new `ShardedSpooler` object.
+
+        :param list targets: Spooling directories, as paths or
+            `pycall.SpoolTarget` instances.
+        :param obj policy: Picks the target for each call file.
+        :param float retry_after: How long (in seconds) an unhealthy target
+            is left out of rotation.
+        :param func clock: Returns the current time in seconds.
+        :rtype: `ShardedSpooler` object.
+        """
+        self.targets = [t if isinstance(t, SpoolTarget) else SpoolTarget(t)
+                for t in targets]
+        self.policy = policy or RoundRobin()
+        self.retry_after = self.DEFAULT_RETRY_AFTER if retry_after is None \
+                else retry_after
+        self.clock = clock
+        self._unhealthy = {}
+        self._lock = Lock()
+
+    def healthy(self):
+        """Get the targets currently in rotation.
+
+        Targets whose `retry_after` has passed are re-checked and put back in
+        rotation, unless their spooling directory is missing or read-only.
+
+        :rtype: List of `pycall.SpoolTarget` objects.
+        """
+        t = self.clock()
+        with self._lock:
+            for target, until in list(self._unhealthy.items()):
+                if until <= t:
+                    del self._unhealthy[target]
+                    target.refresh()
+            for target in self.targets:
+                if not target.is_valid:
+                    self._unhealthy.setdefault(target, t + self.retry_after)
+            return [target for target in self.targets
+                    if target not in self._unhealthy]
+
+    def mark_unhealthy(self, target):
+        """Take a target out of rotation for `retry_after` seconds."""
+        with self._lock:
+            self._unhealthy[target] = self.clock() + self.retry_after
+
+    def mark_healthy(self, target):
+        """Put a target back in rotation."""
+        with self._lock:
+            self._unhealthy.pop(target, None)
+
+    def spool(self, callfile, time=None):
+        """Spool a call file to one of the targets.
+
+        :param obj callfile: A `pycall.CallFile` instance. Its `spool_dir` is
+            overridden by the chosen target.
+        :param datetime time: The date and time to spool this call file (see
+            :meth:`pycall.CallFile.spool`).
+        :raises: `NoSpoolPermissionError` if every target is unhealthy.
+        :returns: The target the call file was spooled to.
+        :rtype: `pycall.SpoolTarget` object.
+        """
+        targets = self.healthy()
+        while targets:
+            with self._lock:
+                target = self.policy.choose(callfile, targets)
+            callfile.spool_dir = target
+            try:
+                callfile.spool(time)
+            except (NoSpoolPermissionError, CrossDeviceError):
+                self.mark_unhealthy(target)
+                targets = [t for t in targets if t is not target]
+            else:
+                return target
+
+        raise NoSpoolPermissionError
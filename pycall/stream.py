@@ -0,0 +1,187 @@
+"""Stream rendered call files as bytes, without holding them all in memory."""
+
+
+import tarfile
+from time import time
+from os import close, remove, rename, write
+
+from path import Path
+
+from .callfile import _create_temp
+from .errors import ValidationError
+from .validation import validator
+
+
+try:
+    from os import writev
+except ImportError:
+    writev = None
+
+_NEWLINE = b'\n'
+
+# The most buffers passed to a single writev call (IOV_MAX is at least 1024).
+_IOV_MAX = 1024
+
+# The most distinct encoded lines cached per stream.
+_CACHE_SIZE = 1024
+
+
+def iter_chunks(callfiles, on_error=None):
+    """Render call files one at a time, as encoded chunks.
+
+    Each call file is rendered as a list of `bytes` chunks (its lines, and
+    the newlines between them), which join to its `contents`. Lines that
+    repeat across call files (eg: the action) are only encoded once, and the
+    same `bytes` objects are reused.
+
+    :param iterable callfiles: `CallFile` objects to render. They're consumed
+        lazily.
+    :param func on_error: Called with the call file and the `ValidationError`
+        for each call file that can't be validated, which is then skipped. If
+        not given, the error is raised.
+    :rtype: Generator of ``(callfile, chunks)`` tuples.
+    """
+    cache = {}
+    for cf in callfiles:
+        errors = validator.errors(cf, check_spool_dir=False)
+        if errors:
+            e = ValidationError(*errors)
+            if on_error is None:
+                raise e
+            on_error(cf, e)
+            continue
+
+        lines = cf.call.render()
+        lines += cf.action.render()
+        if cf.archive:
+            lines.append('Archive: yes')
+
+        chunks = []
+        for line in lines:
+            b = cache.get(line)
+            if b is None:
+                b = line.encode('utf-8')
+                if len(cache) < _CACHE_SIZE:
+                    cache[line] = b
+            chunks.append(b)
+            chunks.append(_NEWLINE)
+        chunks.pop()
+        yield cf, chunks
+
+
+def _writev(fd, chunks):
+    """Write every chunk to a file descriptor, gathering them into as few
+    system calls as possible.
+    """
+    if writev is None:
+        data = memoryview(b''.join(chunks))
+        while data:
+            data = data[write(fd, data):]
+        return
+
+    for i in range(0, len(chunks), _IOV_MAX):
+        batch = chunks[i:i + _IOV_MAX]
+        n = writev(fd, batch)
+        total = sum(len(c) for c in batch)
+        if n < total:
+            rest = memoryview(b''.join(batch))[n:]
+            while rest:
+                rest = rest[write(fd, rest):]
+
+
+def write_files(callfiles, directory, on_error=None):
+    """Write each call file to a directory (eg: a staging directory), named
+    after its `filename`.
+
+    Each call file is written with a single ``writev`` system call, where
+    available, to a new temporary file (so nothing planted in the directory
+    is written through), which is then renamed to its `filename`: call files
+    never appear half written.
+
+    :param iterable callfiles: `CallFile` objects to write.
+    :param str directory: The directory to write to.
+    :param func on_error: See :func:`iter_chunks`.
+    :returns: The number of call files written.
+    :rtype: Integer.
+    """
+    directory = Path(directory)
+    written = 0
+    for cf, chunks in iter_chunks(callfiles, on_error):
+        path, fd = _create_temp(directory)
+        try:
+            try:
+                _writev(fd, chunks)
+            finally:
+                close(fd)
+            rename(path, directory / cf.filename)
+        except BaseException:
+            try:
+                remove(path)
+            except OSError:
+                pass
+            raise
+        written += 1
+    return written
+
+
+def write_stream(callfiles, out, separator=b'\n\n', on_error=None):
+    """Write call files one after another to a binary file object (eg: a
+    pipe, or a socket's :meth:`~socket.socket.makefile`).
+
+    :param iterable callfiles: `CallFile` objects to write.
+    :param obj out: A binary file object with a `writelines` method.
+    :param bytes separator: Written between call files.
+    :param func on_error: See :func:`iter_chunks`.
+    :returns: The number of call files written.
+    :rtype: Integer.
+    """
+    written = 0
+    for cf, chunks in iter_chunks(callfiles, on_error):
+        if written:
+            out.write(separator)
+        out.writelines(chunks)
+        written += 1
+    return written
+
+
+class _ChunkReader(object):
+    """A minimal file object reading from a list of chunks."""
+
+    def __init__(self, chunks):
+        self._chunks = iter(chunks)
+        self._pending = b''
+
+    def read(self, size=-1):
+        out = [self._pending]
+        n = len(self._pending)
+        for chunk in self._chunks:
+            out.append(chunk)
+            n += len(chunk)
+            if 0 <= size <= n:
+                break
+        data = b''.join(out)
+        if size < 0:
+            self._pending = b''
+            return data
+        self._pending = data[size:]
+        return data[:size]
+
+
+def write_tar(callfiles, tar, on_error=None):
+    """Add call files to a tar archive, named after their `filename`.
+
+    :param iterable callfiles: `CallFile` objects to add.
+    :param obj tar: An open, writable `tarfile.TarFile`.
+    :param func on_error: See :func:`iter_chunks`.
+    :returns: The number of call files added.
+    :rtype: Integer.
+    """
+    written = 0
+    for cf, chunks in iter_chunks(callfiles, on_error):
+        info = tarfile.TarInfo(str(cf.filename))
+        info.size = sum(len(c) for c in chunks)
+        info.mode = 0o600
+        info.mtime = time()
+        tar.addfile(info, _ChunkReader(chunks))
+        written += 1
+    return written
@@ -0,0 +1,70 @@
+"""Validated spooling directories that can be shared by many call files."""
+
+
+from os import W_OK, X_OK, access, error, stat
+from stat import S_ISDIR
+
+from path import Path
+
+
+class SpoolTarget(object):
+    """A spooling directory, checked once and shared by many call files.
+
+    Normally, every :class:`~pycall.CallFile` validation checks that its
+    spooling directory exists on disk. Passing a `SpoolTarget` as the
+    `spool_dir` instead makes that check a simple attribute lookup: the
+    directory's existence, writability and filesystem device are checked
+    once, and cached until :meth:`refresh` is called.
+    """
+
+    def __init__(self, path):
+        """Create a new `SpoolTarget` object.
+
+        :param str path: The spooling directory.
+        :rtype: `SpoolTarget` object.
+        """
+        self.path = Path(path).abspath()
+        self.refresh()
+
+    def refresh(self):
+        """Check the spooling directory again."""
+        try:
+            st = stat(self.path)
+        except error:
+            self.exists = False
+            self.device = None
+        else:
+            self.exists = S_ISDIR(st.st_mode)
+            self.device = st.st_dev
+        self.writable = self.exists and access(self.path, W_OK | X_OK)
+
+    @property
+    def is_valid(self):
+        """True if the spooling directory exists and is writable."""
+        return self.exists and self.writable
+
+    def same_device(self, path):
+        """Check whether a path is on the same filesystem as the spooling
+        directory (so call files can be atomically renamed from it).
+
+        :param str path: The path to check.
+        :rtype: Boolean.
+        """
+        try:
+            return stat(path).st_dev == self.device
+        except error:
+            return False
+
+    def __str__(self):
+        return self.path
+
+    def __fspath__(self):
+        return self.path
+
+    def __repr__(self):
+        return 'SpoolTarget(%r)' % str(self.path)
+
+    def __truediv__(self, other):
+        return self.path / other
+
+    __div__ = __truediv__
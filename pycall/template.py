@@ -0,0 +1,134 @@
+"""Precompiled call file templates for rendering many similar calls."""
+
+
+from .call import Call
+from .actions import Action
+from .errors import ValidationError
+from .validation import validator
+
+
+def _render_channel(channel):
+    return ('Channel: ' + channel,)
+
+
+def _render_callerid(callerid):
+    return ('Callerid: ' + callerid,) if callerid else ()
+
+
+def _render_variables(variables):
+    if not variables:
+        return ()
+    return ['Set: %s=%s' % item for item in variables.items()]
+
+
+def _render_account(account):
+    return ('Account: ' + account,) if account else ()
+
+
+class CallFileTemplate(object):
+    """A call file compiled from a prototype `Call` and action.
+
+    Everything that doesn't change between calls (timing values, the action,
+    archiving) is rendered once, up front. Rendering a new call only fills in
+    the per-call fields, and produces exactly the same text as the
+    :attr:`~pycall.CallFile.contents` of the equivalent `CallFile`.
+    """
+
+    #: The `Call` attributes that may vary between rendered calls, in the
+    #: order they appear in a call file.
+    FIELDS = ('channel', 'callerid', 'variables', 'account')
+
+    _RENDERERS = {
+        'channel': _render_channel,
+        'callerid': _render_callerid,
+        'variables': _render_variables,
+        'account': _render_account,
+    }
+
+    def __init__(self, call, action, archive=None, fields=('channel',)):
+        """Create a new `CallFileTemplate` object.
+
+        :param obj call: A `pycall.Call` instance to use as the prototype.
+        :param obj action: Either a `pycall.actions.Application` instance
+            or a `pycall.actions.Context` instance.
+        :param bool archive: Should Asterisk archive the call files?
+        :param tuple fields: The `Call` attributes that will be supplied for
+            each rendered call (see `FIELDS`).
+        :raises: `ValidationError` if the prototype can not be validated.
+        :rtype: `CallFileTemplate` object.
+        """
+        if not isinstance(call, Call) or not isinstance(action, Action):
+            raise ValidationError
+        errors = validator.call_errors(call) + validator.action_errors(action)
+        if errors:
+            raise ValidationError(*errors)
+        if not set(fields) <= set(self.FIELDS):
+            raise ValidationError
+
+        self.call = call
+        self.action = action
+        self.archive = archive
+        self.fields = tuple(f for f in self.FIELDS if f in fields)
+        self._segments = self._compile()
+
+    def _compile(self):
+        """Split the prototype call file into literal text and per-call slots.
+
+        :returns: A list of ``(text, field)`` pairs, where exactly one of the
+            two is not None.
+        :rtype: List of tuples.
+        """
+        segments = []
+        literal = []
+        head = 0
+
+        for field in self.FIELDS:
+            lines = self._RENDERERS[field](getattr(self.call, field))
+            head += len(lines)
+            if field in self.fields:
+                if literal:
+                    segments.append(('\n'.join(literal), None))
+                    literal = []
+                segments.append((None, field))
+            else:
+                literal.extend(lines)
+
+        literal.extend(self.call.render()[head:])
+        literal.extend(self.action.render())
+        if self.archive:
+            literal.append('Archive: yes')
+        if literal:
+            segments.append(('\n'.join(literal), None))
+
+        return segments
+
+    def render(self, **values):
+        """Render a call file for a single call.
+
+        :param values: Values for the template's per-call fields. Fields that
+            aren't given keep the prototype's value.
+        :raises: `ValidationError` if a value is not valid, or is given for a
+            field the template wasn't compiled with.
+        :returns: Call file contents.
+        :rtype: String.
+        """
+        for field in values:
+            if field not in self.fields:
+                raise ValidationError
+
+        out = []
+        for text, field in self._segments:
+            if field is None:
+                out.append(text)
+                continue
+
+            if field in values:
+                value = values[field]
+                errors = validator.field_errors(field, value)
+                if errors:
+                    raise ValidationError(*errors)
+            else:
+                value = getattr(self.call, field)
+            out.extend(self._RENDERERS[field](value))
+
+        return '\n'.join(out)
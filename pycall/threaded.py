@@ -0,0 +1,206 @@
+"""Spool call files from a bounded pool of threads, for synchronous code.
+
+This module needs `concurrent.futures` (on Python 2, install the `futures`
+backport), so it isn't imported by the `pycall` package itself: import it as
+`pycall.threaded`.
+"""
+
+
+from concurrent.futures import Future
+from threading import Condition, Lock, Thread
+
+try:
+    from queue import Empty, Queue
+except ImportError:
+    from Queue import Empty, Queue
+
+try:
+    from time import monotonic
+except ImportError:
+    from time import time as monotonic
+
+from .callfile import SpoolResult
+from .errors import PycallError
+
+
+class ThreadedSpooler(object):
+    """Spools call files with a fixed pool of threads.
+
+    Call files are handed to the threads through a queue holding at most
+    `max_queued` call files, so :meth:`submit` blocks while the pool is
+    behind, rather than letting a backlog build up in memory. Spooling is
+    mostly system calls, which release the GIL, so several threads spool much
+    faster than a single loop.
+
+    Each :meth:`submit` returns a `concurrent.futures.Future`, which resolves
+    to a `SpoolResult`. `PycallError` exceptions are reported in the result
+    (and collected in :attr:`failures`) rather than raised.
+    """
+
+    #: The default number of threads to spool call files with.
+    DEFAULT_MAX_WORKERS = 8
+
+    def __init__(self, max_workers=None, max_queued=None):
+        """Create a new `ThreadedSpooler` object.
+
+        :param int max_workers: Number of threads to spool call files with.
+        :param int max_queued: Maximum number of call files waiting for a
+            thread. Defaults to four times `max_workers`.
+        :rtype: `ThreadedSpooler` object.
+        """
+        self.max_workers = max_workers or self.DEFAULT_MAX_WORKERS
+        self.max_queued = max_queued or 4 * self.max_workers
+        #: `SpoolResult` objects for every call file that failed to spool.
+        self.failures = []
+        self._queue = Queue(self.max_queued)
+        self._cond = Condition(Lock())
+        self._pending = 0
+        self._submitting = 0
+        self._shutdown = False
+        self._threads = []
+        for _ in range(self.max_workers):
+            t = Thread(target=self._work)
+            t.daemon = True
+            t.start()
+            self._threads.append(t)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.shutdown()
+
+    def __len__(self):
+        """Return the number of call files submitted but not yet spooled."""
+        with self._cond:
+            return self._pending
+
+    def _work(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            future, callfile, time = item
+            if future.set_running_or_notify_cancel():
+                try:
+                    callfile.spool(time)
+                except PycallError as e:
+                    result = SpoolResult(callfile, e)
+                    with self._cond:
+                        self.failures.append(result)
+                    future.set_result(result)
+                except BaseException as e:
+                    future.set_exception(e)
+                else:
+                    future.set_result(SpoolResult(callfile, None))
+            self._done()
+
+    def _done(self):
+        with self._cond:
+            self._pending -= 1
+            if not self._pending:
+                self._cond.notify_all()
+
+    def submit(self, callfile, time=None, timeout=None):
+        """Queue a call file to be spooled, waiting while the queue is full.
+
+        :param obj callfile: A `pycall.CallFile` instance.
+        :param datetime time: The date and time to spool this call file (see
+            :meth:`~pycall.CallFile.spool`).
+        :param float timeout: Maximum time (in seconds) to wait for room in
+            the queue. Waits forever by default.
+        :raises: `queue.Full` if `timeout` runs out, or `RuntimeError` if the
+            spooler has been shut down.
+        :rtype: `concurrent.futures.Future` object.
+        """
+        future = Future()
+        with self._cond:
+            if self._shutdown:
+                raise RuntimeError('cannot submit after shutdown')
+            self._pending += 1
+            self._submitting += 1
+        try:
+            self._queue.put((future, callfile, time), timeout=timeout)
+        except BaseException:
+            self._done()
+            raise
+        finally:
+            with self._cond:
+                self._submitting -= 1
+                if not self._submitting:
+                    self._cond.notify_all()
+        return future
+
+    def spool_many(self, callfiles, time=None):
+        """Spool a batch of call files, and wait for them all.
+
+        :param iterable callfiles: `CallFile` objects to spool.
+        :param datetime time: The date and time to spool these call files.
+        :returns: One result per call file, in the order given.
+        :rtype: List of `SpoolResult` objects.
+        """
+        futures = [self.submit(cf, time) for cf in callfiles]
+        return [f.result() for f in futures]
+
+    def drain(self, timeout=None):
+        """Wait until every submitted call file has been spooled.
+
+        :param float timeout: Maximum time (in seconds) to wait. Waits forever
+            by default.
+        :returns: True if everything was spooled, False if `timeout` ran out
+            first.
+        :rtype: Boolean.
+        """
+        deadline = None if timeout is None else monotonic() + timeout
+        with self._cond:
+            while self._pending:
+                if deadline is None:
+                    self._cond.wait()
+                    continue
+                left = deadline - monotonic()
+                if left <= 0:
+                    return False
+                self._cond.wait(left)
+            return True
+
+    def shutdown(self, wait=True, cancel_pending=False):
+        """Stop accepting call files, and stop the threads once they've
+        spooled everything already submitted.
+
+        :param bool wait: Wait for the threads to finish.
+        :param bool cancel_pending: Cancel call files still waiting in the
+            queue instead of spooling them.
+        """
+        with self._cond:
+            if self._shutdown:
+                return
+            self._shutdown = True
+
+        # Submits that got past the shutdown check may still be queueing
+        # their call files: wait for them, so nothing is queued after the
+        # threads have been told to stop.
+        while True:
+            if cancel_pending:
+                self._cancel_queued()
+            with self._cond:
+                if not self._submitting:
+                    break
+                self._cond.wait()
+        if cancel_pending:
+            self._cancel_queued()
+
+        for _ in self._threads:
+            self._queue.put(None)
+        if wait:
+            for t in self._threads:
+                t.join()
+
+    def _cancel_queued(self):
+        """Cancel every call file waiting in the queue."""
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except Empty:
+                return
+            item[0].cancel()
+            self._done()
@@ -0,0 +1,185 @@
+"""Limit how quickly, and how many, call files are spooled with Asterisk."""
+
+
+from os import listdir
+from threading import Lock
+from time import sleep
+
+try:
+    from time import monotonic
+except ImportError:
+    from time import time as monotonic
+
+from path import Path
+
+from .callfile import CallFile
+
+
+class TokenBucket(object):
+    """A token bucket rate limiter.
+
+    Tokens are added at a steady `rate`, up to `capacity`, and each admitted
+    event takes one.
+    """
+
+    def __init__(self, rate, capacity=None, clock=monotonic):
+        """Create a new `TokenBucket` object.
+
+        :param float rate: Tokens added per second.
+        :param float capacity: Maximum number of tokens held (the largest burst
+            allowed). Defaults to `rate`, or 1 if `rate` is below 1.
+        :param func clock: Returns the current time in seconds.
+        :rtype: `TokenBucket` object.
+        """
+        self.rate = float(rate)
+        self.capacity = float(capacity or max(rate, 1))
+        self.clock = clock
+        self._tokens = self.capacity
+        self._updated = clock()
+
+    def _refill(self):
+        t = self.clock()
+        self._tokens = min(self.capacity,
+                self._tokens + (t - self._updated) * self.rate)
+        self._updated = t
+
+    def take(self):
+        """Take a token if one is available.
+
+        :returns: True if a token was taken, False otherwise.
+        :rtype: Boolean.
+        """
+        self._refill()
+        if self._tokens >= 1:
+            self._tokens -= 1
+            return True
+        return False
+
+    def delay(self):
+        """Get the time until a token will be available.
+
+        :rtype: Float (seconds).
+        """
+        self._refill()
+        return max(0.0, (1 - self._tokens) / self.rate)
+
+
+class ThrottledSpooler(object):
+    """Spools call files, but only while the spooling directory holds fewer
+    than `max_files` call files, and no faster than `rate` call files per
+    second.
+
+    Asterisk removes each call file from its spooling directory once the call
+    completes, so the number of files in the directory is the number of calls
+    in flight. That count is cached: the directory is only re-scanned once the
+    cached count reaches `max_files`, or `poll_interval` seconds after the last
+    scan.
+    """
+
+    #: How often (in seconds) the spooling directory is re-scanned, and how
+    #: long :meth:`spool` sleeps between attempts.
+    DEFAULT_POLL_INTERVAL = 0.1
+
+    def __init__(self, spool_dir=None, max_files=None, rate=None, burst=None,
+            poll_interval=None):
+        """Create a new `ThrottledSpooler` object.
+
+        :param str spool_dir: Directory to spool call files to.
+        :param int max_files: Maximum number of call files allowed in
+            `spool_dir` at once.
+        :param float rate: Maximum number of call files spooled per second.
+        :param int burst: Maximum number of call files spooled in a burst when
+            `rate` is set (see `TokenBucket`).
+        :param float poll_interval: How often (in seconds) to re-scan
+            `spool_dir`.
+        :rtype: `ThrottledSpooler` object.
+        """
+        self.spool_dir = Path(spool_dir or CallFile.DEFAULT_SPOOL_DIR)
+        self.max_files = max_files
+        self.bucket = TokenBucket(rate, burst) if rate else None
+        self.poll_interval = poll_interval or self.DEFAULT_POLL_INTERVAL
+        self._lock = Lock()
+        self._count = 0
+        self._scanned = None
+
+    def queued(self):
+        """Count the call files currently in the spooling directory.
+
+        :rtype: Integer.
+        """
+        return len([n for n in listdir(self.spool_dir) if n[0] != '.'])
+
+    def _admit(self):
+        """Try to reserve a slot for a new call file.
+
+        :returns: 0 if a slot was reserved, or how long to wait (in seconds)
+            before trying again.
+        :rtype: Float.
+        """
+        with self._lock:
+            if self.max_files is not None:
+                t = monotonic()
+                if self._count >= self.max_files or self._scanned is None or \
+                        t - self._scanned >= self.poll_interval:
+                    self._count = self.queued()
+                    self._scanned = t
+                if self._count >= self.max_files:
+                    return self.poll_interval
+
+            if self.bucket and not self.bucket.take():
+                return self.bucket.delay() or self.poll_interval
+
+            self._count += 1
+            return 0
+
+    def _spool(self, callfile, time):
+        callfile.spool_dir = self.spool_dir
+        try:
+            callfile.spool(time)
+        except Exception:
+            with self._lock:
+                self._count -= 1
+            raise
+
+    def try_spool(self, callfile, time=None):
+        """Spool a call file if the throttle allows it, without blocking.
+
+        :param obj callfile: A `pycall.CallFile` instance. Its `spool_dir` is
+            overridden by the spooler's.
+        :param datetime time: The date and time to spool this call file (see
+            :meth:`~pycall.CallFile.spool`).
+        :returns: True if the call file was spooled, False otherwise.
+        :rtype: Boolean.
+        """
+        if self._admit():
+            return False
+        self._spool(callfile, time)
+        return True
+
+    def spool(self, callfile, time=None, timeout=None):
+        """Spool a call file, waiting until the throttle allows it.
+
+        :param obj callfile: A `pycall.CallFile` instance. Its `spool_dir` is
+            overridden by the spooler's.
+        :param datetime time: The date and time to spool this call file (see
+            :meth:`~pycall.CallFile.spool`).
+        :param float timeout: Maximum time (in seconds) to wait. Waits forever
+            by default.
+        :returns: True if the call file was spooled, False if `timeout` ran
+            out first.
+        :rtype: Boolean.
+        """
+        deadline = None if timeout is None else monotonic() + timeout
+
+        while True:
+            wait = self._admit()
+            if not wait:
+                self._spool(callfile, time)
+                return True
+
+            if deadline is not None:
+                left = deadline - monotonic()
+                if left <= 0:
+                    return False
+                wait = min(wait, left)
+            sleep(wait)
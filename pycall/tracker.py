@@ -0,0 +1,289 @@
+"""Track spooled call files as Asterisk processes them."""
+
+
+import ctypes
+import ctypes.util
+import struct
+import sys
+from collections import namedtuple
+from errno import EAGAIN, EINTR
+from os import close, error, listdir, read, stat
+from select import select
+from time import sleep
+
+from path import Path
+
+from .callfile import CallFile
+
+
+#: The call file is waiting in the spooling directory.
+QUEUED = 'queued'
+
+#: Asterisk has started processing the call file (it has been written to since
+#: it was spooled).
+ACTIVE = 'active'
+
+#: The call file has left the spooling directory.
+FINISHED = 'finished'
+
+#: The call file has been archived by Asterisk.
+ARCHIVED = 'archived'
+
+_ORDER = {None: 0, QUEUED: 1, ACTIVE: 2, FINISHED: 3, ARCHIVED: 4}
+
+# inotify(7) constants.
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_Q_OVERFLOW = 0x00004000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+_SPOOL_MASK = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | \
+        IN_CREATE | IN_DELETE
+_ARCHIVE_MASK = IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE
+_EVENT = struct.Struct('iIII')
+
+
+class Change(namedtuple('Change', ['filename', 'state'])):
+    """A tracked call file changing state."""
+
+    __slots__ = ()
+
+
+def _libc():
+    if not sys.platform.startswith('linux'):
+        return None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6',
+                use_errno=True)
+        libc.inotify_init1
+    except (OSError, AttributeError):
+        return None
+    return libc
+
+
+class SpoolTracker(object):
+    """Tracks spooled call files through Asterisk's spooling and archive
+    directories.
+
+    Each tracked call file moves through the `QUEUED`, `ACTIVE`, `FINISHED`
+    and (for call files spooled with `archive` set) `ARCHIVED` states. Each
+    state change is reported by :meth:`poll`, and passed to any callbacks
+    registered with :meth:`on_change`. Call files stop being tracked once they
+    reach their final state.
+
+    On Linux, the directories are watched with inotify. Elsewhere (or if
+    `use_inotify` is False, or either directory can't be watched, eg:
+    because the archive directory doesn't exist yet), :meth:`poll` re-scans
+    the spooling directory, and checks the archive directory for call files
+    that have left it.
+    """
+
+    #: The default archive directory (should be OK for most systems).
+    DEFAULT_ARCHIVE_DIR = '/var/spool/asterisk/outgoing_done'
+
+    def __init__(self, spool_dir=None, archive_dir=None, use_inotify=None):
+        """Create a new `SpoolTracker` object.
+
+        :param str spool_dir: Directory call files are spooled to.
+        :param str archive_dir: Directory Asterisk archives call files to.
+        :param bool use_inotify: Watch the directories with inotify. Defaults
+            to True where inotify is available.
+        :raises: `OSError` if inotify is requested but can't be used (or
+            can't watch both directories).
+        :rtype: `SpoolTracker` object.
+        """
+        self.spool_dir = Path(spool_dir or CallFile.DEFAULT_SPOOL_DIR)
+        self.archive_dir = Path(archive_dir or self.DEFAULT_ARCHIVE_DIR)
+        self._tracked = {}
+        self._callbacks = []
+        self._fd = None
+
+        libc = _libc() if use_inotify is not False else None
+        if libc is None and use_inotify:
+            raise OSError('inotify is not available')
+        if libc is not None:
+            try:
+                self._watch(libc)
+            except OSError:
+                if use_inotify:
+                    raise
+
+    def _watch(self, libc):
+        fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1 failed')
+        self._wds = {}
+        for path, mask in ((self.spool_dir, _SPOOL_MASK),
+                (self.archive_dir, _ARCHIVE_MASK)):
+            wd = libc.inotify_add_watch(fd,
+                    path.encode(sys.getfilesystemencoding()), mask)
+            if wd < 0:
+                # Without both watches, archived call files would never be
+                # seen, so the caller falls back to polling.
+                e = ctypes.get_errno()
+                close(fd)
+                raise OSError(e, 'inotify_add_watch failed', path)
+            self._wds[wd] = path
+        self._fd = fd
+
+    @property
+    def uses_inotify(self):
+        """True if the directories are watched with inotify."""
+        return self._fd is not None
+
+    def fileno(self):
+        """Get the inotify file descriptor (eg: for `select`).
+
+        :returns: The file descriptor, or None when polling.
+        :rtype: Integer.
+        """
+        return self._fd
+
+    def close(self):
+        """Stop watching the directories."""
+        if self._fd is not None:
+            close(self._fd)
+            self._fd = None
+
+    def __len__(self):
+        """Return the number of call files being tracked."""
+        return len(self._tracked)
+
+    def track(self, callfile):
+        """Start tracking a call file.
+
+        :param callfile: A `pycall.CallFile` instance, or the name of a call
+            file in the spooling directory.
+        """
+        if isinstance(callfile, CallFile):
+            name, archive = str(callfile.filename), bool(callfile.archive)
+        else:
+            name, archive = str(callfile), False
+
+        try:
+            mtime = stat(self.spool_dir / name).st_mtime
+            state = QUEUED
+        except error:
+            mtime = state = None
+        self._tracked[name] = [state, mtime, archive]
+
+    def untrack(self, filename):
+        """Stop tracking a call file."""
+        self._tracked.pop(str(filename), None)
+
+    def state(self, filename):
+        """Get the current state of a tracked call file.
+
+        :returns: The state, or None if it hasn't been spooled yet.
+        :rtype: String.
+        """
+        return self._tracked[str(filename)][0]
+
+    def on_change(self, callback):
+        """Register a function to call with each `Change`."""
+        self._callbacks.append(callback)
+
+    def _move(self, name, state, changes):
+        entry = self._tracked.get(name)
+        if entry is None or _ORDER[state] <= _ORDER[entry[0]]:
+            return
+
+        entry[0] = state
+        changes.append(Change(name, state))
+        if state == ARCHIVED or (state == FINISHED and not entry[2]):
+            del self._tracked[name]
+
+    def _rescan(self, changes):
+        present = set(n for n in listdir(self.spool_dir)
+                if n in self._tracked)
+
+        for name, entry in list(self._tracked.items()):
+            if name in present:
+                try:
+                    mtime = stat(self.spool_dir / name).st_mtime
+                except error:
+                    continue
+                if entry[0] is None:
+                    entry[1] = mtime
+                    self._move(name, QUEUED, changes)
+                elif mtime != entry[1]:
+                    entry[1] = mtime
+                    self._move(name, ACTIVE, changes)
+            elif entry[0] is not None:
+                self._move(name, FINISHED, changes)
+                if entry[2] and (self.archive_dir / name).exists():
+                    self._move(name, ARCHIVED, changes)
+
+    def _events(self):
+        while True:
+            try:
+                buf = read(self._fd, 65536)
+            except error as e:
+                if e.errno == EINTR:
+                    continue
+                if e.errno == EAGAIN:
+                    return
+                raise
+            offset = 0
+            while offset < len(buf):
+                wd, mask, _, size = _EVENT.unpack_from(buf, offset)
+                offset += _EVENT.size
+                name = buf[offset:offset + size].rstrip(b'\0')
+                offset += size
+                yield wd, mask, name.decode(sys.getfilesystemencoding())
+
+    def _read(self, changes):
+        for wd, mask, name in self._events():
+            if mask & IN_Q_OVERFLOW:
+                self._rescan(changes)
+                continue
+
+            entry = self._tracked.get(name)
+            if entry is None:
+                continue
+
+            if self._wds.get(wd) == self.archive_dir:
+                self._move(name, ARCHIVED, changes)
+            elif mask & (IN_DELETE | IN_MOVED_FROM):
+                self._move(name, FINISHED, changes)
+            elif mask & IN_MOVED_TO:
+                self._move(name, QUEUED, changes)
+            elif mask & IN_CREATE:
+                # The call file is being written in place: it isn't queued
+                # until it's closed.
+                entry[1] = True
+            elif mask & IN_CLOSE_WRITE:
+                if entry[1] is True:
+                    entry[1] = None
+                    self._move(name, QUEUED, changes)
+            elif entry[1] is not True:
+                self._move(name, ACTIVE, changes)
+
+    def poll(self, timeout=0):
+        """Collect state changes for the tracked call files.
+
+        :param float timeout: How long (in seconds) to wait for a change if
+            none are pending. None waits forever (with inotify only).
+        :returns: The state changes, in the order they happened.
+        :rtype: List of `Change` objects.
+        """
+        changes = []
+        if self._fd is not None:
+            if timeout != 0:
+                select([self._fd], [], [], timeout)
+            self._read(changes)
+        else:
+            self._rescan(changes)
+            if not changes and timeout:
+                sleep(timeout)
+                self._rescan(changes)
+
+        for change in changes:
+            for callback in self._callbacks:
+                callback(change)
+        return changes
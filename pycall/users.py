@@ -0,0 +1,76 @@
+"""Resolve the users call files are spooled as."""
+
+
+from pwd import getpwnam
+from threading import Lock
+
+try:
+    from time import monotonic
+except ImportError:
+    from time import time as monotonic
+
+from .errors import NoUserError
+
+
+class UserCache(object):
+    """Caches username lookups for `ttl` seconds.
+
+    Looking up a user can be slow (eg: when NSS is backed by LDAP), so each
+    username's uid and gid (or the fact that it doesn't exist) is remembered.
+    Numeric users are passed straight through without a lookup.
+    """
+
+    #: The default time (in seconds) a lookup is cached for.
+    DEFAULT_TTL = 300
+
+    def __init__(self, ttl=None, clock=monotonic):
+        """Create a new `UserCache` object.
+
+        :param float ttl: How long (in seconds) to cache each lookup for.
+        :param func clock: Returns the current time in seconds.
+        :rtype: `UserCache` object.
+        """
+        self.ttl = self.DEFAULT_TTL if ttl is None else ttl
+        self.clock = clock
+        self._users = {}
+        self._lock = Lock()
+
+    def resolve(self, user):
+        """Get the uid and gid of a user.
+
+        :param user: A username, a numeric uid (the gid is left unchanged, and
+            returned as -1), or a ``(uid, gid)`` tuple.
+        :raises: `NoUserError` if the user does not exist.
+        :returns: The user's uid and gid.
+        :rtype: Tuple.
+        """
+        if isinstance(user, tuple):
+            return int(user[0]), int(user[1])
+        if isinstance(user, int):
+            return user, -1
+
+        t = self.clock()
+        with self._lock:
+            cached = self._users.get(user)
+        if cached is None or cached[0] <= t:
+            try:
+                pwd = getpwnam(user)
+                owner = pwd[2], pwd[3]
+            except KeyError:
+                owner = None
+            cached = (t + self.ttl, owner)
+            with self._lock:
+                self._users[user] = cached
+
+        if cached[1] is None:
+            raise NoUserError
+        return cached[1]
+
+    def clear(self):
+        """Forget every cached lookup."""
+        with self._lock:
+            self._users.clear()
+
+
+#: The `UserCache` shared by every `CallFile`.
+user_cache = UserCache()
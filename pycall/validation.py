@@ -0,0 +1,276 @@
+"""Validate calls and call files, with structured errors."""
+
+
+import re
+from collections import namedtuple
+from operator import attrgetter
+
+from path import Path
+
+from .actions import Action, Application, Context
+from .target import SpoolTarget
+
+
+try:
+    _STRINGS = (str, unicode)
+except NameError:
+    _STRINGS = (str,)
+
+# Characters that would break the line-based call file format.
+_CONTROL = re.compile(r'[\r\n\x00]')
+
+# TECH/resource, eg: SIP/flowroute/18002223333 or Local/100@default.
+_CHANNEL = re.compile(r'^[A-Za-z][\w-]*/[^\s]+$')
+
+# Variable names, optionally prefixed with _ or __ (for inheritance), or
+# dialplan function calls, eg: CDR(userfield).
+_NAME = r'_{0,2}[A-Za-z0-9_.]+(?:\([^\s=()]*\))?'
+_VARIABLE = re.compile(r'^%s$' % _NAME)
+
+# Any number of variable names, each followed by a newline.
+_VARIABLES = re.compile(r'(?:%s\n)*\Z' % _NAME)
+
+# The `Call` fields checked one at a time, besides `variables`.
+_CALL_FIELDS = ('channel', 'callerid', 'account', 'wait_time', 'retry_time',
+        'max_retries')
+
+# Get an action's fields.
+_APPLICATION_FIELDS = attrgetter(*Application.__slots__)
+_CONTEXT_FIELDS = attrgetter(*Context.__slots__)
+
+
+class FieldError(namedtuple('FieldError', ['field', 'message'])):
+    """A single problem with a field of a call or call file."""
+
+    __slots__ = ()
+
+    def __str__(self):
+        return '%s: %s' % (self.field, self.message)
+
+
+def _text(value, optional=True):
+    if value is None:
+        return None if optional else 'is required'
+    if not isinstance(value, _STRINGS):
+        return 'must be a string'
+    if _CONTROL.search(value):
+        return 'must not contain newlines'
+    return None
+
+
+def _integer(value):
+    if value is None:
+        return None
+    if type(value) != int:
+        return 'must be an integer'
+    if value < 0:
+        return 'must not be negative'
+    return None
+
+
+def _variables(value):
+    if not value:
+        return []
+    if not isinstance(value, dict):
+        return ['must be a dict']
+
+    # Check every name and value at once, then look for the culprits.
+    try:
+        names = '\n'.join(value) + '\n'
+        values = ''.join(value.values())
+    except TypeError:
+        pass
+    else:
+        if names.count('\n') == len(value) and _VARIABLES.match(names) and \
+                '\n' not in values and '\r' not in values and \
+                '\x00' not in values:
+            return []
+
+    messages = []
+    for k, v in value.items():
+        if not isinstance(k, _STRINGS) or not _VARIABLE.match(k):
+            messages.append('%r is not a valid variable name' % (k,))
+        elif _CONTROL.search(v if isinstance(v, _STRINGS) else str(v)):
+            messages.append('%s must not contain newlines' % k)
+    return messages
+
+
+class Validator(object):
+    """Checks calls and call files, and explains what's wrong with them.
+
+    Every field is checked: integers must be non-negative integers, strings
+    must not contain newlines (which would break the call file format), and
+    variable names must be valid Asterisk variable (or function) names. With
+    `strict_channels`, channels must also look like ``TECH/resource``.
+
+    Results are cached on each call and action, along with the field values
+    they were found for, so validating the same call again (eg: each time a
+    call file is built) only compares its fields, until one of them changes.
+    """
+
+    def __init__(self, strict_channels=False):
+        """Create a new `Validator` object.
+
+        :param bool strict_channels: Check channels' syntax.
+        :rtype: `Validator` object.
+        """
+        self.strict_channels = strict_channels
+
+    def field_errors(self, field, value):
+        """Check a single `Call` field.
+
+        :param str field: The field's name.
+        :param value: The field's value.
+        :rtype: List of `FieldError` objects.
+        """
+        if field == 'variables':
+            return [FieldError(field, m) for m in _variables(value)]
+        if field in ('wait_time', 'retry_time', 'max_retries'):
+            message = _integer(value)
+        elif field == 'channel':
+            message = _text(value, optional=False) or (
+                    'is required' if not value else None)
+            if message is None and self.strict_channels and \
+                    not _CHANNEL.match(value):
+                message = 'must look like TECH/resource'
+        else:
+            message = _text(value)
+        return [FieldError(field, message)] if message else []
+
+    def _fields_ok(self, call):
+        """Quickly check that every cached `Call` field is valid."""
+        channel, callerid, account = call.channel, call.callerid, call.account
+        if not (channel and isinstance(channel, _STRINGS) and
+                (callerid is None or isinstance(callerid, _STRINGS)) and
+                (account is None or isinstance(account, _STRINGS))):
+            return False
+        if _CONTROL.search('%s%s%s' % (channel, callerid or '',
+                account or '')):
+            return False
+        if self.strict_channels and not _CHANNEL.match(channel):
+            return False
+        for value in (call.wait_time, call.retry_time, call.max_retries):
+            if value is not None and (type(value) != int or value < 0):
+                return False
+        return True
+
+    def _field_errors(self, call):
+        errors = []
+        for field in _CALL_FIELDS:
+            errors += self.field_errors(field, getattr(call, field))
+        return tuple(errors)
+
+    def call_errors(self, call):
+        """Check every field of a `Call`.
+
+        :rtype: Tuple of `FieldError` objects.
+        """
+        # Field values are compared by identity, so a field set to an equal
+        # value of another type (eg: True instead of 1) is checked again.
+        # Variables can be changed in place, so they're compared to a copy.
+        channel, callerid, account = call.channel, call.callerid, call.account
+        wait_time, retry_time = call.wait_time, call.retry_time
+        max_retries, variables = call.max_retries, call.variables
+        cached = call._errors
+        if cached is not None and cached[0] is self and \
+                cached[1] is channel and cached[2] is callerid and \
+                cached[3] is account and cached[4] is wait_time and \
+                cached[5] is retry_time and cached[6] is max_retries and \
+                cached[7] is variables and cached[8] == variables:
+            return cached[9]
+
+        errors = () if self._fields_ok(call) else self._field_errors(call)
+        if variables:
+            errors += tuple(FieldError('variables', m) for m in
+                    _variables(variables))
+        call._errors = (self, channel, callerid, account, wait_time,
+                retry_time, max_retries, variables,
+                dict(variables) if isinstance(variables, dict) else None,
+                errors)
+        return errors
+
+    def action_errors(self, action):
+        """Check every field of an `Application` or `Context`.
+
+        :rtype: Tuple of `FieldError` objects.
+        """
+        if not isinstance(action, (Application, Context)):
+            if isinstance(action, Action):
+                return ()
+            return (FieldError('action', 'must be an Action'),)
+
+        # Every field must be a string, so equal values are equally valid.
+        if isinstance(action, Application):
+            fields, values = Application.__slots__, _APPLICATION_FIELDS(action)
+        else:
+            fields, values = Context.__slots__, _CONTEXT_FIELDS(action)
+        cached = action._errors
+        if cached is not None and cached[0] is self and cached[1] == values:
+            return cached[2]
+
+        errors = []
+        for field, value in zip(fields, values):
+            message = _text(value, optional=False)
+            if message:
+                errors.append(FieldError(field, message))
+        errors = tuple(errors)
+        action._errors = (self, values, errors)
+        return errors
+
+    def errors(self, callfile, check_spool_dir=True):
+        """Check a `CallFile`.
+
+        :param obj callfile: A `pycall.CallFile` instance.
+        :param bool check_spool_dir: Check that the spooling directory exists.
+        :rtype: List of `FieldError` objects.
+        """
+        try:
+            errors = list(self.call_errors(callfile.call))
+        except AttributeError:
+            errors = [FieldError('call', 'must be a Call')]
+        errors += self.action_errors(callfile.action)
+        policies = (callfile.SYNC_NONE, callfile.SYNC_DATA, callfile.SYNC_FULL)
+        if callfile.sync not in policies:
+            errors.append(FieldError('sync', 'must be one of %s' %
+                    ', '.join(policies)))
+        if check_spool_dir and not spool_dir_exists(callfile.spool_dir):
+            errors.append(FieldError('spool_dir', 'does not exist'))
+        return errors
+
+    def validate_many(self, callfiles):
+        """Check a batch of call files in a single pass.
+
+        Each distinct spooling directory is only checked once.
+
+        :param iterable callfiles: `CallFile` objects to check.
+        :returns: ``(index, errors)`` pairs for every invalid call file.
+        :rtype: List of tuples.
+        """
+        spool_dirs = {}
+        invalid = []
+        for i, cf in enumerate(callfiles):
+            errors = self.errors(cf, check_spool_dir=False)
+            spool_dir = cf.spool_dir
+            if spool_dir not in spool_dirs:
+                spool_dirs[spool_dir] = spool_dir_exists(spool_dir)
+            if not spool_dirs[spool_dir]:
+                errors.append(FieldError('spool_dir', 'does not exist'))
+            if errors:
+                invalid.append((i, errors))
+        return invalid
+
+
+def spool_dir_exists(spool_dir):
+    """Check whether a spooling directory (a path or `SpoolTarget`) exists.
+
+    :rtype: Boolean.
+    """
+    if not spool_dir:
+        return True
+    if isinstance(spool_dir, SpoolTarget):
+        return spool_dir.exists
+    return Path(spool_dir).abspath().isdir()
+
+
+#: The `Validator` used by `Call.is_valid` and `CallFile.is_valid`.
+validator = Validator()
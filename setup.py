@@ -48,7 +48,8 @@ setup(
     # Package dependencies.
     install_requires = ['path.py>=6.2.0'],
     extras_require = {
-        'test': ['codacy-coverage', 'python-coveralls', 'pytest', 'pytest-cov', 'sphinx'],
+        'test': ['codacy-coverage', 'python-coveralls', 'pytest', 'pytest-cov', 'sphinx',
+            'futures; python_version < "3"'],
     },
     cmdclass = {
         'test': TestCommand,
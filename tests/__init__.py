@@ -0,0 +1,11 @@
+"""Helpers shared by the unit tests."""
+
+
+class Clock(object):
+    """A clock that only moves when told to."""
+
+    def __init__(self, t=0.0):
+        self.t = t
+
+    def __call__(self):
+        return self.t
@@ -0,0 +1,11 @@
+"""pytest configuration for the unit tests."""
+
+
+import sys
+
+
+# `pycall.aio` (and so its tests) uses async generators, which are a syntax
+# error before Python 3.6.
+collect_ignore = []
+if sys.version_info < (3, 6):
+    collect_ignore.append('test_aio.py')
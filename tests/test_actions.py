@@ -1,6 +1,7 @@
 """Unit tests for `pycall.actions`."""
 
 
+import pickle
 from unittest import TestCase
 
 from pycall import Application, Context
@@ -18,6 +19,20 @@ class TestApplication(TestCase):
         self.assertEqual(self.a.application, 'application')
         self.assertEqual(self.a.data, 'data')
 
+    def test_slots(self):
+        """Ensure `Application` objects don't carry a per-instance
+        `__dict__`.
+        """
+        self.assertFalse(hasattr(self.a, '__dict__'))
+
+    def test_pickle(self):
+        """Ensure actions can be pickled with every protocol."""
+        c = Context('context', 'extension', 'priority')
+        for protocol in range(pickle.HIGHEST_PROTOCOL + 1):
+            for action in (self.a, c):
+                copy = pickle.loads(pickle.dumps(action, protocol))
+                self.assertEqual(copy.render(), action.render())
+
     def test_render_valid_application(self):
         """Ensure `render` works using a valid `application` attribute."""
         self.assertTrue('application' in ''.join(self.a.render()))
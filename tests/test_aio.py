@@ -0,0 +1,127 @@
+"""Unit tests for `pycall.aio`."""
+
+
+import asyncio
+from os import listdir, remove
+from os.path import join
+from tempfile import mkdtemp
+from unittest import TestCase
+
+from pycall import Application, Call, CallFile, NoUserError, SpoolResult, \
+    SpoolTracker
+from pycall.aio import AsyncSpooler, spool_async, watch
+from pycall.tracker import FINISHED, QUEUED
+
+
+def run(coro):
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coro)
+    finally:
+        loop.close()
+
+
+class TestSpoolAsync(TestCase):
+    """Run tests on the `spool_async` function."""
+
+    def test_spool_async(self):
+        """Ensure `spool_async` spools the call file."""
+        cf = CallFile(Call('channel'), Application('application', 'data'),
+                spool_dir=mkdtemp())
+        run(spool_async(cf))
+        self.assertEqual(listdir(cf.spool_dir), [cf.filename])
+
+    def test_spool_async_raises(self):
+        """Ensure `spool_async` raises spooling errors."""
+        cf = CallFile(Call('channel'), Application('application', 'data'),
+                spool_dir=mkdtemp(),
+                user='asjdfgkhkgaskqtjwhkjwetghqekjtbkwthbjkltwhwklt')
+        with self.assertRaises(NoUserError):
+            run(spool_async(cf))
+
+
+class TestAsyncSpooler(TestCase):
+    """Run tests on the `AsyncSpooler` class."""
+
+    def setUp(self):
+        """Setup some default variables for test usage."""
+        self.spool_dir = mkdtemp()
+        self.s = AsyncSpooler(max_workers=2, max_concurrency=3)
+
+    def tearDown(self):
+        self.s.close()
+
+    def callfile(self, **kwargs):
+        return CallFile(Call('channel'), Application('application', 'data'),
+                spool_dir=self.spool_dir, **kwargs)
+
+    def test_attrs_stick(self):
+        """Ensure attributes stick."""
+        self.assertEqual(self.s.max_workers, 2)
+        self.assertEqual(self.s.max_concurrency, 3)
+
+    def test_attrs_default_max_concurrency(self):
+        """Ensure the default `max_concurrency` attribute works."""
+        s = AsyncSpooler(max_workers=4)
+        self.assertEqual(s.max_concurrency, 4)
+        s.close()
+
+    def test_spool(self):
+        """Ensure `spool` spools the call file and reports the result."""
+        cf = self.callfile()
+        result = run(self.s.spool(cf))
+        self.assertEqual(result, SpoolResult(cf, None))
+        self.assertEqual(listdir(self.spool_dir), [cf.filename])
+
+    def test_spool_many(self):
+        """Ensure `spool_many` reports per-file results in order."""
+        cfs = [self.callfile() for _ in range(10)]
+        cfs[4] = self.callfile(
+                user='asjdfgkhkgaskqtjwhkjwetghqekjtbkwthbjkltwhwklt')
+        results = run(self.s.spool_many(cfs))
+        self.assertEqual([r.callfile for r in results], cfs)
+        self.assertEqual([r.ok for r in results].count(False), 1)
+        self.assertTrue(isinstance(results[4].error, NoUserError))
+        self.assertEqual(len(listdir(self.spool_dir)), 9)
+
+    def test_spool_many_empty(self):
+        """Ensure `spool_many` works with no call files."""
+        self.assertEqual(run(self.s.spool_many([])), [])
+
+
+class TestWatch(TestCase):
+    """Run tests on the `watch` function."""
+
+    def collect(self, use_inotify):
+        spool_dir, archive_dir = mkdtemp(), mkdtemp()
+        tracker = SpoolTracker(spool_dir, archive_dir, use_inotify=use_inotify)
+        cf = CallFile(Call('channel'), Application('application', 'data'),
+                spool_dir=spool_dir)
+        tracker.track(cf)
+
+        async def consume():
+            changes = []
+            async for change in watch(tracker, interval=0.01):
+                changes.append(change.state)
+                if change.state == QUEUED:
+                    remove(join(spool_dir, cf.filename))
+            return changes
+
+        async def main():
+            task = asyncio.ensure_future(consume())
+            await asyncio.sleep(0.02)
+            cf.spool()
+            return await task
+
+        try:
+            return run(main())
+        finally:
+            tracker.close()
+
+    def test_watch_polling(self):
+        """Ensure `watch` works with a polling tracker."""
+        self.assertEqual(self.collect(False), [QUEUED, FINISHED])
+
+    def test_watch_inotify(self):
+        """Ensure `watch` works with an inotify tracker."""
+        self.assertEqual(self.collect(True), [QUEUED, FINISHED])
@@ -0,0 +1,147 @@
+"""Unit tests for `pycall.archive`."""
+
+
+from datetime import datetime
+from os import remove, utime
+from os.path import getsize, join
+from tempfile import mkdtemp
+from unittest import TestCase
+
+from pycall import Application, ArchiveIndex, Call, CallFile, IndexEntry, \
+    IndexUpdate, archive
+
+
+class TestArchiveIndex(TestCase):
+    """Run tests on the `ArchiveIndex` class."""
+
+    def setUp(self):
+        """Setup some default variables for test usage."""
+        self.archive_dir = mkdtemp()
+        self.path = join(mkdtemp(), 'index.db')
+        self.index = ArchiveIndex(self.path, self.archive_dir)
+
+    def tearDown(self):
+        self.index.close()
+
+    def archive(self, name, account, status, mtime):
+        cf = CallFile(Call('SIP/%s' % name, account=account),
+                Application('application', 'data'), archive=True,
+                spool_dir=self.archive_dir)
+        path = join(self.archive_dir, name)
+        with open(path, 'w') as f:
+            f.write(cf.contents + '\nStatus: %s\n' % status)
+        utime(path, (mtime, mtime))
+        return path
+
+    def test_attrs_stick(self):
+        """Ensure attributes stick."""
+        self.assertEqual(self.index.path, self.path)
+        self.assertEqual(self.index.archive_dir, self.archive_dir)
+
+    def test_attrs_default_archive_dir(self):
+        """Ensure the default `archive_dir` attribute works."""
+        index = ArchiveIndex(self.path)
+        self.assertEqual(index.archive_dir, ArchiveIndex.DEFAULT_ARCHIVE_DIR)
+        index.close()
+
+    def test_update(self):
+        """Ensure `update` indexes new call files."""
+        self.archive('a.call', 'acct', 'Completed', 1000)
+        b = self.archive('b.call', 'acct', 'Failed', 2000)
+        self.assertEqual(self.index.update(), IndexUpdate(2, 0, 0))
+        self.assertEqual(len(self.index), 2)
+        self.assertEqual(self.index.query(status='Failed'),
+                [IndexEntry('b.call', 2000, getsize(b), 'Failed',
+                    'SIP/b.call', 'acct')])
+
+    def test_update_is_incremental(self):
+        """Ensure `update` only re-parses new or changed call files, and drops
+        removed ones.
+        """
+        self.archive('a.call', 'acct', 'Completed', 1000)
+        b = self.archive('b.call', 'acct', 'Failed', 2000)
+        self.index.update()
+
+        self.assertEqual(self.index.update(), IndexUpdate(0, 0, 0))
+        self.archive('a.call', 'acct', 'Expired', 3000)
+        remove(b)
+        self.assertEqual(self.index.update(), IndexUpdate(1, 1, 0))
+        self.assertEqual([e.status for e in self.index.query()], ['Expired'])
+
+    def test_update_persists(self):
+        """Ensure the index survives being reopened."""
+        self.archive('a.call', 'acct', 'Completed', 1000)
+        self.index.update()
+        self.index.close()
+        self.index = ArchiveIndex(self.path, self.archive_dir)
+        self.assertEqual(self.index.update(), IndexUpdate(0, 0, 0))
+        self.assertEqual(len(self.index), 1)
+
+    def test_update_unparseable(self):
+        """Ensure unparseable call files are recorded without a status."""
+        with open(join(self.archive_dir, 'bad.call'), 'w') as f:
+            f.write('junk')
+        self.assertEqual(self.index.update(), IndexUpdate(0, 0, 1))
+        self.assertEqual(self.index.query()[0].status, None)
+        self.assertEqual(self.index.update(), IndexUpdate(0, 0, 0))
+
+    def test_update_writes_batches(self):
+        """Ensure `update` writes parsed call files in batches."""
+        for i in range(5):
+            self.archive('%d.call' % i, 'acct', 'Completed', 1000)
+        batches = []
+        write = self.index._write
+        self.index._write = lambda rows, names: (batches.append(len(rows)),
+                write(rows, names))
+        self.index.BATCH_SIZE = 2
+        self.assertEqual(self.index.update(), IndexUpdate(5, 0, 0))
+        self.assertEqual(batches, [2, 2, 1])
+        self.assertEqual(len(self.index), 5)
+
+        remove(join(self.archive_dir, '3.call'))
+        self.archive('5.call', 'acct', 'Completed', 1000)
+        del batches[:]
+        self.assertEqual(self.index.update(), IndexUpdate(1, 1, 0))
+        self.assertEqual(sum(batches), 1)
+        self.assertEqual(sorted(e.filename for e in self.index.query()),
+                ['0.call', '1.call', '2.call', '4.call', '5.call'])
+
+    def test_update_vanished(self):
+        """Ensure call files removed while `update` runs are skipped, and
+        dropped from the index.
+        """
+        a = self.archive('a.call', 'acct', 'Completed', 1000)
+        self.archive('b.call', 'acct', 'Completed', 1000)
+        self.index.update()
+        self.archive('a.call', 'acct', 'Failed', 2000)
+        c = self.archive('c.call', 'acct', 'Failed', 2000)
+
+        def parse_file(path):
+            if path in (a, c):
+                remove(path)
+            return original(path)
+
+        original, archive.parse_file = archive.parse_file, parse_file
+        try:
+            self.assertEqual(self.index.update(), IndexUpdate(0, 1, 0))
+        finally:
+            archive.parse_file = original
+        self.assertEqual([e.filename for e in self.index.query()], ['b.call'])
+
+    def test_query(self):
+        """Ensure `query` filters on every criteria."""
+        self.archive('a.call', 'x', 'Failed', 1000)
+        self.archive('b.call', 'x', 'Failed', 5000)
+        self.archive('c.call', 'y', 'Failed', 5000)
+        self.archive('d.call', 'x', 'Completed', 5000)
+        self.index.update()
+
+        names = lambda entries: [e.filename for e in entries]
+        self.assertEqual(names(self.index.query(status='Failed', account='x',
+                since=4000)), ['b.call'])
+        self.assertEqual(names(self.index.query(account='x', until=2000)),
+                ['a.call'])
+        self.assertEqual(names(self.index.query(channel='SIP/c.call')),
+                ['c.call'])
+        self.assertEqual(len(self.index.query(
+                since=datetime.fromtimestamp(4000))), 3)
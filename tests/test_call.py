@@ -1,6 +1,7 @@
 """Unit tests for `pycall.call`."""
 
 
+import pickle
 from unittest import TestCase
 
 from pycall import Call
@@ -20,6 +21,20 @@ class TestCall(TestCase):
         self.assertEqual(c.retry_time, 1)
         self.assertEqual(c.max_retries, 2)
 
+    def test_slots(self):
+        """Ensure `Call` objects don't carry a per-instance `__dict__`."""
+        self.assertFalse(hasattr(Call('channel'), '__dict__'))
+
+    def test_pickle(self):
+        """Ensure `Call` objects can be pickled with every protocol."""
+        c = Call('channel', variables={'a': 'b'}, wait_time=10)
+        self.assertTrue(c.is_valid())
+        for protocol in range(pickle.HIGHEST_PROTOCOL + 1):
+            copy = pickle.loads(pickle.dumps(c, protocol))
+            self.assertEqual((copy.channel, copy.variables, copy.wait_time),
+                    ('channel', {'a': 'b'}, 10))
+            self.assertTrue(copy.is_valid())
+
     def test_is_valid_valid_variables(self):
         """Ensure `is_valid` works using a valid `variables` attribute."""
         c = Call('channel', variables={'a': 'b'})
@@ -1,15 +1,20 @@
 """Unit tests for `pycall.callfile`."""
 
+import pickle
+from errno import EXDEV
+from os import getgid, getuid, listdir, mkdir, symlink
 from time import mktime
 from getpass import getuser
 from datetime import datetime
+from tempfile import gettempdir, mkdtemp
 from unittest import TestCase
 
 from path import Path
 
-from pycall import Application, Call, CallFile, InvalidTimeError, \
-    NoSpoolPermissionError, NoUserError, NoUserPermissionError, \
-    ValidationError
+from pycall import Application, Call, CallFile, CrossDeviceError, \
+    InvalidTimeError, NoSpoolPermissionError, NoUserError, \
+    NoUserPermissionError, SpoolResult, SpoolWriteError, ValidationError, \
+    callfile
 
 
 class TestCallFile(TestCase):
@@ -33,6 +38,20 @@ class TestCallFile(TestCase):
         self.assertEqual(c.user, 'user')
         self.assertEqual(c.spool_dir, 'spool_dir')
 
+    def test_slots(self):
+        """Ensure `CallFile` objects don't carry a per-instance `__dict__`."""
+        self.assertFalse(hasattr(CallFile(self.call, self.action), '__dict__'))
+
+    def test_pickle(self):
+        """Ensure `CallFile` objects can be pickled with every protocol."""
+        c = CallFile(self.call, self.action, filename='test.call',
+                spool_dir=self.spool_dir, sync=CallFile.SYNC_DATA)
+        for protocol in range(pickle.HIGHEST_PROTOCOL + 1):
+            copy = pickle.loads(pickle.dumps(c, protocol))
+            self.assertEqual(copy.contents, c.contents)
+            self.assertEqual((copy.filename, copy.sync),
+                    ('test.call', CallFile.SYNC_DATA))
+
     def test_attrs_default_spool_dir(self):
         """Ensure default `spool_dir` attribute works."""
         c = CallFile(self.call, self.action)
@@ -48,6 +67,25 @@ class TestCallFile(TestCase):
         c = CallFile(self.call, self.action)
         self.assertTrue(c.tempdir)
 
+    def test_attrs_filename_without_tempdir(self):
+        """Ensure a `filename` given without a `tempdir` is kept."""
+        c = CallFile(self.call, self.action, filename='test.call')
+        self.assertEqual(c.filename, 'test.call')
+        self.assertEqual(c.tempdir, gettempdir())
+
+    def test_init_creates_no_file(self):
+        """Ensure creating a `CallFile` doesn't touch the filesystem."""
+        before = set(listdir(gettempdir()))
+        c = CallFile(self.call, self.action, spool_dir=self.spool_dir)
+        self.assertTrue(c.contents)
+        self.assertEqual(set(listdir(gettempdir())), before)
+
+    def test_default_filenames_are_unique(self):
+        """Ensure generated filenames don't collide."""
+        names = set(CallFile(self.call, self.action).filename
+                for _ in range(1000))
+        self.assertEqual(len(names), 1000)
+
     def test_str(self):
         """Ensure `__str__` works."""
         c = CallFile(self.call, self.action, spool_dir=self.spool_dir)
@@ -135,6 +173,15 @@ class TestCallFile(TestCase):
         c.writefile()
         self.assertTrue((Path(c.tempdir) / Path(c.filename)).abspath().exists())
 
+    def test_writefile_is_private(self):
+        """Ensure that `writefile` creates call files only readable by their
+        owner.
+        """
+        c = CallFile(self.call, self.action, spool_dir=self.spool_dir)
+        c.writefile()
+        mode = (Path(c.tempdir) / Path(c.filename)).stat().st_mode
+        self.assertEqual(mode & 0o777, 0o600)
+
     def test_spool_no_time_no_user(self):
         """Ensure `spool` works when no `time` attribute is supplied, and no
         `user` attribute exists.
@@ -198,3 +245,168 @@ class TestCallFile(TestCase):
         d = datetime.now()
         c.spool(d)
         self.assertEqual((Path(c.tempdir) / Path(c.filename)).abspath().atime, mktime(d.timetuple()))
+
+    def test_spool_many_spools_every_file(self):
+        """Ensure `spool_many` spools each call file in the batch."""
+        spool_dir = mkdtemp()
+        cfs = [CallFile(self.call, self.action, spool_dir=spool_dir)
+                for _ in range(3)]
+        results = CallFile.spool_many(cfs)
+        self.assertEqual([r.callfile for r in results], cfs)
+        self.assertTrue(all(r.ok for r in results))
+        for c in cfs:
+            self.assertTrue((Path(spool_dir) / Path(c.filename)).exists())
+
+    def test_spool_many_reports_failures(self):
+        """Ensure `spool_many` reports per-file errors without stopping the
+        batch.
+        """
+        spool_dir = mkdtemp()
+        good = CallFile(self.call, self.action, spool_dir=spool_dir)
+        no_dir = CallFile(self.call, self.action, spool_dir='/woot')
+        no_user = CallFile(self.call, self.action, spool_dir=spool_dir,
+                user='asjdfgkhkgaskqtjwhkjwetghqekjtbkwthbjkltwhwklt')
+        last = CallFile(self.call, self.action, spool_dir=spool_dir)
+        results = CallFile.spool_many([good, no_dir, no_user, last])
+        self.assertTrue(isinstance(results[0], SpoolResult))
+        self.assertTrue(results[0].ok)
+        self.assertTrue(isinstance(results[1].error, ValidationError))
+        self.assertTrue(isinstance(results[2].error, NoUserError))
+        self.assertTrue(results[3].ok)
+        self.assertTrue((Path(spool_dir) / Path(last.filename)).exists())
+
+    def test_spool_many_reports_write_errors(self):
+        """Ensure `spool_many` reports call files that can't be written
+        without stopping the batch.
+        """
+        spool_dir = mkdtemp()
+        good = CallFile(self.call, self.action, spool_dir=spool_dir)
+        bad = CallFile(self.call, self.action, spool_dir=spool_dir,
+                tempdir='/woot/nowhere')
+        last = CallFile(self.call, self.action, spool_dir=spool_dir)
+        results = CallFile.spool_many([good, bad, last])
+        self.assertTrue(results[0].ok)
+        self.assertTrue(isinstance(results[1].error, SpoolWriteError))
+        self.assertTrue(results[2].ok)
+        self.assertTrue((Path(spool_dir) / Path(last.filename)).exists())
+
+    def test_staging_dir_is_spool_dir_sibling(self):
+        """Ensure `staging_dir` lives next to `spool_dir`."""
+        c = CallFile(self.call, self.action, spool_dir='/var/spool/outgoing')
+        self.assertEqual(c.staging_dir, '/var/spool/.staging')
+
+    def test_spool_staging(self):
+        """Ensure `spool` works with `staging` enabled, and leaves nothing
+        behind in the staging directory.
+        """
+        spool_dir = Path(mkdtemp()) / 'outgoing'
+        mkdir(spool_dir)
+        c = CallFile(self.call, self.action, spool_dir=spool_dir, staging=True)
+        self.assertEqual(c.tempdir, c.staging_dir)
+        c.spool()
+        self.assertTrue((spool_dir / Path(c.filename)).exists())
+        self.assertEqual(listdir(c.staging_dir), [])
+
+    def test_spool_staging_cross_device_error(self):
+        """Ensure `spool` raises `CrossDeviceError` instead of copying when the
+        staging rename would cross filesystems.
+        """
+        def rename(src, dst):
+            raise OSError(EXDEV, 'Invalid cross-device link')
+
+        c = CallFile(self.call, self.action, spool_dir=mkdtemp(), staging=True)
+        original, callfile.rename = callfile.rename, rename
+        try:
+            with self.assertRaises(CrossDeviceError):
+                c.spool()
+        finally:
+            callfile.rename = original
+
+    def test_spool_sync_data(self):
+        """Ensure `spool` works with the `SYNC_DATA` durability policy."""
+        c = CallFile(self.call, self.action, spool_dir=mkdtemp(),
+                sync=CallFile.SYNC_DATA)
+        c.spool()
+        self.assertTrue((Path(c.spool_dir) / Path(c.filename)).exists())
+
+    def test_spool_sync_full(self):
+        """Ensure `spool` works with the `SYNC_FULL` durability policy."""
+        c = CallFile(self.call, self.action, spool_dir=mkdtemp(),
+                sync=CallFile.SYNC_FULL)
+        d = datetime.now()
+        c.spool(d)
+        path = Path(c.spool_dir) / Path(c.filename)
+        self.assertEqual(open(path).read(), c.contents)
+        self.assertEqual(path.mtime, mktime(d.timetuple()))
+
+    def test_spool_sync_data_syncs_copy(self):
+        """Ensure `SYNC_DATA` also flushes the copy in the spooling directory
+        when the call file is moved from another directory.
+        """
+        synced = []
+
+        def fdatasync(fd):
+            synced.append(fd)
+
+        c = CallFile(self.call, self.action, spool_dir=mkdtemp(),
+                tempdir=mkdtemp(), sync=CallFile.SYNC_DATA)
+        original, callfile.fdatasync = callfile.fdatasync, fdatasync
+        try:
+            c.spool()
+        finally:
+            callfile.fdatasync = original
+        self.assertEqual(len(synced), 2)
+
+    def test_is_valid_invalid_sync(self):
+        """Ensure `is_valid` fails with an unknown `sync` policy."""
+        c = CallFile(self.call, self.action, spool_dir=self.spool_dir,
+                sync='always')
+        self.assertFalse(c.is_valid())
+        self.assertEqual([e.field for e in c.errors()], ['sync'])
+
+    def test_spool_numeric_user(self):
+        """Ensure `spool` works with a numeric `user` attribute."""
+        spool_dir = mkdtemp()
+        c = CallFile(self.call, self.action, spool_dir=spool_dir,
+                user=(getuid(), getgid()))
+        c.spool()
+        st = (Path(spool_dir) / Path(c.filename)).stat()
+        self.assertEqual((st.st_uid, st.st_gid), (getuid(), getgid()))
+
+    def test_spool_skips_needless_chown(self):
+        """Ensure `spool` doesn't chown call files that already have the right
+        owner.
+        """
+        def fchown(fd, uid, gid):
+            raise OSError
+
+        c = CallFile(self.call, self.action, spool_dir=mkdtemp(),
+                user=getuser())
+        original, callfile.fchown = callfile.fchown, fchown
+        try:
+            c.spool()
+        finally:
+            callfile.fchown = original
+
+    def test_spool_retries_existing_temp_name(self):
+        """Ensure `spool` never writes through an existing file (or symlink)
+        in `tempdir`, and tries another temporary name instead.
+        """
+        tempdir = Path(mkdtemp())
+        victim = tempdir / 'victim'
+        with open(victim, 'w') as f:
+            f.write('precious')
+        symlink(victim, tempdir / '.taken.call')
+        names = iter(['taken.call', 'free.call'])
+
+        c = CallFile(self.call, self.action, filename='test.call',
+                tempdir=tempdir, spool_dir=mkdtemp())
+        original, callfile._unique_name = callfile._unique_name, \
+                lambda: next(names)
+        try:
+            c.spool()
+        finally:
+            callfile._unique_name = original
+        self.assertEqual(open(victim).read(), 'precious')
+        self.assertEqual(open(Path(c.spool_dir) / c.filename).read(),
+                c.contents)
@@ -0,0 +1,156 @@
+"""Unit tests for `pycall.dedup`."""
+
+
+from os import listdir, symlink
+from os.path import islink, join
+from shutil import rmtree
+from tempfile import mkdtemp
+from unittest import TestCase
+
+from pycall import Application, Call, CallFile, IdempotentSpooler, \
+    NoUserError, SeenSet
+
+from . import Clock
+
+
+class TestSeenSet(TestCase):
+    """Run tests on the `SeenSet` class."""
+
+    def setUp(self):
+        """Setup some default variables for test usage."""
+        self.clock = Clock(1000.0)
+        base = mkdtemp()
+        self.addCleanup(rmtree, base)
+        self.path = join(base, 'seen')
+
+    def test_attrs_default_ttl(self):
+        """Ensure the default `ttl` attribute works."""
+        self.assertEqual(SeenSet().ttl, SeenSet.DEFAULT_TTL)
+
+    def test_add(self):
+        """Ensure `add` reports whether a key is new."""
+        s = SeenSet(ttl=10, clock=self.clock)
+        self.assertTrue(s.add('a'))
+        self.assertFalse(s.add('a'))
+        self.assertTrue('a' in s)
+        self.assertFalse('b' in s)
+        self.assertEqual(len(s), 1)
+
+    def test_ttl(self):
+        """Ensure keys are forgotten after `ttl` seconds."""
+        s = SeenSet(ttl=10, clock=self.clock)
+        s.add('a')
+        self.clock.t += 5
+        s.add('b')
+        self.clock.t += 5
+        self.assertFalse('a' in s)
+        self.assertTrue('b' in s)
+        self.assertTrue(s.add('a'))
+
+    def test_discard(self):
+        """Ensure `discard` forgets a key."""
+        s = SeenSet(clock=self.clock)
+        s.add('a')
+        s.discard('a')
+        s.discard('b')
+        self.assertFalse('a' in s)
+
+    def test_persistence(self):
+        """Ensure the set is reloaded from its log."""
+        s = SeenSet(self.path, ttl=10, clock=self.clock)
+        s.add('a')
+        s.add('b')
+        s.discard('b')
+        self.clock.t += 5
+        s.add('c')
+        s.close()
+        with open(self.path, 'a') as f:
+            f.write('12')
+
+        self.clock.t += 6
+        s = SeenSet(self.path, ttl=10, clock=self.clock)
+        self.assertFalse('a' in s)
+        self.assertFalse('b' in s)
+        self.assertTrue('c' in s)
+        s.close()
+
+    def test_compact(self):
+        """Ensure `compact` drops forgotten keys from the log."""
+        s = SeenSet(self.path, ttl=10, clock=self.clock)
+        for key in 'abc':
+            s.add(key)
+        s.discard('b')
+        s.compact()
+        s.add('d')
+        s.close()
+        with open(self.path) as f:
+            self.assertEqual([l.split()[1] for l in f], ['a', 'c', 'd'])
+
+
+class TestIdempotentSpooler(TestCase):
+    """Run tests on the `IdempotentSpooler` class."""
+
+    def setUp(self):
+        """Setup some default variables for test usage."""
+        self.spool_dir = mkdtemp()
+        self.addCleanup(rmtree, self.spool_dir)
+        self.s = IdempotentSpooler()
+
+    def callfile(self, channel='channel', **kwargs):
+        return CallFile(Call(channel), Application('application', 'data'),
+                spool_dir=self.spool_dir, **kwargs)
+
+    def test_identity(self):
+        """Ensure `CallFile.identity` depends on the key, or the contents."""
+        self.assertEqual(self.callfile().identity(),
+                self.callfile().identity())
+        self.assertNotEqual(self.callfile().identity(),
+                self.callfile('other').identity())
+        self.assertEqual(self.callfile(idempotency_key='k').identity(),
+                self.callfile('other', idempotency_key='k').identity())
+
+    def test_deterministic_filename(self):
+        """Ensure call files with an `idempotency_key` get a stable name."""
+        a = self.callfile(idempotency_key='k')
+        self.assertEqual(a.filename, a.identity() + '.call')
+        self.assertEqual(a.filename,
+                self.callfile(idempotency_key='k').filename)
+
+    def test_spool_ignores_planted_symlink(self):
+        """Ensure a keyed call file isn't written through a symlink planted at
+        its predictable name.
+        """
+        tempdir = mkdtemp()
+        self.addCleanup(rmtree, tempdir)
+        victim = join(tempdir, 'victim')
+        with open(victim, 'w') as f:
+            f.write('precious')
+        cf = self.callfile(idempotency_key='k', tempdir=tempdir)
+        symlink(victim, join(tempdir, str(cf.filename)))
+        cf.spool()
+        self.assertEqual(open(victim).read(), 'precious')
+        path = join(self.spool_dir, str(cf.filename))
+        self.assertFalse(islink(path))
+        self.assertEqual(open(path).read(), cf.contents)
+
+    def test_spool_skips_duplicates(self):
+        """Ensure duplicate call files aren't spooled."""
+        self.assertTrue(self.s.spool(self.callfile()))
+        self.assertFalse(self.s.spool(self.callfile()))
+        self.assertTrue(self.s.spool(self.callfile('other')))
+        self.assertTrue(self.s.spool(self.callfile(idempotency_key='k')))
+        self.assertFalse(self.s.spool(self.callfile('x', idempotency_key='k')))
+        self.assertEqual(len(listdir(self.spool_dir)), 3)
+
+    def test_spool_names_by_identity(self):
+        """Ensure call files without a filename are named by identity."""
+        cf = self.callfile()
+        self.s.spool(cf)
+        self.assertEqual(listdir(self.spool_dir), [cf.identity() + '.call'])
+
+    def test_spool_failure_not_recorded(self):
+        """Ensure a call file that fails to spool can be retried."""
+        cf = self.callfile(user='asjdfgkhkgaskqtjwhkjwetghqekjtbkwthbjkltwhwklt')
+        with self.assertRaises(NoUserError):
+            self.s.spool(cf)
+        self.assertFalse(cf.identity() in self.s.seen)
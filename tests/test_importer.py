@@ -0,0 +1,253 @@
+"""Unit tests for `pycall.importer` and the command line interface."""
+
+
+import csv
+import json
+from os import listdir
+from os.path import join
+from tempfile import mkdtemp
+from unittest import TestCase
+
+from pycall import Application, CampaignImporter, FieldError, \
+    ImportReport, ValidationError, importer, read_rows
+from pycall.__main__ import main
+
+
+class TestReadRows(TestCase):
+    """Run tests on the `read_rows` function."""
+
+    def setUp(self):
+        """Setup some default variables for test usage."""
+        self.dir = mkdtemp()
+
+    def test_csv(self):
+        """Ensure CSV files are read as dicts keyed by their header."""
+        path = join(self.dir, 'campaign.csv')
+        with open(path, 'w') as f:
+            f.write('phone,name\n1000,alice\n1001,bob\n')
+        self.assertEqual(list(read_rows(path)), [{'phone': '1000',
+                'name': 'alice'}, {'phone': '1001', 'name': 'bob'}])
+
+    def test_jsonl(self):
+        """Ensure JSON Lines files are read, skipping blank lines."""
+        path = join(self.dir, 'campaign.jsonl')
+        with open(path, 'w') as f:
+            f.write('{"phone": 1000}\n\n{"phone": 1001}\n')
+        self.assertEqual(list(read_rows(path)), [{'phone': 1000},
+                {'phone': 1001}])
+
+    def test_invalid_jsonl(self):
+        """Ensure a malformed JSON line is yielded as a `ValidationError`
+        without stopping the rest of the file.
+        """
+        path = join(self.dir, 'campaign.jsonl')
+        with open(path, 'w') as f:
+            f.write('{"phone": 1000}\n{"phone": \n{"phone": 1001}\n')
+        rows = list(read_rows(path))
+        self.assertEqual(rows[0], {'phone': 1000})
+        self.assertTrue(isinstance(rows[1], ValidationError))
+        self.assertEqual(rows[2], {'phone': 1001})
+
+    def test_invalid_csv(self):
+        """Ensure a malformed CSV row is yielded as a `ValidationError`
+        without stopping the rest of the file.
+        """
+        path = join(self.dir, 'campaign.csv')
+        with open(path, 'w') as f:
+            f.write('phone\n1000\n%s\n1002\n' %
+                    ('1' * (csv.field_size_limit() + 1)))
+        rows = list(read_rows(path))
+        self.assertEqual(rows[0], {'phone': '1000'})
+        self.assertTrue(isinstance(rows[1], ValidationError))
+        self.assertEqual(rows[2], {'phone': '1002'})
+
+
+class TestCampaignImporter(TestCase):
+    """Run tests on the `CampaignImporter` class."""
+
+    def setUp(self):
+        """Setup some default variables for test usage."""
+        self.spool_dir = mkdtemp()
+        self.checkpoint = join(mkdtemp(), 'checkpoint')
+        self.a = Application('Playback', 'hello-world')
+        self.fields = {'channel': 'SIP/flowroute/{phone}', 'wait_time': '30'}
+
+    def rows(self, count):
+        return [{'phone': str(1000 + i), 'name': 'n%d' % i}
+                for i in range(count)]
+
+    def test_requires_channel(self):
+        """Ensure a channel format is required."""
+        with self.assertRaises(ValidationError):
+            CampaignImporter(self.a, {'callerid': '{phone}'})
+
+    def test_build(self):
+        """Ensure rows are mapped to call fields and variables."""
+        i = CampaignImporter(self.a, self.fields, {'name': '{name}'},
+                spool_dir=self.spool_dir)
+        cf = i.build({'phone': '1000', 'name': 'alice'})
+        self.assertEqual(cf.call.channel, 'SIP/flowroute/1000')
+        self.assertEqual(cf.call.wait_time, 30)
+        self.assertEqual(cf.call.variables, {'name': 'alice'})
+        self.assertEqual(cf.spool_dir, self.spool_dir)
+
+    def test_build_invalid(self):
+        """Ensure rows with missing columns or bad numbers are rejected."""
+        i = CampaignImporter(self.a, {'channel': '{phone}',
+                'max_retries': '{retries}'})
+        for row in ({'retries': '1'}, {'phone': '1', 'retries': 'x'}):
+            with self.assertRaises(ValidationError):
+                i.build(row)
+
+    def test_build_short_csv_rows(self):
+        """Ensure columns missing from a short CSV row, or beyond the header,
+        are rejected rather than rendered as "None".
+        """
+        path = join(self.spool_dir, 'campaign.csv')
+        with open(path, 'w') as f:
+            f.write('phone,name,note\n1000\n1001,bob\n1002,carol,x,y\n')
+        i = CampaignImporter(self.a, {'channel': 'SIP/{phone}',
+                'callerid': '{name}'}, spool_dir=self.spool_dir)
+        short, unused, extra = read_rows(path)
+
+        with self.assertRaises(ValidationError) as cm:
+            i.build(short)
+        self.assertEqual(cm.exception.errors, [FieldError('name', 'missing')])
+        self.assertEqual(i.build(unused).call.callerid, 'bob')
+        with self.assertRaises(ValidationError) as cm:
+            i.build(extra)
+        self.assertEqual(cm.exception.errors, [FieldError('row',
+                'too many columns')])
+
+    def test_run(self):
+        """Ensure every valid row is spooled, in chunks, and failures are
+        reported by row number.
+        """
+        rows = self.rows(25)
+        del rows[9]['phone']
+        reports = []
+        i = CampaignImporter(self.a, self.fields, spool_dir=self.spool_dir,
+                chunksize=10)
+        r = i.run(rows, progress=reports.append)
+        self.assertTrue(isinstance(r, ImportReport))
+        self.assertEqual((r.rows, r.spooled), (25, 24))
+        self.assertEqual([n for n, _ in r.failed], [10])
+        self.assertEqual([p.rows for p in reports], [10, 20, 25])
+        self.assertEqual(len(listdir(self.spool_dir)), 24)
+
+    def test_checkpoint(self):
+        """Ensure an interrupted import resumes from its checkpoint."""
+        rows = self.rows(30)
+
+        def crash(report):
+            if report.rows == 20:
+                raise KeyboardInterrupt
+
+        i = CampaignImporter(self.a, self.fields, spool_dir=self.spool_dir,
+                checkpoint=self.checkpoint, chunksize=10)
+        with self.assertRaises(KeyboardInterrupt):
+            i.run(rows, 'campaign', progress=crash)
+        self.assertEqual(len(listdir(self.spool_dir)), 20)
+
+        r = i.run(rows, 'campaign')
+        self.assertEqual((r.rows, r.spooled), (30, 10))
+        self.assertEqual(len(listdir(self.spool_dir)), 30)
+        with open(self.checkpoint) as f:
+            self.assertEqual(json.load(f), {'path': 'campaign', 'row': 30})
+
+    def test_checkpoint_is_synced(self):
+        """Ensure the checkpoint is fsynced before it replaces the old one."""
+        synced = []
+
+        def fsync(fd):
+            with open(self.checkpoint + '.tmp') as f:
+                synced.append(json.load(f)['row'])
+
+        original, importer.fsync = importer.fsync, fsync
+        try:
+            CampaignImporter(self.a, self.fields, spool_dir=self.spool_dir,
+                    checkpoint=self.checkpoint, chunksize=10).run(
+                    self.rows(15), 'campaign')
+        finally:
+            importer.fsync = original
+        self.assertEqual(synced, [10, 15])
+
+    def test_checkpoint_replaces_interrupted_chunk(self):
+        """Ensure rows of an interrupted chunk replace their call files when
+        they're spooled again, instead of being queued twice.
+        """
+        rows = self.rows(10)
+
+        def crash(report):
+            raise KeyboardInterrupt
+
+        i = CampaignImporter(self.a, self.fields, spool_dir=self.spool_dir,
+                checkpoint=self.checkpoint, chunksize=10)
+        with self.assertRaises(KeyboardInterrupt):
+            i.run(rows, 'campaign', progress=crash)
+        with open(self.checkpoint, 'w') as f:
+            json.dump({'path': 'campaign', 'row': 0}, f)
+
+        self.assertEqual(i.run(rows, 'campaign').spooled, 10)
+        self.assertEqual(len(listdir(self.spool_dir)), 10)
+
+    def test_corrupt_checkpoint(self):
+        """Ensure a corrupt checkpoint is an error, not a fresh start."""
+        with open(self.checkpoint, 'w') as f:
+            f.write('{"path": "campaign", "ro')
+        i = CampaignImporter(self.a, self.fields, spool_dir=self.spool_dir,
+                checkpoint=self.checkpoint)
+        with self.assertRaises(ValueError):
+            i.run(self.rows(5), 'campaign')
+        self.assertEqual(listdir(self.spool_dir), [])
+
+    def test_checkpoint_other_campaign(self):
+        """Ensure a checkpoint isn't resumed against a different campaign."""
+        i = CampaignImporter(self.a, self.fields, spool_dir=self.spool_dir,
+                checkpoint=self.checkpoint)
+        i.run(self.rows(5), 'first')
+        self.assertEqual(i.run(self.rows(5), 'second').spooled, 5)
+
+
+class TestMain(TestCase):
+    """Run tests on the ``python -m pycall`` command line interface."""
+
+    def test_import(self):
+        """Ensure the import command spools a campaign file."""
+        spool_dir = mkdtemp()
+        path = join(mkdtemp(), 'campaign.jsonl')
+        with open(path, 'w') as f:
+            for n in range(3):
+                f.write(json.dumps({'phone': n, 'name': 'n%d' % n}) + '\n')
+
+        ret = main(['import', path, '--channel', 'SIP/{phone}', '--var',
+                'name={name}', '--application', 'Playback', '--data', 'hi',
+                '--spool-dir', spool_dir, '--quiet'])
+        self.assertEqual(ret, 0)
+        self.assertEqual(len(listdir(spool_dir)), 3)
+
+    def test_import_reports_bad_rows(self):
+        """Ensure the import command reports malformed rows as failures, and
+        spools the rest.
+        """
+        spool_dir = mkdtemp()
+        path = join(mkdtemp(), 'campaign.jsonl')
+        with open(path, 'w') as f:
+            f.write('{"phone": 1}\n{"phone": \n[2]\n{"phone": 3}\n')
+
+        ret = main(['import', path, '--channel', 'SIP/{phone}',
+                '--application', 'Playback', '--spool-dir', spool_dir,
+                '--quiet'])
+        self.assertEqual(ret, 1)
+        self.assertEqual(len(listdir(spool_dir)), 2)
+
+    def test_action_required(self):
+        """Ensure exactly one of an application or context is required."""
+        with self.assertRaises(SystemExit):
+            main(['import', 'campaign.csv', '--channel', '{phone}'])
+
+    def test_context_requires_extension(self):
+        """Ensure a context without an extension is a usage error."""
+        with self.assertRaises(SystemExit):
+            main(['import', 'campaign.csv', '--channel', '{phone}',
+                    '--context', 'default'])
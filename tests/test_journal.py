@@ -0,0 +1,165 @@
+"""Unit tests for `pycall.journal`."""
+
+
+from os import listdir, mkdir, remove, rename
+from os.path import join
+from tempfile import mkdtemp
+from threading import Thread
+from unittest import TestCase
+
+from pycall import Application, Call, CallFile, NoSpoolPermissionError, \
+    NoUserError, Reconciliation, SpoolJournal
+
+
+class TestSpoolJournal(TestCase):
+    """Run tests on the `SpoolJournal` class."""
+
+    def setUp(self):
+        """Setup some default variables for test usage."""
+        base = mkdtemp()
+        self.path = join(base, 'journal')
+        self.staging_dir = join(base, 'staging')
+        self.spool_dir = join(base, 'outgoing')
+        self.archive_dir = join(base, 'outgoing_done')
+        mkdir(self.spool_dir)
+        mkdir(self.archive_dir)
+        self.c = Call('channel')
+        self.a = Application('application', 'data')
+
+    def journal(self):
+        return SpoolJournal(self.path, self.staging_dir, self.spool_dir,
+                self.archive_dir)
+
+    def cf(self, **kwargs):
+        return CallFile(self.c, self.a, **kwargs)
+
+    def records(self):
+        with open(self.path) as f:
+            return [line.split()[0] for line in f]
+
+    def test_spool(self):
+        """Ensure spooled call files are journaled and completed."""
+        j = self.journal()
+        cf = self.cf()
+        j.spool(cf)
+        self.assertEqual(listdir(self.spool_dir), [cf.filename])
+        self.assertEqual(listdir(self.staging_dir), [])
+        self.assertEqual(self.records(), ['I', 'D'])
+        self.assertEqual(j.pending(), set())
+
+    def test_spool_many(self):
+        """Ensure batches are journaled together, and failures don't stop the
+        batch.
+        """
+        j = self.journal()
+        cfs = [self.cf() for _ in range(5)]
+        cfs[2].user = 'asjdfgkhkgaskqtjwhkjwetghqekjtbkwthbjkltwhwklt'
+        results = j.spool_many(cfs)
+        self.assertEqual([r.ok for r in results], [True, True, False, True,
+                True])
+        self.assertTrue(isinstance(results[2].error, NoUserError))
+        self.assertEqual(len(listdir(self.spool_dir)), 4)
+        self.assertEqual(listdir(self.staging_dir), [])
+        self.assertEqual(self.records(), ['I'] * 4 + ['D'] * 4)
+
+    def test_group_commit(self):
+        """Ensure concurrent spools all complete."""
+        j = self.journal()
+        threads = [Thread(target=lambda: [j.spool(self.cf())
+                for _ in range(20)]) for _ in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(len(listdir(self.spool_dir)), 80)
+        self.assertEqual(j.pending(), set())
+
+    def test_reconcile(self):
+        """Ensure interrupted spools are finished, and unjournaled call files
+        are discarded.
+        """
+        j = self.journal()
+        staged, queued, archived, finished, orphan = [self.cf()
+                for _ in range(5)]
+        for cf in (staged, queued, archived, finished, orphan):
+            j._stage(cf, None)
+        j._commit(j._append('I', [str(cf.filename) for cf in (staged, queued,
+                archived, finished)]))
+        for cf in (queued, archived, finished):
+            j._publish(str(cf.filename))
+        rename(join(self.spool_dir, archived.filename),
+                join(self.archive_dir, archived.filename))
+        remove(join(self.spool_dir, finished.filename))
+        j.close()
+
+        j = self.journal()
+        self.assertEqual(len(j.pending()), 4)
+        r = j.reconcile()
+        self.assertTrue(isinstance(r, Reconciliation))
+        self.assertEqual(r, ([staged.filename], [queued.filename],
+                [archived.filename], [finished.filename], [orphan.filename],
+                []))
+        self.assertEqual(sorted(listdir(self.spool_dir)),
+                sorted([staged.filename, queued.filename]))
+        self.assertEqual(listdir(self.staging_dir), [])
+        self.assertEqual(j.pending(), set())
+        self.assertEqual(self.records(), [])
+
+    def test_reconcile_failure(self):
+        """Ensure a call file that can't be republished stays staged and
+        pending, without stopping the rest of the reconciliation.
+        """
+        j = self.journal()
+        first, second = self.cf(), self.cf()
+        for cf in (first, second):
+            j._stage(cf, None)
+        names = sorted(str(cf.filename) for cf in (first, second))
+        j._commit(j._append('I', names))
+        j.close()
+
+        j = self.journal()
+        rename_ = j._rename
+
+        def flaky(name):
+            if name == names[0]:
+                raise NoSpoolPermissionError
+            rename_(name)
+
+        j._rename = flaky
+        r = j.reconcile()
+        self.assertEqual(r.republished, [names[1]])
+        self.assertEqual([n for n, e in r.failed], [names[0]])
+        self.assertTrue(isinstance(r.failed[0][1], NoSpoolPermissionError))
+        self.assertEqual(listdir(self.staging_dir), [names[0]])
+        self.assertEqual(j.pending(), set([names[0]]))
+
+        del j._rename
+        self.assertEqual(j.reconcile().republished, [names[0]])
+        self.assertEqual(sorted(listdir(self.spool_dir)), names)
+        self.assertEqual(j.pending(), set())
+
+    def test_sync_full(self):
+        """Ensure `SYNC_FULL` call files fsync both directories."""
+        j = self.journal()
+        synced = []
+        j._sync_dirs = lambda: synced.append(True)
+        j.spool(self.cf())
+        self.assertEqual(synced, [])
+        j.spool(self.cf(sync=CallFile.SYNC_FULL))
+        j.spool_many([self.cf(sync=CallFile.SYNC_FULL) for _ in range(3)])
+        self.assertEqual(synced, [True, True])
+
+    def test_partial_record(self):
+        """Ensure a partially written record is ignored."""
+        with open(self.path, 'w') as f:
+            f.write('I a.call\nD a.call\nI b.call\nI c.c')
+        self.assertEqual(self.journal().pending(), set(['b.call']))
+
+    def test_compact(self):
+        """Ensure the journal is compacted once enough spools complete."""
+        j = self.journal()
+        j.COMPACT_THRESHOLD = 4
+        j.spool_many([self.cf() for _ in range(3)])
+        self.assertEqual(len(self.records()), 6)
+        j.spool(self.cf())
+        self.assertEqual(self.records(), [])
@@ -0,0 +1,116 @@
+"""Unit tests for `pycall.metrics`."""
+
+
+from datetime import datetime, timedelta
+from os.path import join
+from tempfile import mkdtemp
+from unittest import TestCase
+
+from pycall import Application, Call, CallFile, MetricsSink, NoUserError, \
+    PrometheusSink, ValidationError, set_sink
+from pycall import metrics
+
+
+class RecordingSink(MetricsSink):
+    """A sink that remembers everything it's sent."""
+
+    def __init__(self):
+        self.timings = []
+        self.errors = []
+
+    def timing(self, phase, seconds):
+        self.timings.append(phase)
+
+    def error(self, error):
+        self.errors.append(error.__class__)
+
+
+class TestInstrumentation(TestCase):
+    """Run tests on the instrumentation of `CallFile.spool`."""
+
+    def setUp(self):
+        """Setup some default variables for test usage."""
+        self.sink = RecordingSink()
+        self.old = set_sink(self.sink)
+        self.spool_dir = mkdtemp()
+        self.c = Call('channel')
+        self.a = Application('application', 'data')
+
+    def tearDown(self):
+        set_sink(self.old)
+
+    def test_set_sink(self):
+        """Ensure `set_sink` installs a sink and returns the previous one."""
+        self.assertTrue(metrics.sink is self.sink)
+        self.assertTrue(set_sink(None) is self.sink)
+        self.assertTrue(metrics.sink is None)
+
+    def test_phases(self):
+        """Ensure each phase of a spool is timed, skipping idle phases."""
+        CallFile(self.c, self.a, spool_dir=self.spool_dir).spool()
+        self.assertEqual(self.sink.timings, ['owner', 'render', 'write',
+                'move', 'spool'])
+
+    def test_phases_time_sync(self):
+        """Ensure the utime and sync phases are timed when they run."""
+        cf = CallFile(self.c, self.a, spool_dir=self.spool_dir,
+                sync=CallFile.SYNC_DATA)
+        cf.spool(datetime.now() + timedelta(hours=1))
+        self.assertEqual(self.sink.timings, ['owner', 'render', 'write',
+                'utime', 'sync', 'move', 'spool'])
+
+    def test_errors(self):
+        """Ensure failed spools are counted by error class."""
+        cf = CallFile(self.c, self.a, spool_dir=self.spool_dir,
+                user='asjdfgkhkgaskqtjwhkjwetghqekjtbkwthbjkltwhwklt')
+        with self.assertRaises(NoUserError):
+            cf.spool()
+        self.assertEqual(self.sink.errors, [NoUserError])
+        self.assertEqual(self.sink.timings, [])
+
+    def test_spool_many(self):
+        """Ensure batches are instrumented too."""
+        CallFile.spool_many([
+            CallFile(self.c, self.a, spool_dir=self.spool_dir),
+            CallFile(self.c, self.a, spool_dir=join(self.spool_dir, 'nope')),
+        ])
+        self.assertEqual(self.sink.timings.count('spool'), 1)
+        self.assertEqual(self.sink.errors, [ValidationError])
+
+
+class TestPrometheusSink(TestCase):
+    """Run tests on the `PrometheusSink` class."""
+
+    def setUp(self):
+        """Setup some default variables for test usage."""
+        self.sink = PrometheusSink(buckets=(0.1, 0.01))
+
+    def test_render(self):
+        """Ensure metrics are rendered as cumulative histograms and
+        counters.
+        """
+        self.sink.timing('write', 0.005)
+        self.sink.timing('write', 0.05)
+        self.sink.timing('write', 5)
+        self.sink.error(NoUserError())
+        self.sink.error(NoUserError())
+        text = self.sink.render()
+        for line in (
+            '# TYPE pycall_spool_phase_seconds histogram',
+            'pycall_spool_phase_seconds_bucket{phase="write",le="0.01"} 1',
+            'pycall_spool_phase_seconds_bucket{phase="write",le="0.1"} 2',
+            'pycall_spool_phase_seconds_bucket{phase="write",le="+Inf"} 3',
+            'pycall_spool_phase_seconds_sum{phase="write"} 5.055',
+            'pycall_spool_phase_seconds_count{phase="write"} 3',
+            '# TYPE pycall_spool_errors_total counter',
+            'pycall_spool_errors_total{error="NoUserError"} 2',
+        ):
+            self.assertTrue(line in text.splitlines(), line)
+
+    def test_write(self):
+        """Ensure metrics can be written to a file."""
+        path = join(mkdtemp(), 'pycall.prom')
+        self.sink.timing('render', 0.001)
+        self.sink.write(path)
+        with open(path) as f:
+            self.assertEqual(f.read(), self.sink.render())
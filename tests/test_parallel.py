@@ -0,0 +1,101 @@
+"""Unit tests for `pycall.parallel`."""
+
+
+from os import listdir
+from tempfile import mkdtemp
+from unittest import TestCase
+
+from pycall import Application, CallFile, Context, NoUserError, \
+    ParallelReport, ValidationError, callfile_from_spec, spool_parallel
+
+
+class TestCallfileFromSpec(TestCase):
+    """Run tests on the `callfile_from_spec` function."""
+
+    def test_dict_application(self):
+        """Ensure dict specs with an application work."""
+        cf = callfile_from_spec({'channel': 'channel', 'wait_time': 10,
+                'application': 'application', 'data': 'data',
+                'archive': True}, {'spool_dir': '/tmp'})
+        self.assertTrue(isinstance(cf, CallFile))
+        self.assertEqual(cf.call.channel, 'channel')
+        self.assertEqual(cf.call.wait_time, 10)
+        self.assertTrue(isinstance(cf.action, Application))
+        self.assertEqual(cf.archive, True)
+        self.assertEqual(cf.spool_dir, '/tmp')
+
+    def test_dict_context(self):
+        """Ensure dict specs with a context work."""
+        cf = callfile_from_spec({'channel': 'channel', 'context': 'context',
+                'extension': 's', 'priority': '1'})
+        self.assertTrue(isinstance(cf.action, Context))
+        self.assertEqual(cf.action.extension, 's')
+
+    def test_tuples(self):
+        """Ensure tuple specs work."""
+        cf = callfile_from_spec(('channel', 'application', 'data'))
+        self.assertEqual(cf.action.application, 'application')
+        cf = callfile_from_spec(('channel', 'context', 's', '1'))
+        self.assertEqual(cf.action.context, 'context')
+
+    def test_malformed(self):
+        """Ensure malformed specs raise `ValidationError`."""
+        for spec in ({'channel': 'channel'}, ('channel',), 3,
+                {'application': 'a', 'data': 'd'}):
+            with self.assertRaises(ValidationError):
+                callfile_from_spec(spec)
+
+
+class TestSpoolParallel(TestCase):
+    """Run tests on the `spool_parallel` function."""
+
+    def test_spool_parallel(self):
+        """Ensure `spool_parallel` spools every spec and reports failures by
+        index.
+        """
+        spool_dir = mkdtemp()
+        specs = [('SIP/%d' % i, 'application', 'data') for i in range(50)]
+        specs[7] = ('bad',)
+        specs[31] = {'channel': 'channel', 'application': 'a', 'data': 'd',
+                'user': 'asjdfgkhkgaskqtjwhkjwetghqekjtbkwthbjkltwhwklt'}
+
+        report = spool_parallel(iter(specs), processes=2, chunksize=8,
+                spool_dir=spool_dir)
+        self.assertTrue(isinstance(report, ParallelReport))
+        self.assertEqual(report.spooled, 48)
+        self.assertEqual([i for i, e in report.failed], [7, 31])
+        self.assertTrue(isinstance(report.failed[0][1], ValidationError))
+        self.assertTrue(isinstance(report.failed[1][1], NoUserError))
+        self.assertEqual(len(listdir(spool_dir)), 48)
+
+    def test_spool_parallel_reads_lazily(self):
+        """Ensure `spool_parallel` only reads a few chunks ahead of the
+        workers.
+        """
+        spool_dir = mkdtemp()
+
+        def specs():
+            for i in range(40):
+                # Chunks before the two in flight must have been spooled.
+                self.assertTrue(len(listdir(spool_dir)) >= (i // 2 - 2) * 2)
+                yield ('SIP/%d' % i, 'application', 'data')
+
+        report = spool_parallel(specs(), processes=1, chunksize=2,
+                spool_dir=spool_dir)
+        self.assertEqual(report.spooled, 40)
+
+    def test_spool_parallel_other_errors(self):
+        """Ensure errors other than `PycallError` are reported by index,
+        without losing the rest of the chunk.
+        """
+        spool_dir = mkdtemp()
+        specs = [('SIP/%d' % i, 'application', 'data') for i in range(8)]
+        specs[2] = {'channel': 'channel', 'application': 'a', 'data': 'd',
+                'user': 3.5}
+
+        report = spool_parallel(specs, processes=2, chunksize=4,
+                spool_dir=spool_dir)
+        self.assertEqual(report.spooled, 7)
+        self.assertEqual([i for i, e in report.failed], [2])
+        self.assertTrue(isinstance(report.failed[0][1], TypeError))
+        self.assertEqual(len(listdir(spool_dir)), 7)
@@ -0,0 +1,139 @@
+"""Unit tests for `pycall.parser`."""
+
+
+from os import mkdir
+from os.path import join
+from tempfile import mkdtemp
+from unittest import TestCase
+
+from pycall import Application, Call, CallFile, Context, ValidationError, \
+    iter_callfiles
+from pycall.parser import parse, parse_file
+
+
+ARCHIVED = """Channel: SIP/flowroute/18002223333
+CallerID: "Test" <5555555555>
+MaxRetries: 2
+RetryTime: 60
+WaitTime: 30
+Context: survey
+Extension: s
+Priority: 1
+SetVar: greeting=tt-monkeys
+Set: CALLERID(name)=a=b
+Account: campaign
+Archive: Yes
+StartRetry: 1234 1 (1500000000)
+EndRetry: 1234 1 (1500000030)
+StartRetry: 1234 2 (1500000090)
+EndRetry: 1234 2 (1500000120)
+Status: Failed
+"""
+
+
+class TestParse(TestCase):
+    """Run tests on the `parse` function."""
+
+    def test_round_trip(self):
+        """Ensure parsing a call file's contents gives the same call file."""
+        cf = CallFile(Call('channel', 'callerid', {'a': 'b', 'c': 'd'},
+                'account', 10, 20, 2), Application('application', 'data'),
+                archive=True, spool_dir='/tmp')
+        self.assertEqual(parse(cf.contents, spool_dir='/tmp').contents,
+                cf.contents)
+
+    def test_asterisk_directives(self):
+        """Ensure directives written by Asterisk are parsed."""
+        cf = parse(ARCHIVED)
+        self.assertEqual(cf.call.channel, 'SIP/flowroute/18002223333')
+        self.assertEqual(cf.call.callerid, '"Test" <5555555555>')
+        self.assertEqual(cf.call.max_retries, 2)
+        self.assertEqual(cf.call.retry_time, 60)
+        self.assertEqual(cf.call.wait_time, 30)
+        self.assertEqual(cf.call.account, 'campaign')
+        self.assertEqual(cf.call.variables,
+                {'greeting': 'tt-monkeys', 'CALLERID(name)': 'a=b'})
+        self.assertTrue(isinstance(cf.action, Context))
+        self.assertEqual((cf.action.context, cf.action.extension,
+                cf.action.priority), ('survey', 's', '1'))
+        self.assertTrue(cf.archive)
+        self.assertEqual(cf.status, 'Failed')
+        self.assertEqual(cf.history, [
+            ('StartRetry', '1234 1 (1500000000)'),
+            ('EndRetry', '1234 1 (1500000030)'),
+            ('StartRetry', '1234 2 (1500000090)'),
+            ('EndRetry', '1234 2 (1500000120)'),
+        ])
+
+    def test_comments_and_blank_lines(self):
+        """Ensure comments and blank lines are skipped."""
+        cf = parse('# comment\n\nChannel: c\n; comment\nApplication: a\n')
+        self.assertEqual(cf.call.channel, 'c')
+        self.assertEqual(cf.action.data, '')
+        self.assertEqual(cf.status, None)
+        self.assertEqual(cf.history, [])
+
+    def test_invalid(self):
+        """Ensure invalid call files raise `ValidationError`."""
+        for text in ('Application: a', 'Channel: c', 'Channel c\nApplication: a',
+                'Channel: c\nApplication: a\nWaitTime: soon'):
+            with self.assertRaises(ValidationError):
+                parse(text)
+
+    def test_from_string(self):
+        """Ensure `CallFile.from_string` works."""
+        cf = CallFile.from_string(ARCHIVED, spool_dir='/tmp')
+        self.assertEqual(cf.spool_dir, '/tmp')
+        self.assertEqual(cf.status, 'Failed')
+
+
+class TestParseFile(TestCase):
+    """Run tests on the `parse_file` function."""
+
+    def setUp(self):
+        """Setup some default variables for test usage."""
+        self.dir = mkdtemp()
+        self.path = join(self.dir, 'test.call')
+        with open(self.path, 'w') as f:
+            f.write(ARCHIVED)
+
+    def test_parse_file(self):
+        """Ensure `parse_file` keeps the call file's name."""
+        cf = parse_file(self.path)
+        self.assertEqual(cf.filename, 'test.call')
+        self.assertEqual(cf.status, 'Failed')
+
+    def test_from_path(self):
+        """Ensure `CallFile.from_path` works."""
+        cf = CallFile.from_path(self.path, spool_dir='/tmp')
+        self.assertEqual(cf.filename, 'test.call')
+        self.assertEqual(cf.spool_dir, '/tmp')
+
+
+class TestIterCallfiles(TestCase):
+    """Run tests on the `iter_callfiles` function."""
+
+    def setUp(self):
+        """Setup some default variables for test usage."""
+        self.dir = mkdtemp()
+        for i in range(3):
+            CallFile(Call('channel%d' % i), Application('a', 'd'),
+                    filename='%d.call' % i, tempdir=self.dir,
+                    spool_dir=self.dir).writefile()
+        mkdir(join(self.dir, 'subdir'))
+        with open(join(self.dir, '.hidden'), 'w') as f:
+            f.write('junk')
+
+    def test_iter_callfiles(self):
+        """Ensure `iter_callfiles` parses every call file in a directory."""
+        channels = sorted(cf.call.channel for cf in iter_callfiles(self.dir))
+        self.assertEqual(channels, ['channel0', 'channel1', 'channel2'])
+
+    def test_iter_callfiles_errors(self):
+        """Ensure `iter_callfiles` raises, or skips, unparseable files."""
+        with open(join(self.dir, 'bad.call'), 'w') as f:
+            f.write('junk')
+        with self.assertRaises(ValidationError):
+            list(iter_callfiles(self.dir))
+        self.assertEqual(len(list(iter_callfiles(self.dir,
+                ignore_errors=True))), 3)
@@ -0,0 +1,135 @@
+"""Unit tests for `pycall.priority`."""
+
+
+from os import listdir
+from shutil import rmtree
+from tempfile import mkdtemp
+from threading import Thread
+from time import sleep
+from unittest import TestCase
+
+from pycall import Application, Call, CallFile, Lane, LaneStats, \
+    NoUserError, PrioritySpooler
+
+from . import Clock
+
+
+class TestPrioritySpooler(TestCase):
+    """Run tests on the `PrioritySpooler` class."""
+
+    def setUp(self):
+        """Setup some default variables for test usage."""
+        self.spool_dir = mkdtemp()
+        self.addCleanup(rmtree, self.spool_dir)
+        self.clock = Clock(1000.0)
+        self.a = Application('application', 'data')
+
+    def spooler(self, *lanes, **kwargs):
+        s = PrioritySpooler(lanes, self.spool_dir, clock=self.clock, **kwargs)
+
+        def submit(lane, n):
+            for _ in range(n):
+                s.submit(CallFile(Call('channel'), self.a), lane)
+        return s, submit
+
+    def test_weighted(self):
+        """Ensure lanes are dispatched in proportion to their weights."""
+        s, submit = self.spooler(Lane('urgent', 3), Lane('bulk', 1))
+        submit('bulk', 8)
+        submit('urgent', 6)
+        s.dispatch(limit=8)
+        stats = s.stats()
+        self.assertEqual((stats['urgent'].spooled, stats['bulk'].spooled),
+                (6, 2))
+        self.assertEqual(s.dispatch(), 6)
+        self.assertEqual(len(listdir(self.spool_dir)), 14)
+
+    def test_urgent_first(self):
+        """Ensure urgent call files don't wait behind a bulk backlog."""
+        s, submit = self.spooler(Lane('urgent', 10), Lane('bulk', 1))
+        submit('bulk', 100)
+        submit('urgent', 5)
+        s.dispatch(limit=6)
+        stats = s.stats()
+        self.assertEqual(stats['urgent'].spooled, 5)
+        self.assertEqual(stats['bulk'].spooled, 1)
+
+    def test_background_lane(self):
+        """Ensure weight 0 lanes wait for the others, unless starved."""
+        s, submit = self.spooler(Lane('urgent', 1), Lane('bulk', 0),
+                starvation_after=5)
+        submit('bulk', 3)
+        submit('urgent', 3)
+        s.dispatch(limit=3)
+        self.assertEqual(s.stats()['bulk'].spooled, 0)
+
+        submit('urgent', 4)
+        self.clock.t += 5
+        s.dispatch(limit=4)
+        self.assertEqual(s.stats()['bulk'].spooled, 2)
+
+    def test_rate(self):
+        """Ensure lanes over their rate are skipped."""
+        s, submit = self.spooler(Lane('urgent', 10),
+                Lane('bulk', 1, rate=1, burst=2))
+        submit('bulk', 5)
+        self.assertEqual(s.dispatch(), 2)
+        self.assertEqual(len(s), 3)
+        self.assertTrue(s.next_dispatch() > 0)
+
+    def test_stats(self):
+        """Ensure latency and failures are reported per lane."""
+        errors = []
+        s, submit = self.spooler(Lane('urgent'), on_error=lambda cf, e:
+                errors.append(e))
+        submit('urgent', 2)
+        s.submit(CallFile(Call('channel'), self.a,
+                user='asjdfgkhkgaskqtjwhkjwetghqekjtbkwthbjkltwhwklt'),
+                'urgent')
+        self.clock.t += 0.5
+        s.dispatch()
+        stats = s.stats()['urgent']
+        self.assertTrue(isinstance(stats, LaneStats))
+        self.assertEqual((stats.queued, stats.spooled, stats.failed),
+                (0, 2, 1))
+        self.assertEqual(stats.mean_latency, 0.5)
+        self.assertEqual(stats.max_latency, 0.5)
+        self.assertTrue(isinstance(errors[0], NoUserError))
+
+    def test_other_errors(self):
+        """Ensure any spooling error, or an `on_error` that raises, is counted
+        against the call file without stopping the dispatch.
+        """
+        def on_error(cf, e):
+            raise RuntimeError('on_error')
+
+        s, submit = self.spooler(Lane('urgent'), on_error=on_error)
+        submit('urgent', 1)
+        s.submit(CallFile(Call('channel'), self.a, user=3.5), 'urgent')
+        submit('urgent', 1)
+        self.assertEqual(s.dispatch(), 3)
+        stats = s.stats()['urgent']
+        self.assertEqual((stats.spooled, stats.failed), (2, 1))
+        self.assertEqual(len(listdir(self.spool_dir)), 2)
+
+    def test_unknown_lane(self):
+        """Ensure submitting to an unknown lane fails."""
+        s, _ = self.spooler(Lane('urgent'))
+        with self.assertRaises(KeyError):
+            s.submit(CallFile(Call('channel'), self.a), 'bulk')
+
+    def test_run(self):
+        """Ensure `run` dispatches submitted call files until stopped."""
+        s = PrioritySpooler([Lane('urgent')], self.spool_dir)
+        t = Thread(target=s.run)
+        t.start()
+        try:
+            s.submit(CallFile(Call('channel'), self.a), 'urgent')
+            for _ in range(100):
+                if listdir(self.spool_dir):
+                    break
+                sleep(0.01)
+        finally:
+            s.stop()
+            t.join()
+        self.assertEqual(len(listdir(self.spool_dir)), 1)
@@ -0,0 +1,125 @@
+"""Unit tests for `pycall.scheduler`."""
+
+
+from datetime import datetime, timedelta
+from os import listdir, mkdir, remove, rmdir
+from tempfile import mkdtemp
+from threading import Thread
+from time import mktime
+from unittest import TestCase
+
+from path import Path
+
+from pycall import Application, Call, CallFile, InvalidTimeError, \
+    NoSpoolPermissionError, SpoolScheduler
+
+
+class TestSpoolScheduler(TestCase):
+    """Run tests on the `SpoolScheduler` class."""
+
+    def setUp(self):
+        """Setup some default variables for test usage."""
+        root = Path(mkdtemp())
+        self.spool_dir = root / 'outgoing'
+        self.staging_dir = root / 'scheduled'
+        mkdir(self.spool_dir)
+        self.s = SpoolScheduler(self.staging_dir, self.spool_dir, lead_time=60)
+        self.time = datetime.now().replace(microsecond=0) + timedelta(hours=1)
+        self.due = mktime(self.time.timetuple())
+
+    def callfile(self):
+        return CallFile(Call('channel'), Application('application', 'data'))
+
+    def test_attrs_stick(self):
+        """Ensure attributes stick."""
+        self.assertEqual(self.s.staging_dir, self.staging_dir)
+        self.assertEqual(self.s.spool_dir, self.spool_dir)
+        self.assertEqual(self.s.lead_time, 60)
+
+    def test_attrs_default_lead_time(self):
+        """Ensure the default `lead_time` attribute works."""
+        s = SpoolScheduler(self.staging_dir, self.spool_dir)
+        self.assertEqual(s.lead_time, SpoolScheduler.DEFAULT_LEAD_TIME)
+
+    def test_schedule_stages_callfile(self):
+        """Ensure `schedule` holds call files back from the spool."""
+        cf = self.callfile()
+        self.s.schedule(cf, self.time)
+        self.assertEqual(len(self.s), 1)
+        self.assertEqual(listdir(self.spool_dir), [])
+        self.assertEqual((self.staging_dir / cf.filename).mtime, self.due)
+        self.assertEqual(self.s.next_release(), self.due - 60)
+
+    def test_schedule_invalid_time_error(self):
+        """Ensure `schedule` raises `InvalidTimeError` given a bad time."""
+        with self.assertRaises(InvalidTimeError):
+            self.s.schedule(self.callfile(), 666)
+
+    def test_dispatch_releases_due_callfiles(self):
+        """Ensure `dispatch` only releases call files within `lead_time` of
+        being due, in due order.
+        """
+        later, sooner = self.callfile(), self.callfile()
+        self.s.schedule(later, self.time + timedelta(minutes=10))
+        self.s.schedule(sooner, self.time)
+
+        self.assertEqual(self.s.dispatch(self.due - 61), [])
+        self.assertEqual(self.s.dispatch(self.due - 60), [sooner.filename])
+        self.assertEqual(listdir(self.spool_dir), [sooner.filename])
+        self.assertEqual((self.spool_dir / sooner.filename).mtime, self.due)
+        self.assertEqual(self.s.dispatch(self.due + 3600), [later.filename])
+        self.assertEqual(len(self.s), 0)
+
+    def test_dispatch_drops_missing_callfiles(self):
+        """Ensure a staged call file that has disappeared doesn't hold up the
+        others.
+        """
+        gone, cf = self.callfile(), self.callfile()
+        self.s.schedule(gone, self.time)
+        self.s.schedule(cf, self.time + timedelta(seconds=1))
+        remove(self.staging_dir / gone.filename)
+        self.assertEqual(self.s.dispatch(self.due), [cf.filename])
+        self.assertEqual(len(self.s), 0)
+
+    def test_dispatch_retries_failures(self):
+        """Ensure a call file that can't be released is reported, and retried
+        later, without holding up the others.
+        """
+        errors = []
+        s = SpoolScheduler(self.staging_dir, self.spool_dir, lead_time=60,
+                on_error=lambda name, e: errors.append((name, e)))
+        cf = self.callfile()
+        s.schedule(cf, self.time)
+        rmdir(self.spool_dir)
+        self.assertEqual(s.dispatch(self.due), [])
+        self.assertEqual(len(s), 1)
+        self.assertEqual(errors[0][0], cf.filename)
+        self.assertTrue(isinstance(errors[0][1], NoSpoolPermissionError))
+
+        mkdir(self.spool_dir)
+        self.assertEqual(s.dispatch(self.due), [])
+        self.assertEqual(s.dispatch(self.due + s.RETRY_INTERVAL),
+                [cf.filename])
+        self.assertEqual(len(errors), 1)
+
+    def test_recover(self):
+        """Ensure a new scheduler picks up previously scheduled call files."""
+        cf = self.callfile()
+        self.s.schedule(cf, self.time)
+        s = SpoolScheduler(self.staging_dir, self.spool_dir, lead_time=60)
+        self.assertEqual(len(s), 1)
+        self.assertEqual(s.dispatch(self.due), [cf.filename])
+
+    def test_run_and_stop(self):
+        """Ensure `run` releases due call files until stopped."""
+        cf = self.callfile()
+        t = Thread(target=self.s.run)
+        t.start()
+        self.s.schedule(cf, datetime.now())
+        for _ in range(100):
+            if listdir(self.spool_dir):
+                break
+            t.join(0.01)
+        self.s.stop()
+        t.join()
+        self.assertEqual(listdir(self.spool_dir), [cf.filename])
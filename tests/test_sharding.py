@@ -0,0 +1,105 @@
+"""Unit tests for `pycall.sharding`."""
+
+
+from os import listdir, mkdir, rmdir
+from os.path import join
+from shutil import rmtree
+from tempfile import mkdtemp
+from unittest import TestCase
+
+from pycall import Application, Call, CallFile, ConsistentHash, LeastQueued, \
+    NoSpoolPermissionError, RoundRobin, ShardedSpooler
+
+from . import Clock
+
+
+class TestShardedSpooler(TestCase):
+    """Run tests on the `ShardedSpooler` class and its policies."""
+
+    def setUp(self):
+        """Setup some default variables for test usage."""
+        base = mkdtemp()
+        self.addCleanup(rmtree, base)
+        self.dirs = [join(base, 'node%d' % i) for i in range(3)]
+        for d in self.dirs:
+            mkdir(d)
+        self.clock = Clock(1000.0)
+        self.a = Application('application', 'data')
+
+    def cf(self, channel='channel'):
+        return CallFile(Call(channel), self.a)
+
+    def counts(self):
+        return [len(listdir(d)) for d in self.dirs]
+
+    def test_round_robin(self):
+        """Ensure call files are spread evenly by default."""
+        s = ShardedSpooler(self.dirs)
+        self.assertTrue(isinstance(s.policy, RoundRobin))
+        for _ in range(9):
+            s.spool(self.cf())
+        self.assertEqual(self.counts(), [3, 3, 3])
+
+    def test_least_queued(self):
+        """Ensure call files go to the emptiest spooling directory."""
+        for i in range(4):
+            open(join(self.dirs[0], 'x%d' % i), 'w').close()
+        open(join(self.dirs[1], 'x'), 'w').close()
+        s = ShardedSpooler(self.dirs, LeastQueued(clock=self.clock))
+        for _ in range(5):
+            s.spool(self.cf())
+        self.assertEqual(self.counts(), [4, 3, 3])
+
+    def test_consistent_hash(self):
+        """Ensure calls with the same key go to the same target, and only
+        move when their target is taken out of rotation.
+        """
+        s = ShardedSpooler(self.dirs, ConsistentHash(), clock=self.clock)
+        first = dict((n, s.spool(self.cf('SIP/%d' % n))) for n in range(30))
+        self.assertEqual(len(set(first.values())), 3)
+        for n in range(30):
+            self.assertTrue(s.spool(self.cf('SIP/%d' % n)) is first[n])
+
+        gone = s.targets[0]
+        s.mark_unhealthy(gone)
+        for n in range(30):
+            target = s.spool(self.cf('SIP/%d' % n))
+            if first[n] is not gone:
+                self.assertTrue(target is first[n])
+            self.assertFalse(target is gone)
+
+    def test_unhealthy(self):
+        """Ensure targets that fail are taken out of rotation, and come back
+        after `retry_after`.
+        """
+        s = ShardedSpooler(self.dirs, retry_after=10, clock=self.clock)
+        rmdir(self.dirs[1])
+        for _ in range(6):
+            s.spool(self.cf())
+        self.assertEqual(len(s.healthy()), 2)
+
+        mkdir(self.dirs[1])
+        self.clock.t += 10
+        self.assertEqual(len(s.healthy()), 3)
+
+    def test_move_failure(self):
+        """Ensure a target is dropped when a move into it fails, and the call
+        file is spooled elsewhere.
+        """
+        s = ShardedSpooler(self.dirs, clock=self.clock)
+        gone = s.targets[0]
+        rmdir(self.dirs[0])
+        self.assertTrue(gone.is_valid)
+
+        target = s.spool(self.cf())
+        self.assertFalse(target is gone)
+        self.assertEqual(len(listdir(target.path)), 1)
+        self.assertFalse(gone in s.healthy())
+
+    def test_all_unhealthy(self):
+        """Ensure spooling fails when no target is healthy."""
+        s = ShardedSpooler(self.dirs, clock=self.clock)
+        for t in s.targets:
+            s.mark_unhealthy(t)
+        with self.assertRaises(NoSpoolPermissionError):
+            s.spool(self.cf())
@@ -0,0 +1,95 @@
+"""Unit tests for `pycall.stream`."""
+
+
+import tarfile
+from io import BytesIO
+from os import listdir, symlink
+from os.path import islink, join
+from tempfile import mkdtemp
+from unittest import TestCase
+
+from pycall import Application, Call, CallFile, ValidationError, \
+    iter_chunks, write_files, write_stream, write_tar
+
+
+class TestStream(TestCase):
+    """Run tests on the streaming rendering functions."""
+
+    def setUp(self):
+        """Setup some default variables for test usage."""
+        self.a = Application('Playback', 'hello-world')
+        self.cfs = [CallFile(Call('SIP/%d' % i, variables={'n': i}), self.a,
+                archive=True) for i in range(5)]
+
+    def callfiles(self):
+        for cf in self.cfs:
+            yield cf
+
+    def test_iter_chunks(self):
+        """Ensure chunks join to each call file's contents, and repeated lines
+        reuse the same bytes.
+        """
+        seen = []
+        for cf, chunks in iter_chunks(self.callfiles()):
+            self.assertEqual(b''.join(chunks).decode('utf-8'),
+                    '\n'.join(cf._buildfile(False)))
+            seen.append(chunks)
+        self.assertEqual(len(seen), 5)
+        self.assertTrue(seen[0][-1] is seen[4][-1])
+
+    def test_invalid(self):
+        """Ensure invalid call files raise, or are passed to `on_error`."""
+        self.cfs[2].call.wait_time = 'x'
+        with self.assertRaises(ValidationError):
+            list(iter_chunks(self.callfiles()))
+
+        bad = []
+        chunks = list(iter_chunks(self.callfiles(),
+                lambda cf, e: bad.append((cf, e))))
+        self.assertEqual(len(chunks), 4)
+        self.assertTrue(bad[0][0] is self.cfs[2])
+        self.assertEqual(bad[0][1].errors[0].field, 'wait_time')
+
+    def test_write_files(self):
+        """Ensure call files are written to a directory."""
+        d = mkdtemp()
+        self.assertEqual(write_files(self.callfiles(), d), 5)
+        self.assertEqual(sorted(listdir(d)),
+                sorted(cf.filename for cf in self.cfs))
+        with open(join(d, self.cfs[0].filename)) as f:
+            self.assertEqual(f.read(), '\n'.join(self.cfs[0]._buildfile(False)))
+
+    def test_write_files_replaces_symlinks(self):
+        """Ensure a symlink planted at a call file's name is replaced, not
+        written through, and no temporary files are left behind.
+        """
+        d = mkdtemp()
+        victim = join(mkdtemp(), 'victim')
+        with open(victim, 'w') as f:
+            f.write('precious')
+        symlink(victim, join(d, self.cfs[0].filename))
+        self.assertEqual(write_files(self.callfiles(), d), 5)
+        with open(victim) as f:
+            self.assertEqual(f.read(), 'precious')
+        self.assertFalse(islink(join(d, self.cfs[0].filename)))
+        self.assertEqual(sorted(listdir(d)),
+                sorted(cf.filename for cf in self.cfs))
+
+    def test_write_stream(self):
+        """Ensure call files are written one after another."""
+        out = BytesIO()
+        self.assertEqual(write_stream(self.callfiles(), out), 5)
+        parts = out.getvalue().decode('utf-8').split('\n\n')
+        self.assertEqual(parts, ['\n'.join(cf._buildfile(False))
+                for cf in self.cfs])
+
+    def test_write_tar(self):
+        """Ensure call files are added to a tar archive."""
+        buf = BytesIO()
+        with tarfile.open(fileobj=buf, mode='w') as tar:
+            self.assertEqual(write_tar(self.callfiles(), tar), 5)
+        buf.seek(0)
+        with tarfile.open(fileobj=buf) as tar:
+            member = tar.getmember(str(self.cfs[3].filename))
+            self.assertEqual(tar.extractfile(member).read().decode('utf-8'),
+                    '\n'.join(self.cfs[3]._buildfile(False)))
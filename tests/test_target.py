@@ -0,0 +1,71 @@
+"""Unit tests for `pycall.target`."""
+
+
+from os import rmdir
+from tempfile import mkdtemp
+from unittest import TestCase
+
+from path import Path
+
+from pycall import Application, Call, CallFile, SpoolTarget
+
+
+class TestSpoolTarget(TestCase):
+    """Run tests on the `SpoolTarget` class."""
+
+    def setUp(self):
+        """Setup some default variables for test usage."""
+        self.dir = mkdtemp()
+        self.t = SpoolTarget(self.dir)
+
+    def test_attrs_stick(self):
+        """Ensure attributes stick."""
+        self.assertEqual(self.t.path, self.dir)
+        self.assertTrue(self.t.exists)
+        self.assertTrue(self.t.writable)
+        self.assertTrue(self.t.is_valid)
+        self.assertEqual(self.t.device, Path(self.dir).stat().st_dev)
+
+    def test_path_like(self):
+        """Ensure a `SpoolTarget` can be used like a path."""
+        self.assertEqual(str(self.t), self.dir)
+        self.assertEqual(Path(self.t), self.dir)
+        self.assertEqual(self.t / 'test.call', Path(self.dir) / 'test.call')
+
+    def test_missing(self):
+        """Ensure missing directories aren't valid."""
+        t = SpoolTarget('/woot')
+        self.assertFalse(t.exists)
+        self.assertFalse(t.is_valid)
+        self.assertEqual(t.device, None)
+
+    def test_refresh(self):
+        """Ensure checks are cached until `refresh` is called."""
+        rmdir(self.dir)
+        self.assertTrue(self.t.exists)
+        self.t.refresh()
+        self.assertFalse(self.t.exists)
+
+    def test_same_device(self):
+        """Ensure `same_device` compares filesystems."""
+        self.assertTrue(self.t.same_device(Path(self.dir).parent))
+        self.assertFalse(self.t.same_device('/woot'))
+
+    def test_callfile_uses_cached_checks(self):
+        """Ensure call files validate against the cached checks."""
+        c = CallFile(Call('channel'), Application('application', 'data'),
+                spool_dir=self.t)
+        rmdir(self.dir)
+        self.assertTrue(c.is_valid())
+        self.t.refresh()
+        self.assertFalse(c.is_valid())
+
+    def test_callfile_spool(self):
+        """Ensure call files spool to a `SpoolTarget`."""
+        c = CallFile(Call('channel'), Application('application', 'data'),
+                spool_dir=self.t, sync=CallFile.SYNC_FULL)
+        c.spool()
+        self.assertTrue((self.t / c.filename).exists())
+        self.assertEqual(CallFile.spool_many([CallFile(Call('channel'),
+                Application('application', 'data'),
+                spool_dir=self.t)])[0].error, None)
@@ -0,0 +1,84 @@
+"""Unit tests for `pycall.template`."""
+
+
+from unittest import TestCase
+
+from pycall import Application, Call, CallFile, CallFileTemplate, Context, \
+    ValidationError
+
+
+class TestCallFileTemplate(TestCase):
+    """Run tests on the `CallFileTemplate` class."""
+
+    def setUp(self):
+        """Setup some default variables for test usage."""
+        self.call = Call('channel', callerid='callerid', account='account',
+                wait_time=10, retry_time=60, max_retries=2)
+        self.action = Application('application', 'data')
+        self.spool_dir = '/tmp'
+
+    def contents(self, call, action, archive=None):
+        return CallFile(call, action, archive=archive,
+                spool_dir=self.spool_dir).contents
+
+    def test_attrs_stick(self):
+        """Ensure attributes stick."""
+        t = CallFileTemplate(self.call, self.action, True, ('channel',))
+        self.assertEqual(t.call, self.call)
+        self.assertEqual(t.action, self.action)
+        self.assertEqual(t.archive, True)
+        self.assertEqual(t.fields, ('channel',))
+
+    def test_render_matches_callfile(self):
+        """Ensure `render` produces the same text as `CallFile.contents`."""
+        t = CallFileTemplate(self.call, self.action, archive=True)
+        self.assertEqual(t.render(channel='SIP/a/1'), self.contents(
+                Call('SIP/a/1', callerid='callerid', account='account',
+                    wait_time=10, retry_time=60, max_retries=2),
+                self.action, archive=True))
+
+    def test_render_all_fields(self):
+        """Ensure `render` works when every field varies."""
+        t = CallFileTemplate(Call('channel'), Context('c', 's', '1'),
+                fields=CallFileTemplate.FIELDS)
+        variables = {'a': 'b', 'c': 'd'}
+        self.assertEqual(
+                t.render(channel='SIP/a/1', callerid='cid',
+                    variables=variables, account='acct'),
+                self.contents(Call('SIP/a/1', callerid='cid',
+                    variables=variables, account='acct'),
+                    Context('c', 's', '1')))
+
+    def test_render_defaults_to_prototype(self):
+        """Ensure fields that aren't given keep the prototype's value."""
+        t = CallFileTemplate(self.call, self.action,
+                fields=('channel', 'callerid', 'variables'))
+        self.assertEqual(t.render(), self.contents(self.call, self.action))
+
+    def test_render_empty_optional_fields(self):
+        """Ensure empty optional fields are left out of the output."""
+        t = CallFileTemplate(self.call, self.action,
+                fields=('channel', 'callerid', 'account'))
+        self.assertEqual(t.render(channel='x', callerid=None, account=None),
+                self.contents(Call('x', wait_time=10, retry_time=60,
+                    max_retries=2), self.action))
+
+    def test_invalid_prototype(self):
+        """Ensure an invalid prototype raises `ValidationError`."""
+        with self.assertRaises(ValidationError):
+            CallFileTemplate(Call('channel', wait_time='10'), self.action)
+        with self.assertRaises(ValidationError):
+            CallFileTemplate(self.call, 'action')
+        with self.assertRaises(ValidationError):
+            CallFileTemplate(self.call, self.action, fields=('wait_time',))
+
+    def test_render_invalid_values(self):
+        """Ensure invalid per-call values raise `ValidationError`."""
+        t = CallFileTemplate(self.call, self.action,
+                fields=('channel', 'variables'))
+        with self.assertRaises(ValidationError):
+            t.render(channel='')
+        with self.assertRaises(ValidationError):
+            t.render(variables='variables')
+        with self.assertRaises(ValidationError):
+            t.render(account='account')
@@ -0,0 +1,122 @@
+"""Unit tests for `pycall.threaded`."""
+
+
+from os import listdir
+from tempfile import mkdtemp
+from threading import Event, Thread
+from unittest import TestCase
+
+try:
+    from queue import Full
+except ImportError:
+    from Queue import Full
+
+from pycall import Application, Call, CallFile, NoUserError, SpoolResult
+from pycall.threaded import ThreadedSpooler
+
+
+class BlockingCallFile(CallFile):
+    """A call file whose spool waits until it's released."""
+
+    __slots__ = ('release',)
+
+    def spool(self, time=None):
+        self.release.wait()
+        CallFile.spool(self, time)
+
+
+class TestThreadedSpooler(TestCase):
+    """Run tests on the `ThreadedSpooler` class."""
+
+    def setUp(self):
+        """Setup some default variables for test usage."""
+        self.spool_dir = mkdtemp()
+        self.a = Application('application', 'data')
+
+    def cf(self, **kwargs):
+        return CallFile(Call('channel'), self.a, spool_dir=self.spool_dir,
+                **kwargs)
+
+    def blocking(self, release):
+        cf = BlockingCallFile(Call('channel'), self.a,
+                spool_dir=self.spool_dir)
+        cf.release = release
+        return cf
+
+    def test_submit(self):
+        """Ensure submitted call files are spooled, with futures resolving
+        to `SpoolResult` objects.
+        """
+        with ThreadedSpooler(max_workers=4) as s:
+            futures = [s.submit(self.cf()) for _ in range(50)]
+            results = [f.result() for f in futures]
+        self.assertTrue(all(isinstance(r, SpoolResult) and r.ok
+                for r in results))
+        self.assertEqual(len(listdir(self.spool_dir)), 50)
+
+    def test_failures(self):
+        """Ensure `PycallError` failures are reported and collected."""
+        with ThreadedSpooler(max_workers=2) as s:
+            results = s.spool_many([self.cf(), self.cf(
+                    user='asjdfgkhkgaskqtjwhkjwetghqekjtbkwthbjkltwhwklt'),
+                    self.cf()])
+        self.assertEqual([r.ok for r in results], [True, False, True])
+        self.assertTrue(isinstance(results[1].error, NoUserError))
+        self.assertEqual(s.failures, [results[1]])
+
+    def test_backpressure(self):
+        """Ensure `submit` blocks while the queue is full."""
+        release = Event()
+        s = ThreadedSpooler(max_workers=1, max_queued=2)
+        try:
+            s.submit(self.blocking(release))
+            s.submit(self.blocking(release))
+            s.submit(self.blocking(release), timeout=1)
+            with self.assertRaises(Full):
+                s.submit(self.cf(), timeout=0.05)
+            self.assertEqual(len(s), 3)
+            self.assertFalse(s.drain(timeout=0.05))
+        finally:
+            release.set()
+        self.assertTrue(s.drain(timeout=5))
+        self.assertEqual(len(s), 0)
+        s.shutdown()
+        self.assertEqual(len(listdir(self.spool_dir)), 3)
+
+    def test_shutdown_cancel_pending(self):
+        """Ensure shutting down can cancel queued call files."""
+        release = Event()
+        s = ThreadedSpooler(max_workers=1, max_queued=4)
+        running = s.submit(self.blocking(release))
+        queued = [s.submit(self.cf()) for _ in range(3)]
+        while not running.running():
+            pass
+        s.shutdown(wait=False, cancel_pending=True)
+        release.set()
+        self.assertTrue(s.drain(timeout=5))
+        self.assertTrue(running.result().ok)
+        self.assertTrue(all(f.cancelled() for f in queued))
+        with self.assertRaises(RuntimeError):
+            s.submit(self.cf())
+
+    def test_shutdown_waits_for_racing_submit(self):
+        """Ensure a submit racing `shutdown` can't queue its call file where
+        no thread will pick it up.
+        """
+        s = ThreadedSpooler(max_workers=1)
+        put = s._queue.put
+        stopper = Thread(target=s.shutdown, kwargs={'cancel_pending': True})
+
+        def racing_put(item, timeout=None):
+            s._queue.put = put
+            stopper.start()
+            stopper.join(0.05)
+            self.assertTrue(stopper.is_alive())
+            put(item, timeout=timeout)
+
+        s._queue.put = racing_put
+        f = s.submit(self.cf())
+        stopper.join(5)
+        self.assertFalse(stopper.is_alive())
+        self.assertTrue(f.done())
+        self.assertTrue(s.drain(timeout=5))
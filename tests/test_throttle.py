@@ -0,0 +1,117 @@
+"""Unit tests for `pycall.throttle`."""
+
+
+from os import listdir
+from shutil import rmtree
+from tempfile import mkdtemp
+from unittest import TestCase
+
+from pycall import Application, Call, CallFile, NoUserError, \
+    ThrottledSpooler, TokenBucket
+
+from . import Clock
+
+
+class TestTokenBucket(TestCase):
+    """Run tests on the `TokenBucket` class."""
+
+    def setUp(self):
+        """Setup some default variables for test usage."""
+        self.clock = Clock()
+        self.b = TokenBucket(2, 3, clock=self.clock)
+
+    def test_attrs_stick(self):
+        """Ensure attributes stick."""
+        self.assertEqual(self.b.rate, 2)
+        self.assertEqual(self.b.capacity, 3)
+
+    def test_attrs_default_capacity(self):
+        """Ensure the default `capacity` attribute works."""
+        self.assertEqual(TokenBucket(5).capacity, 5)
+        self.assertEqual(TokenBucket(0.5).capacity, 1)
+
+    def test_take_allows_burst(self):
+        """Ensure `take` allows up to `capacity` tokens at once."""
+        self.assertEqual([self.b.take() for _ in range(4)],
+                [True, True, True, False])
+
+    def test_take_refills(self):
+        """Ensure tokens are refilled at `rate`."""
+        while self.b.take():
+            pass
+        self.assertEqual(self.b.delay(), 0.5)
+        self.clock.t += 0.5
+        self.assertTrue(self.b.take())
+        self.assertFalse(self.b.take())
+
+
+class TestThrottledSpooler(TestCase):
+    """Run tests on the `ThrottledSpooler` class."""
+
+    def setUp(self):
+        """Setup some default variables for test usage."""
+        self.spool_dir = mkdtemp()
+        self.addCleanup(rmtree, self.spool_dir)
+
+    def callfile(self, **kwargs):
+        return CallFile(Call('channel'), Application('application', 'data'),
+                **kwargs)
+
+    def test_attrs_stick(self):
+        """Ensure attributes stick."""
+        s = ThrottledSpooler(self.spool_dir, 10, 5, 2, 1)
+        self.assertEqual(s.spool_dir, self.spool_dir)
+        self.assertEqual(s.max_files, 10)
+        self.assertEqual(s.bucket.rate, 5)
+        self.assertEqual(s.bucket.capacity, 2)
+        self.assertEqual(s.poll_interval, 1)
+
+    def test_queued(self):
+        """Ensure `queued` counts the call files in the spooling directory."""
+        s = ThrottledSpooler(self.spool_dir)
+        self.assertEqual(s.queued(), 0)
+        s.spool(self.callfile())
+        self.assertEqual(s.queued(), 1)
+
+    def test_try_spool_max_files(self):
+        """Ensure `try_spool` stops admitting call files at `max_files`."""
+        s = ThrottledSpooler(self.spool_dir, max_files=2)
+        self.assertEqual([s.try_spool(self.callfile()) for _ in range(3)],
+                [True, True, False])
+        self.assertEqual(len(listdir(self.spool_dir)), 2)
+
+    def test_try_spool_frees_slots(self):
+        """Ensure slots free up as Asterisk removes call files."""
+        s = ThrottledSpooler(self.spool_dir, max_files=1)
+        cf = self.callfile()
+        self.assertTrue(s.try_spool(cf))
+        self.assertFalse(s.try_spool(self.callfile()))
+        (cf.spool_dir / cf.filename).remove()
+        self.assertTrue(s.try_spool(self.callfile()))
+
+    def test_try_spool_rate(self):
+        """Ensure `try_spool` respects `rate`."""
+        s = ThrottledSpooler(self.spool_dir, rate=1, burst=2)
+        self.assertEqual([s.try_spool(self.callfile()) for _ in range(3)],
+                [True, True, False])
+
+    def test_try_spool_failure_frees_slot(self):
+        """Ensure a failed spool doesn't use up a slot."""
+        s = ThrottledSpooler(self.spool_dir, max_files=1, poll_interval=60)
+        with self.assertRaises(NoUserError):
+            s.try_spool(self.callfile(
+                user='asjdfgkhkgaskqtjwhkjwetghqekjtbkwthbjkltwhwklt'))
+        self.assertTrue(s.try_spool(self.callfile()))
+
+    def test_spool_timeout(self):
+        """Ensure `spool` gives up once `timeout` runs out."""
+        s = ThrottledSpooler(self.spool_dir, max_files=1, poll_interval=0.01)
+        self.assertTrue(s.spool(self.callfile()))
+        self.assertFalse(s.spool(self.callfile(), timeout=0.05))
+
+    def test_spool_waits_for_rate(self):
+        """Ensure `spool` waits for a token instead of failing."""
+        s = ThrottledSpooler(self.spool_dir, rate=100, burst=1)
+        self.assertTrue(s.spool(self.callfile()))
+        self.assertTrue(s.spool(self.callfile(), timeout=1))
+        self.assertEqual(len(listdir(self.spool_dir)), 2)
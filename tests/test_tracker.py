@@ -0,0 +1,163 @@
+"""Unit tests for `pycall.tracker`."""
+
+
+from os import mkdir, rename, utime
+from shutil import rmtree
+from tempfile import mkdtemp
+from unittest import TestCase
+
+from path import Path
+
+from pycall import Application, Call, CallFile, Change, SpoolTracker
+from pycall.tracker import ACTIVE, ARCHIVED, FINISHED, QUEUED
+
+
+class TrackerTests(object):
+    """Tests run against both tracker backends."""
+
+    use_inotify = None
+
+    def setUp(self):
+        """Setup some default variables for test usage."""
+        root = Path(mkdtemp())
+        self.spool_dir = root / 'outgoing'
+        self.archive_dir = root / 'outgoing_done'
+        mkdir(self.spool_dir)
+        mkdir(self.archive_dir)
+        self.t = SpoolTracker(self.spool_dir, self.archive_dir,
+                use_inotify=self.use_inotify)
+        self.seen = []
+        self.t.on_change(self.seen.append)
+
+    def tearDown(self):
+        self.t.close()
+
+    def callfile(self, archive=None):
+        return CallFile(Call('channel'), Application('application', 'data'),
+                archive=archive, spool_dir=self.spool_dir)
+
+    def process(self, cf):
+        """Pretend to be Asterisk starting to process a call file."""
+        path = self.spool_dir / cf.filename
+        with open(path, 'a') as f:
+            f.write('\nStartRetry: 1 1 (1)')
+        utime(path, (1, 1))
+
+    def test_attrs_stick(self):
+        """Ensure attributes stick."""
+        self.assertEqual(self.t.spool_dir, self.spool_dir)
+        self.assertEqual(self.t.archive_dir, self.archive_dir)
+
+    def test_lifecycle(self):
+        """Ensure a call file is tracked until it leaves the spool."""
+        cf = self.callfile()
+        self.t.track(cf)
+        self.assertEqual(self.t.state(cf.filename), None)
+        cf.spool()
+        self.assertEqual(self.t.poll(), [Change(cf.filename, QUEUED)])
+        self.process(cf)
+        self.assertEqual(self.t.poll(), [Change(cf.filename, ACTIVE)])
+        (self.spool_dir / cf.filename).remove()
+        self.assertEqual(self.t.poll(), [Change(cf.filename, FINISHED)])
+        self.assertEqual(len(self.t), 0)
+        self.assertEqual(self.seen, [Change(cf.filename, QUEUED),
+                Change(cf.filename, ACTIVE), Change(cf.filename, FINISHED)])
+
+    def test_archived(self):
+        """Ensure archived call files are tracked into the archive."""
+        cf = self.callfile(archive=True)
+        cf.spool()
+        self.t.track(cf)
+        self.assertEqual(self.t.state(cf.filename), QUEUED)
+        rename(self.spool_dir / cf.filename, self.archive_dir / cf.filename)
+        self.assertEqual(self.t.poll(), [Change(cf.filename, FINISHED),
+                Change(cf.filename, ARCHIVED)])
+        self.assertEqual(len(self.t), 0)
+
+    def test_archived_later(self):
+        """Ensure a call file archived after it leaves the spool is still
+        tracked into the archive.
+        """
+        cf = self.callfile(archive=True)
+        cf.spool()
+        self.t.track(cf)
+        (self.spool_dir / cf.filename).remove()
+        self.assertEqual(self.t.poll(), [Change(cf.filename, FINISHED)])
+        self.assertEqual(len(self.t), 1)
+        with open(self.archive_dir / cf.filename, 'w') as f:
+            f.write(cf.contents)
+        self.assertEqual(self.t.poll(), [Change(cf.filename, ARCHIVED)])
+        self.assertEqual(len(self.t), 0)
+
+    def test_untracked_files_ignored(self):
+        """Ensure only tracked call files are reported."""
+        self.callfile().spool()
+        self.t.track('other.call')
+        self.assertEqual(self.t.poll(), [])
+        self.t.untrack('other.call')
+        self.assertEqual(len(self.t), 0)
+
+
+class TestPollingSpoolTracker(TrackerTests, TestCase):
+    """Run tests on the polling `SpoolTracker`."""
+
+    use_inotify = False
+
+    def test_uses_inotify(self):
+        """Ensure inotify isn't used."""
+        self.assertFalse(self.t.uses_inotify)
+        self.assertEqual(self.t.fileno(), None)
+
+
+class TestInotifySpoolTracker(TrackerTests, TestCase):
+    """Run tests on the inotify `SpoolTracker`."""
+
+    use_inotify = True
+
+    def test_uses_inotify(self):
+        """Ensure inotify is used."""
+        self.assertTrue(self.t.uses_inotify)
+        self.assertTrue(self.t.fileno() is not None)
+
+    def test_written_in_place(self):
+        """Ensure call files written straight into the spool are only queued
+        once they're closed.
+        """
+        cf = self.callfile()
+        self.t.track(cf)
+        cf.tempdir = self.spool_dir
+        cf.writefile()
+        self.assertEqual(self.t.poll(), [Change(cf.filename, QUEUED)])
+
+
+class TestMissingArchiveDir(TestCase):
+    """Run tests on a `SpoolTracker` whose archive directory doesn't exist."""
+
+    def setUp(self):
+        """Setup some default variables for test usage."""
+        root = Path(mkdtemp())
+        self.addCleanup(rmtree, root)
+        self.spool_dir = root / 'outgoing'
+        self.archive_dir = root / 'outgoing_done'
+        mkdir(self.spool_dir)
+
+    def test_falls_back_to_polling(self):
+        """Ensure the tracker polls, so archived call files are still seen
+        once the archive directory is created.
+        """
+        t = SpoolTracker(self.spool_dir, self.archive_dir)
+        self.assertFalse(t.uses_inotify)
+        cf = CallFile(Call('channel'), Application('application', 'data'),
+                archive=True, spool_dir=self.spool_dir)
+        cf.spool()
+        t.track(cf)
+        mkdir(self.archive_dir)
+        rename(self.spool_dir / cf.filename, self.archive_dir / cf.filename)
+        self.assertEqual(t.poll(), [Change(cf.filename, FINISHED),
+                Change(cf.filename, ARCHIVED)])
+        self.assertEqual(len(t), 0)
+
+    def test_inotify_required(self):
+        """Ensure requiring inotify fails if the archive can't be watched."""
+        with self.assertRaises(OSError):
+            SpoolTracker(self.spool_dir, self.archive_dir, use_inotify=True)
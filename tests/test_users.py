@@ -0,0 +1,68 @@
+"""Unit tests for `pycall.users`."""
+
+
+from getpass import getuser
+from pwd import getpwnam
+from unittest import TestCase
+
+from pycall import NoUserError, UserCache
+from pycall import users
+
+from . import Clock
+
+
+class TestUserCache(TestCase):
+    """Run tests on the `UserCache` class."""
+
+    def setUp(self):
+        """Setup some default variables for test usage."""
+        self.clock = Clock()
+        self.c = UserCache(ttl=10, clock=self.clock)
+        self.lookups = []
+        self.getpwnam = users.getpwnam
+
+        def counting_getpwnam(name):
+            self.lookups.append(name)
+            return self.getpwnam(name)
+        users.getpwnam = counting_getpwnam
+
+    def tearDown(self):
+        users.getpwnam = self.getpwnam
+
+    def test_attrs_default_ttl(self):
+        """Ensure the default `ttl` attribute works."""
+        self.assertEqual(UserCache().ttl, UserCache.DEFAULT_TTL)
+
+    def test_resolve_username(self):
+        """Ensure `resolve` looks up usernames."""
+        pwd = getpwnam(getuser())
+        self.assertEqual(self.c.resolve(getuser()), (pwd[2], pwd[3]))
+
+    def test_resolve_numeric(self):
+        """Ensure numeric users are passed through without a lookup."""
+        self.assertEqual(self.c.resolve(1000), (1000, -1))
+        self.assertEqual(self.c.resolve((1000, 1001)), (1000, 1001))
+        self.assertEqual(self.lookups, [])
+
+    def test_resolve_caches(self):
+        """Ensure lookups are cached for `ttl` seconds."""
+        for _ in range(3):
+            self.c.resolve(getuser())
+        self.assertEqual(len(self.lookups), 1)
+        self.clock.t += 10
+        self.c.resolve(getuser())
+        self.assertEqual(len(self.lookups), 2)
+
+    def test_resolve_no_user_error(self):
+        """Ensure missing users raise `NoUserError`, and are cached."""
+        for _ in range(2):
+            with self.assertRaises(NoUserError):
+                self.c.resolve('asjdfgkhkgaskqtjwhkjwetghqekjtbkwthbjkltwhwklt')
+        self.assertEqual(len(self.lookups), 1)
+
+    def test_clear(self):
+        """Ensure `clear` forgets cached lookups."""
+        self.c.resolve(getuser())
+        self.c.clear()
+        self.c.resolve(getuser())
+        self.assertEqual(len(self.lookups), 2)
@@ -0,0 +1,139 @@
+"""Unit tests for `pycall.validation`."""
+
+
+from tempfile import mkdtemp
+from unittest import TestCase
+
+from pycall import Application, Call, CallFile, CallFileTemplate, Context, \
+    FieldError, ValidationError, Validator
+
+
+class TestValidator(TestCase):
+    """Run tests on the `Validator` class."""
+
+    def setUp(self):
+        """Setup some default variables for test usage."""
+        self.v = Validator()
+        self.spool_dir = mkdtemp()
+        self.a = Application('application', 'data')
+
+    def fields(self, errors):
+        return [e.field for e in errors]
+
+    def test_valid(self):
+        """Ensure well-formed calls have no errors."""
+        c = Call('channel', callerid='"Bob" <1000>', account='a',
+                variables={'a': 'b', '__inherited': 1, 'CDR(userfield)': 'x'},
+                wait_time=0, retry_time=60, max_retries=2)
+        self.assertEqual(self.v.call_errors(c), ())
+
+    def test_newlines(self):
+        """Ensure newlines in string fields and variable values are caught."""
+        c = Call('channel\nArchive: yes', callerid='a\r',
+                variables={'a': 'b\nc'})
+        self.assertEqual(self.fields(self.v.call_errors(c)), ['channel',
+                'callerid', 'variables'])
+
+    def test_variable_names(self):
+        """Ensure invalid variable names are caught."""
+        for name in ('a b', 'a=b', '', 'a;b', 1):
+            errors = self.v.call_errors(Call('channel', variables={name: 'x'}))
+            self.assertEqual(self.fields(errors), ['variables'], name)
+
+    def test_integers(self):
+        """Ensure integer fields must be non-negative integers."""
+        for value in ('1', 1.0, True, -1):
+            errors = self.v.call_errors(Call('channel', wait_time=value))
+            self.assertEqual(self.fields(errors), ['wait_time'], value)
+
+    def test_strict_channels(self):
+        """Ensure channel syntax is only checked when asked for."""
+        c = Call('channel')
+        self.assertEqual(self.v.call_errors(c), ())
+        strict = Validator(strict_channels=True)
+        self.assertEqual(self.fields(strict.call_errors(c)), ['channel'])
+        for channel in ('SIP/flowroute/18002223333', 'Local/100@default'):
+            self.assertEqual(strict.call_errors(Call(channel)), ())
+
+    def test_actions(self):
+        """Ensure action fields are checked."""
+        self.assertEqual(self.v.action_errors(self.a), ())
+        self.assertEqual(self.fields(self.v.action_errors(
+                Context('c', None, '1\n'))), ['extension', 'priority'])
+        self.assertEqual(self.fields(self.v.action_errors('action')),
+                ['action'])
+
+    def test_cache(self):
+        """Ensure results are cached until a field changes."""
+        c = Call('channel', variables={'a': 'b'})
+        self.assertTrue(self.v.call_errors(c) is self.v.call_errors(c))
+        c.variables['a'] = 'b\n'
+        self.assertEqual(self.fields(self.v.call_errors(c)), ['variables'])
+        c.wait_time = '1'
+        self.assertEqual(len(self.v.call_errors(c)), 2)
+
+    def test_cache_follows_fields(self):
+        """Ensure cached results are per call and per validator, and are
+        checked again when a field is set, even to an equal value.
+        """
+        c = Call('channel', wait_time=1)
+        self.assertEqual(self.v.call_errors(c), ())
+        self.assertEqual(self.v.call_errors(Call('channel', wait_time=-1)),
+                (FieldError('wait_time', 'must not be negative'),))
+        self.assertEqual(self.v.call_errors(c), ())
+        c.wait_time = True
+        self.assertEqual(self.fields(self.v.call_errors(c)), ['wait_time'])
+        c.wait_time = 1
+        strict = Validator(strict_channels=True)
+        self.assertEqual(self.fields(strict.call_errors(c)), ['channel'])
+        self.assertEqual(self.v.call_errors(c), ())
+        self.a.data = 'a\nb'
+        self.assertEqual(self.fields(self.v.action_errors(self.a)), ['data'])
+
+    def test_cache_unhashable(self):
+        """Ensure unhashable values are checked without caching."""
+        c = Call('channel', variables={'a': ['b']})
+        self.assertEqual(self.v.call_errors(c), ())
+
+    def test_errors(self):
+        """Ensure call file errors cover the call, action and spool_dir."""
+        cf = CallFile(Call('channel', wait_time='1'), 'action',
+                spool_dir='/woot')
+        self.assertEqual(self.fields(self.v.errors(cf)), ['wait_time',
+                'action', 'spool_dir'])
+        self.assertEqual(self.fields(self.v.errors(CallFile('call', self.a,
+                spool_dir=self.spool_dir))), ['call'])
+
+    def test_validate_many(self):
+        """Ensure every invalid call file in a batch is reported."""
+        cfs = [CallFile(Call('channel'), self.a, spool_dir=self.spool_dir)
+                for _ in range(5)]
+        cfs[1].call = Call('channel', max_retries='x')
+        cfs[3].spool_dir = '/woot'
+        invalid = self.v.validate_many(cfs)
+        self.assertEqual([i for i, _ in invalid], [1, 3])
+        self.assertEqual(invalid[1][1], [FieldError('spool_dir',
+                'does not exist')])
+
+
+class TestValidationError(TestCase):
+    """Run tests on the structured errors raised when validation fails."""
+
+    def test_buildfile(self):
+        """Ensure `buildfile` raises the problems it found."""
+        cf = CallFile(Call('channel', variables={'a': 'b\nc'}),
+                Application('application', 'data'), spool_dir=mkdtemp())
+        with self.assertRaises(ValidationError) as cm:
+            cf.buildfile()
+        self.assertEqual([e.field for e in cm.exception.errors],
+                ['variables'])
+        self.assertEqual(cf.errors(), cm.exception.errors)
+
+    def test_template(self):
+        """Ensure templates check per-call values."""
+        t = CallFileTemplate(Call('channel'), Application('a', 'd'),
+                fields=('channel', 'callerid'))
+        with self.assertRaises(ValidationError) as cm:
+            t.render(callerid='a\nb')
+        self.assertEqual(str(cm.exception.errors[0]),
+                'callerid: must not contain newlines')